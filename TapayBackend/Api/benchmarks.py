@@ -0,0 +1,442 @@
+"""
+Performance benchmarks for the API application.
+Run them with `python manage.py benchmark <scenario>`, each scenario gets a fresh database.
+"""
+
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+
+import numpy as np
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import Contact, Merchant, Status, Order, Role, User, Transaction
+from .utils.LedgerUtils import (
+    AppendTransaction, FindBalanceChainBreaks, FoldBalanceShards, MerchantBalance, SetBalanceShards
+)
+from .utils.ContactQueueUtils import ContactQueueStats
+from .utils.LoginUtils import FlushLoginRecords, MAX_FAILED_LOGINS, ResetLoginThrottle
+from .utils.OrderImportUtils import ImportOrders, IterNdjsonRows
+from .utils.ReconcileUtils import ReconcileLedger
+from .utils.RouteUtils import OptimizeRoute
+
+SCENARIOS = {}
+
+
+def Scenario(name):
+    """
+    Register a benchmark function under a scenario name.
+    """
+    def register(func):
+        SCENARIOS[name] = func
+        return func
+    return register
+
+
+def CreateMerchant(name="Benchmark Merchant"):
+    return Merchant.objects.create(
+        name=name, contactEmail="benchmark@tapay.com", contactPhone="0100", address="Street 1"
+    )
+
+
+def CreateCourier(merchant, email="benchmark.driver@tapay.com"):
+    role, _ = Role.objects.get_or_create(name="Driver")
+    return User.objects.create_user(email, "Benchmark Driver", "password", role=role, merchant=merchant)
+
+
+def CreateOrder(merchant, title="Benchmark Order"):
+    return Order.objects.create(
+        title=title, amount=10, customerName="Customer", addressText="Street 2",
+        status=Status.objects.get(name="Pending", type="Order"), merchant=merchant
+    )
+
+
+def RunThreads(count, target):
+    """
+    Run target(index) on `count` threads, each with its own database connection.
+
+    Returns:
+        list: The exceptions raised by the threads
+    """
+    errors = []
+
+    def run(index):
+        try:
+            target(index)
+        except Exception as error:
+            errors.append(error)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return errors
+
+
+def CreateStatuses():
+    for name in ("Pending", "Confirmed", "Delivered"):
+        Status.objects.get_or_create(name=name, type="Order")
+    for name in ("Pending", "Completed", "Settled"):
+        Status.objects.get_or_create(name=name, type="Transaction")
+
+
+@Scenario("order-import")
+def BenchmarkOrderImport(size=50000):
+    """
+    Import `size` NDJSON orders through the bulk ingestion pipeline.
+    """
+    CreateStatuses()
+    merchant = CreateMerchant()
+
+    lines = [
+        json.dumps({
+            "title": f"Order {index}", "amount": index % 500, "customerName": "Customer",
+            "addressText": "Street 2", "addressLatitude": 30.0, "addressLongitude": 31.0,
+        }).encode()
+        for index in range(size)
+    ]
+
+    start = time.perf_counter()
+    created, failed, _ = ImportOrders(merchant, IterNdjsonRows(lines))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "rows": size,
+        "created": created,
+        "failed": failed,
+        "seconds": elapsed,
+        "ordersPerSecond": created / elapsed,
+        "storedOrders": Order.objects.count(),
+    }
+
+
+@Scenario("route")
+def BenchmarkRoute(size=200, runs=25):
+    """
+    Optimize a route through `size` random stops spread over a city.
+    """
+    generator = np.random.default_rng(7)
+    timings = []
+    lengths = []
+
+    for _ in range(runs):
+        latitudes = 30.0 + generator.random(size) * 0.3
+        longitudes = 31.1 + generator.random(size) * 0.3
+
+        start = time.perf_counter()
+        _, legs = OptimizeRoute(latitudes, longitudes, 30.15, 31.25)
+        timings.append((time.perf_counter() - start) * 1000)
+        lengths.append(sum(legs))
+
+    return {
+        "stops": size,
+        "runs": runs,
+        "medianMilliseconds": statistics.median(timings),
+        "maxMilliseconds": max(timings),
+        "meanRouteKm": statistics.mean(lengths),
+    }
+
+
+@Scenario("ledger")
+def BenchmarkLedger(size=4000, threads=8):
+    """
+    Post `size` transactions for one merchant from `threads` concurrent clients.
+    """
+    CreateStatuses()
+    merchant = CreateMerchant()
+    courier = CreateCourier(merchant)
+    order = CreateOrder(merchant)
+    url = f"/api/merchants/{merchant.id}/orders/{order.id}/transactions/"
+
+    failures = []
+
+    def post(index):
+        client = APIClient()
+        client.force_authenticate(courier)
+        for number in range(index, size, threads):
+            response = client.post(
+                url, {"amount": number % 100 + 1, "paymentMethod": "Cash", "status": "Pending"}, format="json"
+            )
+            if response.status_code != 201:
+                failures.append(response.status_code)
+
+    start = time.perf_counter()
+    errors = RunThreads(threads, post)
+    elapsed = time.perf_counter() - start
+
+    merchant.refresh_from_db()
+    breaks, closingBalance = FindBalanceChainBreaks(merchant.id)
+    expectedBalance = float(sum(number % 100 + 1 for number in range(size)))
+
+    return {
+        "transactions": size,
+        "threads": threads,
+        "seconds": elapsed,
+        "transactionsPerSecond": size / elapsed,
+        "failedRequests": len(failures) + len(errors),
+        "chainBreaks": len(breaks),
+        "expectedBalance": expectedBalance,
+        "currentBalance": merchant.currentBalance,
+        "closingBalance": closingBalance,
+        "consistent": not breaks and merchant.currentBalance == closingBalance == expectedBalance,
+    }
+
+
+@Scenario("balance-contention")
+def BenchmarkBalanceContention(size=4000, threads=8):
+    """
+    Append `size` transactions for one merchant from `threads` threads, once
+    with the single balance row and once with one balance shard per thread.
+    """
+    CreateStatuses()
+    transactionStatus = Status.objects.get(name="Pending", type="Transaction")
+    results = {"transactions": size, "threads": threads}
+
+    for mode, shards in (("singleRow", 0), ("sharded", threads)):
+        merchant = CreateMerchant(f"Benchmark {mode}")
+        order = CreateOrder(merchant)
+        SetBalanceShards(merchant.id, shards)
+
+        def append(index):
+            for number in range(index, size, threads):
+                AppendTransaction(
+                    merchant.id, order.id, number % 100 + 1, paymentMethod="Cash", transactionStatus=transactionStatus
+                )
+
+        start = time.perf_counter()
+        errors = RunThreads(threads, append)
+        elapsed = time.perf_counter() - start
+
+        balance = MerchantBalance(merchant.id)
+        FoldBalanceShards(merchant.id)
+        merchant.refresh_from_db()
+
+        expectedBalance = float(sum(number % 100 + 1 for number in range(size)))
+        results[f"{mode}TransactionsPerSecond"] = size / elapsed
+        results[f"{mode}Errors"] = len(errors)
+        results[f"{mode}Consistent"] = balance == merchant.currentBalance == expectedBalance
+
+    return results
+
+
+def InsertLedgerRows(merchant, order, statusId, count, brokenEvery=None):
+    """
+    Write a consistent ledger of `count` transactions with raw inserts, optionally breaking the chain.
+    """
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    columns = ["amount", "paymentMethod", "balanceAfter", "createdAt", "updatedAt", "version",
+               "transactionStatus_id", "merchant_id", "order_id"]
+    sql = "INSERT INTO {} ({}) VALUES ({})".format(
+        Transaction._meta.db_table,
+        ", ".join(connection.ops.quote_name(Transaction._meta.get_field(name).column) for name in columns),
+        ", ".join(["%s"] * len(columns))
+    )
+
+    balance = 0.0
+    rows = []
+    for index in range(count):
+        amount = float(index % 100 + 1)
+        balance += amount
+        balanceAfter = balance + 1 if brokenEvery and index % brokenEvery == brokenEvery - 1 else balance
+        rows.append((amount, "Cash", balanceAfter, now, now, 1, statusId, merchant.pk, order.pk))
+
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+    Merchant.objects.filter(pk=merchant.pk).update(currentBalance=balance)
+
+
+@Scenario("reconcile")
+def BenchmarkReconcile(size=1000000, merchants=40):
+    """
+    Reconcile a ledger of `size` transactions spread over `merchants` merchants,
+    once in-process and once with one worker per CPU.
+    """
+    CreateStatuses()
+    statusId = Status.objects.get(name="Pending", type="Transaction").id
+
+    # A few large merchants and many small ones, like production
+    weights = [1 / (index + 1) for index in range(merchants)]
+    with transaction.atomic():
+        for index, weight in enumerate(weights):
+            merchant = CreateMerchant(f"Benchmark {index}")
+            share = int(size * weight / sum(weights))
+            # The largest merchant gets a broken balanceAfter every 100k rows
+            InsertLedgerRows(merchant, CreateOrder(merchant), statusId, share, brokenEvery=100000 if index == 0 else None)
+
+    rows = Transaction.objects.count()
+    workers = os.cpu_count() or 1
+    results = {"transactions": rows, "merchants": merchants, "workers": workers}
+
+    for name, poolSize in (("singleProcess", 1), ("pool", workers)):
+        start = time.perf_counter()
+        checked, discrepancies = ReconcileLedger(workers=poolSize)
+        elapsed = time.perf_counter() - start
+        results[f"{name}Seconds"] = elapsed
+        results[f"{name}RowsPerSecond"] = rows / elapsed
+        results[f"{name}Discrepancies"] = len(discrepancies)
+
+    return results
+
+
+@Scenario("login")
+def BenchmarkLogin(size=40, lockedAttempts=2000):
+    """
+    Log in `size` times through the token endpoint, then hammer a locked-out
+    account `lockedAttempts` times, counting the User row writes.
+    """
+    CreateStatuses()
+    courier = CreateCourier(CreateMerchant())
+    client = APIClient()
+    ResetLoginThrottle()
+
+    # Every rejected attempt would be logged as a warning
+    logging.getLogger('django.request').setLevel(logging.ERROR)
+
+    def Login(password):
+        return client.post(
+            "/api/auth/login/", {"email": courier.email, "password": password}, format="json"
+        ).status_code
+
+    results = {"logins": size}
+
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        statuses = [Login("password") for _ in range(size)]
+        elapsed = time.perf_counter() - start
+    results["loginsPerSecond"] = size / elapsed
+    results["successfulLogins"] = statuses.count(200)
+    results["userRowWrites"] = sum(1 for query in queries if query['sql'].startswith('UPDATE "Api_user"'))
+
+    for _ in range(MAX_FAILED_LOGINS):
+        Login("wrong")
+    start = time.perf_counter()
+    statuses = [Login("password") for _ in range(lockedAttempts)]
+    elapsed = time.perf_counter() - start
+    results["lockedOutAttempts"] = lockedAttempts
+    results["lockedOutRejectionsPerSecond"] = lockedAttempts / elapsed
+    results["lockedOutStatus"] = statuses[0]
+
+    FlushLoginRecords()
+    courier.refresh_from_db()
+    results["storedFailedLoginAttempts"] = courier.failedLoginAttempts
+
+    return results
+
+
+@Scenario("contacts")
+def BenchmarkContacts(size=5000):
+    """
+    Submit `size` contact forms from distinct addresses and wait for the writer thread to store them.
+    """
+    client = APIClient()
+    payload = {
+        "businessName": "Shop", "contactName": "Owner", "email": "owner@shop.com", "phone": "0100",
+        "businessType": "Retail", "driversCount": "1-5", "message": "Call me",
+    }
+
+    start = time.perf_counter()
+    statuses = [
+        client.post("/api/contacts/", payload, format="json", REMOTE_ADDR=f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}").status_code
+        for index in range(size)
+    ]
+    submitted = time.perf_counter() - start
+
+    while Contact.objects.count() < statuses.count(202) and time.perf_counter() - start < 60:
+        time.sleep(0.05)
+    stored = time.perf_counter() - start
+    stats = ContactQueueStats()
+
+    return {
+        "submissions": size,
+        "accepted": statuses.count(202),
+        "submissionsPerSecond": size / submitted,
+        "storedContacts": Contact.objects.count(),
+        "secondsUntilStored": stored,
+        "flushes": stats["flushes"],
+        "averageFlushMilliseconds": stats["averageFlushMilliseconds"],
+        "maxFlushMilliseconds": stats["maxFlushMilliseconds"],
+    }
+
+
+# What django.db.backends.sqlite3 runs with, for comparison with TapayBackend.sqlite
+DEFAULT_SQLITE_PRAGMAS = {
+    "journal_mode": "DELETE", "synchronous": "FULL", "busy_timeout": 5000,
+    "cache_size": -2000, "mmap_size": 0, "temp_store": "DEFAULT",
+}
+
+
+@Scenario("read-write")
+def BenchmarkReadWrite(size=5, readers=4, writers=2, orders=2000):
+    """
+    For `size` seconds each, list orders and transactions from `readers`
+    threads while `writers` threads post transactions, once with the
+    default SQLite setup (new connection per request) and once tuned.
+    """
+    CreateStatuses()
+    merchant = CreateMerchant()
+    courier = CreateCourier(merchant)
+    ImportOrders(merchant, IterNdjsonRows([
+        json.dumps({"title": f"Order {index}", "amount": 10, "customerName": "Customer", "addressText": "Street 2"}).encode()
+        for index in range(orders)
+    ]))
+    order = Order.objects.filter(merchant=merchant).first()
+    statusId = Status.objects.get(name="Pending", type="Transaction").id
+    InsertLedgerRows(merchant, order, statusId, 20000)
+
+    ordersUrl = f"/api/merchants/{merchant.id}/orders/"
+    transactionsUrl = f"/api/merchants/{merchant.id}/orders/{order.id}/transactions/"
+    settingsDict = connection.settings_dict
+    results = {"readers": readers, "writers": writers, "secondsPerSetup": size}
+
+    for name, pragmas, transactionMode, reuseConnections in (
+        ("default", DEFAULT_SQLITE_PRAGMAS, "DEFERRED", False),
+        ("tuned", {}, "IMMEDIATE", True),
+    ):
+        connection.close()
+        settingsDict["PRAGMAS"], settingsDict["TRANSACTION_MODE"] = pragmas, transactionMode
+        connection.ensure_connection()
+
+        latencies = {"read": [], "write": []}
+        failures = []
+        deadline = time.perf_counter() + size
+
+        def work(index):
+            client = APIClient()
+            client.force_authenticate(courier)
+            kind = "write" if index < writers else "read"
+            number = 0
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                if kind == "write":
+                    response = client.post(
+                        transactionsUrl, {"amount": 1, "paymentMethod": "Cash", "status": "Pending"}, format="json"
+                    )
+                else:
+                    response = client.get(ordersUrl if number % 2 else transactionsUrl, {"page_size": 20})
+                latencies[kind].append(time.perf_counter() - start)
+                if response.status_code >= 300:
+                    failures.append(response.status_code)
+                if not reuseConnections:
+                    connection.close()
+                number += 1
+
+        errors = RunThreads(readers + writers, work)
+
+        for kind, timings in latencies.items():
+            results[f"{name}{kind.title()}sPerSecond"] = len(timings) / size
+            results[f"{name}{kind.title()}P95Milliseconds"] = (
+                float(np.percentile(timings, 95)) * 1000 if timings else 0.0
+            )
+        results[f"{name}Failures"] = len(failures) + len(errors)
+
+    return results
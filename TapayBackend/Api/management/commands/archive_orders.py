@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from Api.utils.ArchiveUtils import ARCHIVE_AFTER_DAYS, ArchiveClosedOrders
+
+
+class Command(BaseCommand):
+    help = "Move closed orders, with their assignments, transactions and history, into the archive tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=ARCHIVE_AFTER_DAYS, help="Days without changes before an order is archived")
+        parser.add_argument('--batch-size', type=int, default=500, help="Orders moved per transaction")
+        parser.add_argument('--merchant', type=int, default=None, help="Only archive this merchant's orders")
+
+    def handle(self, *args, **options):
+        totals = ArchiveClosedOrders(options['older_than'], options['batch_size'], options['merchant'])
+        self.stdout.write(
+            f"Archived {totals['orders']} orders, {totals['assignments']} assignments, "
+            f"{totals['transactions']} transactions and {totals['history']} history records"
+        )
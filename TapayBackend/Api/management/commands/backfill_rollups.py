@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from Api.utils.RollupUtils import RebuildRollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily transaction and order rollups from the raw rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--merchant', type=int, default=None, help="Only rebuild this merchant")
+        parser.add_argument('--from', dest='start', default=None, help="First day to rebuild, YYYY-MM-DD")
+        parser.add_argument('--to', dest='end', default=None, help="Last day to rebuild, YYYY-MM-DD")
+
+    def handle(self, *args, **options):
+        bounds = {}
+        for name in ('start', 'end'):
+            if options[name]:
+                bounds[name] = parse_date(options[name])
+                if bounds[name] is None:
+                    raise CommandError(f"--{'from' if name == 'start' else 'to'} must be a YYYY-MM-DD date")
+
+        transactionRows, orderRows = RebuildRollups(options['merchant'], **bounds)
+        self.stdout.write(f"Wrote {transactionRows} transaction and {orderRows} order rollup rows")
@@ -0,0 +1,38 @@
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from Api.benchmarks import SCENARIOS
+
+
+class Command(BaseCommand):
+    help = "Run a performance benchmark against a throwaway SQLite database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenario', choices=sorted(SCENARIOS), help="Benchmark scenario to run")
+        parser.add_argument('--size', type=int, default=None, help="Scenario size, e.g. the number of rows")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("Benchmarks run against SQLite only")
+
+        # A file-backed database, so that concurrent scenarios see real locking
+        directory = tempfile.mkdtemp(prefix='tapay-benchmark-')
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+        originalName = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, serialize=False)
+
+        try:
+            scenario = SCENARIOS[options['scenario']]
+            kwargs = {'size': options['size']} if options['size'] else {}
+            results = scenario(**kwargs)
+        finally:
+            connection.creation.destroy_test_db(originalName, verbosity=0)
+            os.rmdir(directory)
+
+        for name, value in results.items():
+            if isinstance(value, float):
+                value = f"{value:,.2f}"
+            self.stdout.write(f"{name}: {value}")
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Api.models import Merchant, MerchantBalanceShard
+from Api.utils.LedgerUtils import FoldBalanceShards, SetBalanceShards
+
+
+class Command(BaseCommand):
+    help = "Fold sharded merchant balances into Merchant.currentBalance, run it periodically."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--merchant', type=int, default=None, help="Only fold this merchant")
+        parser.add_argument(
+            '--set-shards', type=int, default=None,
+            help="Switch --merchant to this many balance shards (0 for a single row) before folding"
+        )
+
+    def handle(self, *args, **options):
+        merchantId = options['merchant']
+
+        if options['set_shards'] is not None:
+            if merchantId is None:
+                raise CommandError("--set-shards requires --merchant")
+            if not 0 <= options['set_shards'] <= 256:
+                raise CommandError("--set-shards must be between 0 and 256")
+            if not Merchant.objects.filter(pk=merchantId).exists():
+                raise CommandError(f"Merchant with id {merchantId} not found")
+            SetBalanceShards(merchantId, options['set_shards'])
+
+        if merchantId is not None:
+            merchantIds = [merchantId]
+        else:
+            merchantIds = MerchantBalanceShard.objects.exclude(balance=0).values_list('merchant', flat=True).distinct()
+
+        folded = 0
+        for merchant in list(merchantIds):
+            if FoldBalanceShards(merchant):
+                folded += 1
+
+        self.stdout.write(f"Folded the balance shards of {folded} merchants")
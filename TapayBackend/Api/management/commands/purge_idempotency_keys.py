@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from Api.utils.IdempotencyUtils import PurgeExpiredKeys
+
+
+class Command(BaseCommand):
+    help = "Delete expired idempotency keys, run it periodically."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Keys deleted per statement")
+
+    def handle(self, *args, **options):
+        deleted = PurgeExpiredKeys(options['chunk_size'])
+        self.stdout.write(f"Deleted {deleted} expired idempotency keys")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from Api.utils.BlacklistUtils import PurgeExpiredTokens
+
+
+class Command(BaseCommand):
+    help = "Delete expired outstanding and blacklisted refresh tokens in chunks, run it periodically."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Tokens deleted per statement")
+
+    def handle(self, *args, **options):
+        outstanding, blacklisted = PurgeExpiredTokens(options['chunk_size'])
+        self.stdout.write(f"Deleted {outstanding} expired outstanding tokens and {blacklisted} blacklist entries")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from Api.utils.WorkloadUtils import RebuildCourierWorkloads
+
+
+class Command(BaseCommand):
+    help = "Recompute the courier workload counters from the active order assignments."
+
+    def handle(self, *args, **options):
+        written = RebuildCourierWorkloads()
+        self.stdout.write(f"Rebuilt {written} courier workload counters")
@@ -0,0 +1,39 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.utils.encoders import JSONEncoder
+
+from Api.utils.ReconcileUtils import ReconcileLedger
+
+
+class Command(BaseCommand):
+    help = "Verify merchant balances against their transactions, in parallel processes, and report discrepancies."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+        parser.add_argument('--merchant', type=int, action='append', dest='merchants', help="Only check this merchant (repeatable)")
+        parser.add_argument('--limit', type=int, default=100, help="Chain breaks listed per merchant")
+        parser.add_argument('--output', default=None, help="Write the JSON report to this file instead of stdout")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        checked, discrepancies = ReconcileLedger(options['merchants'], options['workers'], options['limit'])
+        elapsed = time.perf_counter() - start
+
+        report = json.dumps({
+            "merchantsChecked": checked,
+            "seconds": round(elapsed, 3),
+            "discrepancies": discrepancies,
+        }, cls=JSONEncoder, indent=2)
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(report)
+        else:
+            self.stdout.write(report)
+
+        if discrepancies:
+            raise CommandError(f"{len(discrepancies)} of {checked} merchants have ledger discrepancies")
+        self.stderr.write(f"Checked {checked} merchants in {elapsed:.1f}s, no discrepancies")
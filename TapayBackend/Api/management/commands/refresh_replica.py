@@ -0,0 +1,38 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database into the read replica, once or every --interval seconds."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=None, help="Keep refreshing with this many seconds between copies")
+
+    def handle(self, *args, **options):
+        replica = getattr(settings, 'READ_REPLICA_ALIAS', None)
+        if not replica:
+            raise CommandError("No read replica is configured, set TAPAY_REPLICA_DB")
+
+        source = connections[DEFAULT_DB_ALIAS]
+        if source.vendor != 'sqlite' or connections[replica].vendor != 'sqlite':
+            raise CommandError("Only SQLite replicas can be refreshed by copying")
+
+        while True:
+            start = time.perf_counter()
+            source.ensure_connection()
+            # The online backup copies a consistent snapshot; replica readers see either the old or the new copy
+            target = sqlite3.connect(connections[replica].settings_dict['NAME'], timeout=30)
+            try:
+                source.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(f"Refreshed the replica in {time.perf_counter() - start:.2f}s")
+
+            if options['interval'] is None:
+                return
+            source.close()
+            time.sleep(options['interval'])
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.19 on 2026-10-17 01:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Api', '0010_alter_contact_options_merchant_createdat'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['createdAt'], name='contact_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='merchant',
+            index=models.Index(fields=['createdAt'], name='merchant_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['merchant', 'status', 'createdAt'], name='order_merchant_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['merchant', 'createdAt'], name='order_merchant_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderassignment',
+            index=models.Index(fields=['user', 'isActive'], name='assignment_user_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderassignment',
+            index=models.Index(fields=['order', 'isActive'], name='assignment_order_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='role',
+            index=models.Index(fields=['name'], name='role_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='status',
+            index=models.Index(fields=['name', 'type'], name='status_name_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='status',
+            index=models.Index(fields=['type'], name='status_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['merchant', 'order', 'createdAt'], name='transaction_merchant_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transactionhistory',
+            index=models.Index(fields=['transaction', 'createdAt'], name='history_transaction_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['merchant', 'role', 'createdAt', 'id'], name='user_merchant_role_created_idx'),
+        ),
+    ]
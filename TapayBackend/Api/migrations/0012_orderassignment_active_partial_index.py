@@ -0,0 +1,17 @@
+# Generated by Django 4.2.19 on 2026-10-17 01:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Api', '0011_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='orderassignment',
+            index=models.Index(condition=models.Q(('isActive', True)), fields=['order'], name='assignment_active_order_idx'),
+        ),
+    ]
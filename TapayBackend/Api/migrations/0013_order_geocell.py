@@ -0,0 +1,41 @@
+# Generated by Django 4.2.19 on 2026-10-17 01:38
+
+from django.db import migrations, models
+
+from Api.utils.GeoUtils import GeoCell
+
+
+def BackfillGeoCells(apps, schema_editor):
+    Order = apps.get_model('Api', 'Order')
+    orders = Order.objects.filter(addressLatitude__isnull=False, addressLongitude__isnull=False)
+
+    batch = []
+    for order in orders.only('id', 'addressLatitude', 'addressLongitude').iterator(chunk_size=2000):
+        order.geoCell = GeoCell(order.addressLatitude, order.addressLongitude)
+        batch.append(order)
+        if len(batch) >= 2000:
+            Order.objects.bulk_update(batch, ['geoCell'])
+            batch = []
+
+    if batch:
+        Order.objects.bulk_update(batch, ['geoCell'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Api', '0012_orderassignment_active_partial_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='geoCell',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['merchant', 'geoCell'], name='order_merchant_geocell_idx'),
+        ),
+        migrations.RunPython(BackfillGeoCells, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.19 on 2026-10-17 01:42
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def BackfillCourierWorkloads(apps, schema_editor):
+    OrderAssignment = apps.get_model('Api', 'OrderAssignment')
+    CourierWorkload = apps.get_model('Api', 'CourierWorkload')
+
+    counts = OrderAssignment.objects.filter(isActive=True).values('user_id', 'order__status_id').annotate(
+        activeCount=models.Count('id')
+    )
+    CourierWorkload.objects.bulk_create([
+        CourierWorkload(user_id=row['user_id'], status_id=row['order__status_id'], activeCount=row['activeCount'])
+        for row in counts
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Api', '0013_order_geocell'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourierWorkload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('activeCount', models.IntegerField(default=0)),
+                ('status', models.ForeignKey(on_delete=django.db.models.deletion.RESTRICT, to='Api.status')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='courierworkload',
+            constraint=models.UniqueConstraint(fields=('user', 'status'), name='workload_user_status_unique'),
+        ),
+        migrations.RunPython(BackfillCourierWorkloads, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+from django.db import migrations
+
+# External-content FTS5 index over the searchable Order columns. Triggers keep
+# it in sync with every write, including the raw inserts of the bulk import.
+CREATE_ORDER_SEARCH = [
+    """
+    CREATE VIRTUAL TABLE Api_order_search USING fts5(
+        title, customerName, addressText, additionalNotes,
+        content='Api_order', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER Api_order_search_insert AFTER INSERT ON Api_order BEGIN
+        INSERT INTO Api_order_search(rowid, title, customerName, addressText, additionalNotes)
+        VALUES (new.id, new.title, new.customerName, new.addressText, new.additionalNotes);
+    END
+    """,
+    """
+    CREATE TRIGGER Api_order_search_delete AFTER DELETE ON Api_order BEGIN
+        INSERT INTO Api_order_search(Api_order_search, rowid, title, customerName, addressText, additionalNotes)
+        VALUES ('delete', old.id, old.title, old.customerName, old.addressText, old.additionalNotes);
+    END
+    """,
+    """
+    CREATE TRIGGER Api_order_search_update
+    AFTER UPDATE OF title, customerName, addressText, additionalNotes ON Api_order BEGIN
+        INSERT INTO Api_order_search(Api_order_search, rowid, title, customerName, addressText, additionalNotes)
+        VALUES ('delete', old.id, old.title, old.customerName, old.addressText, old.additionalNotes);
+        INSERT INTO Api_order_search(rowid, title, customerName, addressText, additionalNotes)
+        VALUES (new.id, new.title, new.customerName, new.addressText, new.additionalNotes);
+    END
+    """,
+    "INSERT INTO Api_order_search(Api_order_search) VALUES ('rebuild')",
+]
+
+DROP_ORDER_SEARCH = [
+    "DROP TRIGGER IF EXISTS Api_order_search_update",
+    "DROP TRIGGER IF EXISTS Api_order_search_delete",
+    "DROP TRIGGER IF EXISTS Api_order_search_insert",
+    "DROP TABLE IF EXISTS Api_order_search",
+]
+
+
+def RunOnSqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Api', '0014_courierworkload'),
+    ]
+
+    operations = [
+        migrations.RunPython(RunOnSqlite(CREATE_ORDER_SEARCH), RunOnSqlite(DROP_ORDER_SEARCH)),
+    ]
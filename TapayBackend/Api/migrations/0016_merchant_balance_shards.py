@@ -0,0 +1,32 @@
+# Generated by Django 4.2.19 on 2026-10-17 01:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Api', '0015_order_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='merchant',
+            name='balanceShards',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='MerchantBalanceShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('balance', models.FloatField(default=0)),
+                ('merchant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='Api.merchant')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='merchantbalanceshard',
+            constraint=models.UniqueConstraint(fields=('merchant', 'shard'), name='balance_shard_unique'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.19 on 2026-10-17 01:53
+
+from django.db import migrations, models
+
+from Api.utils.SearchUtils import RestoreOrderSearchTriggers
+
+
+def BackfillUpdatedAt(apps, schema_editor):
+    for modelName in ('Merchant', 'Order', 'Transaction'):
+        apps.get_model('Api', modelName).objects.update(updatedAt=models.F('createdAt'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Api', '0017_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='merchant',
+            name='updatedAt',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='merchant',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='updatedAt',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='updatedAt',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddIndex(
+            model_name='merchant',
+            index=models.Index(fields=['version'], name='merchant_version_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='merchantbalanceshard',
+            index=models.Index(fields=['merchant', 'balance'], name='balance_shard_balance_idx'),
+        ),
+        migrations.RunPython(BackfillUpdatedAt, migrations.RunPython.noop),
+        # Adding the Order columns rebuilt Api_order, which dropped the search triggers
+        migrations.RunPython(RestoreOrderSearchTriggers, migrations.RunPython.noop),
+    ]
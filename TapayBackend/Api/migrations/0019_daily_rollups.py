@@ -0,0 +1,44 @@
+# Generated by Django 4.2.19 on 2026-10-17 01:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Api', '0018_row_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyTransactionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('paymentMethod', models.CharField(max_length=255)),
+                ('count', models.IntegerField(default=0)),
+                ('amount', models.FloatField(default=0)),
+                ('merchant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='Api.merchant')),
+                ('transactionStatus', models.ForeignKey(on_delete=django.db.models.deletion.RESTRICT, to='Api.status')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyOrderRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('count', models.IntegerField(default=0)),
+                ('merchant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='Api.merchant')),
+                ('status', models.ForeignKey(on_delete=django.db.models.deletion.RESTRICT, to='Api.status')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailytransactionrollup',
+            constraint=models.UniqueConstraint(fields=('merchant', 'day', 'paymentMethod', 'transactionStatus'), name='daily_transaction_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyorderrollup',
+            constraint=models.UniqueConstraint(fields=('merchant', 'day', 'status'), name='daily_order_unique'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 4.2.19 on 2026-10-17 02:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Api', '0019_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=255)),
+                ('amount', models.FloatField()),
+                ('customerName', models.CharField(max_length=255)),
+                ('addressText', models.CharField(max_length=255)),
+                ('addressLongitude', models.FloatField(blank=True, null=True)),
+                ('addressLatitude', models.FloatField(blank=True, null=True)),
+                ('additionalNotes', models.TextField(blank=True, null=True)),
+                ('geoCell', models.BigIntegerField(blank=True, null=True)),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('createdAt', models.DateTimeField()),
+                ('updatedAt', models.DateTimeField()),
+                ('archivedAt', models.DateTimeField()),
+                ('merchant', models.ForeignKey(on_delete=django.db.models.deletion.RESTRICT, to='Api.merchant')),
+                ('status', models.ForeignKey(on_delete=django.db.models.deletion.RESTRICT, to='Api.status')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedTransaction',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('amount', models.FloatField()),
+                ('paymentMethod', models.CharField(max_length=255)),
+                ('balanceAfter', models.FloatField()),
+                ('cardNumber', models.CharField(blank=True, max_length=255, null=True)),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('createdAt', models.DateTimeField()),
+                ('updatedAt', models.DateTimeField()),
+                ('merchant', models.ForeignKey(on_delete=django.db.models.deletion.RESTRICT, to='Api.merchant')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='Api.archivedorder')),
+                ('transactionStatus', models.ForeignKey(on_delete=django.db.models.deletion.RESTRICT, to='Api.status')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedTransactionHistory',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('fieldChanged', models.CharField(max_length=255)),
+                ('oldValue', models.CharField(max_length=255)),
+                ('newValue', models.CharField(max_length=255)),
+                ('createdAt', models.DateTimeField()),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='Api.archivedtransaction')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderAssignment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('assignedAt', models.DateTimeField()),
+                ('isActive', models.BooleanField()),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='Api.archivedorder')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.RESTRICT, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedtransaction',
+            index=models.Index(fields=['merchant', 'id'], name='archived_tx_merchant_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.19 on 2026-10-17 02:36
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Api', '0020_archive_tables'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='orderassignment',
+            name='assignment_active_order_idx',
+        ),
+    ]
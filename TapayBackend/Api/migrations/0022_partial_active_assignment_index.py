@@ -0,0 +1,21 @@
+# Generated by Django 4.2.19 on 2026-10-17 02:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Api', '0021_drop_duplicate_assignment_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='orderassignment',
+            name='assignment_user_active_idx',
+        ),
+        migrations.AddIndex(
+            model_name='orderassignment',
+            index=models.Index(condition=models.Q(('isActive', True)), fields=['user'], name='assignment_active_user_idx'),
+        ),
+    ]
@@ -1,10 +1,42 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.utils import timezone
 import uuid
 from django.core.exceptions import ValidationError
 
+from .utils.GeoUtils import GeoCell
+
 # Create your models here.
+class VersionedModel(models.Model):
+    """
+    Abstract model whose rows carry a version that every save increments.
+
+    (id, version, updatedAt) identifies the state of a row, which makes
+    ETags and Last-Modified headers cheap. Queryset updates must bump the
+    version themselves with VersionBump().
+    """
+    version = models.PositiveIntegerField(default = 1)
+    updatedAt = models.DateTimeField(auto_now = True)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        updateFields = kwargs.get('update_fields')
+
+        if not self._state.adding and (updateFields is None or updateFields):
+            self.version += 1
+            if updateFields is not None:
+                kwargs['update_fields'] = set(updateFields) | {'version', 'updatedAt'}
+
+        super().save(*args, **kwargs)
+
+def VersionBump():
+    """
+    Fields for QuerySet.update() that record a change like VersionedModel.save does.
+    """
+    return {'version': models.F('version') + 1, 'updatedAt': timezone.now()}
+
 class CustomUserManager(BaseUserManager):
     def create_user(self, email, fullName, password=None, **extra_fields):
         if not email:
@@ -62,6 +94,9 @@ class User(AbstractBaseUser, PermissionsMixin):
         verbose_name = 'user'
         verbose_name_plural = 'users'
         ordering = ['-createdAt']
+        indexes = [
+            models.Index(fields = ['merchant', 'role', 'createdAt', 'id'], name = 'user_merchant_role_created_idx'),
+        ]
 
     def __str__(self):
         return self.email
@@ -80,11 +115,16 @@ class User(AbstractBaseUser, PermissionsMixin):
 class Role(models.Model):
     name = models.CharField(max_length = 255)
     requiresMerchant = models.BooleanField(default=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields = ['name'], name = 'role_name_idx'),
+        ]
     
     def __str__(self):
         return self.name
 
-class Merchant(models.Model):
+class Merchant(VersionedModel):
     name = models.CharField(max_length = 255)
     contactEmail = models.CharField(max_length = 255)
     contactPhone = models.CharField(max_length = 255)
@@ -92,12 +132,21 @@ class Merchant(models.Model):
     isActive = models.BooleanField(default = 1)
     currentBalance = models.FloatField(default = 0)
 
+    # Number of MerchantBalanceShard rows that take balance deltas, 0 writes to currentBalance directly
+    balanceShards = models.PositiveSmallIntegerField(default = 0)
+
     createdAt = models.DateTimeField(auto_now_add = True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields = ['createdAt'], name = 'merchant_created_idx'),
+            models.Index(fields = ['version'], name = 'merchant_version_idx'),
+        ]
     
     def __str__(self):
         return self.name
     
-class Order(models.Model):
+class Order(VersionedModel):
     title = models.CharField(max_length = 255)
     amount = models.FloatField()
     customerName = models.CharField(max_length = 255)
@@ -106,23 +155,154 @@ class Order(models.Model):
     addressLatitude = models.FloatField(blank = True, null = True)
     additionalNotes = models.TextField(blank = True, null = True)
 
+    # Grid cell of the address coordinates, see utils.GeoUtils
+    geoCell = models.BigIntegerField(blank = True, null = True, editable = False)
+
     createdAt = models.DateTimeField(auto_now_add = True)
 
     status = models.ForeignKey(to = "Status", on_delete = models.RESTRICT)
     merchant = models.ForeignKey(to = "Merchant", on_delete = models.RESTRICT)
     orderAssignments = models.ManyToManyField(to = "User", through = "OrderAssignment")
 
+    # Status names after which an order no longer needs a courier
+    CLOSED_STATUSES = ("Delivered", "Completed", "Cancelled", "Returned", "Refunded", "Failed")
+
+    class Meta:
+        indexes = [
+            models.Index(fields = ['merchant', 'status', 'createdAt'], name = 'order_merchant_status_idx'),
+            models.Index(fields = ['merchant', 'createdAt'], name = 'order_merchant_created_idx'),
+            models.Index(fields = ['merchant', 'geoCell'], name = 'order_merchant_geocell_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so that status changes can be detected on save
+        instance._loadedStatusId = instance.__dict__.get('status_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.geoCell = GeoCell(self.addressLatitude, self.addressLongitude)
+
+        updateFields = kwargs.get('update_fields')
+        if updateFields is not None and {'addressLatitude', 'addressLongitude'} & set(updateFields):
+            kwargs['update_fields'] = set(updateFields) | {'geoCell'}
+
+        # post_save moves the workload and rollup counters, they commit or roll back with the row
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
 class OrderAssignment(models.Model):
     order = models.ForeignKey(to = "Order", on_delete = models.RESTRICT)
     user = models.ForeignKey(to = "User", on_delete = models.RESTRICT)
 
     assignedAt = models.DateTimeField(auto_now_add = True)
     isActive = models.BooleanField(default = True)
+
+    class Meta:
+        indexes = [
+            # Couriers' current orders; inactive assignments are history and stay out of the index
+            models.Index(fields = ['user'], condition = models.Q(isActive = True), name = 'assignment_active_user_idx'),
+            models.Index(fields = ['order', 'isActive'], name = 'assignment_order_active_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.fullName} - {self.order.title}"
 
-class Transaction(models.Model):
+class MerchantBalanceShard(models.Model):
+    """
+    Sub-counter of a merchant balance, the balance is currentBalance plus all shards.
+    """
+    merchant = models.ForeignKey(to = "Merchant", on_delete = models.CASCADE)
+    shard = models.PositiveSmallIntegerField()
+    balance = models.FloatField(default = 0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields = ['merchant', 'shard'], name = 'balance_shard_unique'),
+        ]
+        indexes = [
+            models.Index(fields = ['merchant', 'balance'], name = 'balance_shard_balance_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.merchant_id}#{self.shard}: {self.balance}"
+
+class IdempotencyKey(models.Model):
+    """
+    Response stored for an Idempotency-Key header, replayed when the request is retried.
+    """
+    key = models.CharField(max_length = 255)
+    user = models.ForeignKey(to = "User", on_delete = models.CASCADE)
+    requestHash = models.CharField(max_length = 64)
+
+    # Empty while the first request with this key is still being processed
+    statusCode = models.PositiveSmallIntegerField(blank = True, null = True)
+    responseBody = models.TextField(blank = True, null = True)
+
+    createdAt = models.DateTimeField(auto_now_add = True)
+    expiresAt = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields = ['user', 'key'], name = 'idempotency_user_key_unique'),
+        ]
+        indexes = [
+            models.Index(fields = ['expiresAt'], name = 'idempotency_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.key}"
+
+class DailyTransactionRollup(models.Model):
+    """
+    Count and amount of a merchant's transactions per day, payment method and status.
+    """
+    merchant = models.ForeignKey(to = "Merchant", on_delete = models.CASCADE)
+    day = models.DateField()
+    paymentMethod = models.CharField(max_length = 255)
+    transactionStatus = models.ForeignKey(to = "Status", on_delete = models.RESTRICT)
+    count = models.IntegerField(default = 0)
+    amount = models.FloatField(default = 0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields = ['merchant', 'day', 'paymentMethod', 'transactionStatus'], name = 'daily_transaction_unique'
+            ),
+        ]
+
+class DailyOrderRollup(models.Model):
+    """
+    Number of a merchant's orders created per day, by their current status.
+    """
+    merchant = models.ForeignKey(to = "Merchant", on_delete = models.CASCADE)
+    day = models.DateField()
+    status = models.ForeignKey(to = "Status", on_delete = models.RESTRICT)
+    count = models.IntegerField(default = 0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields = ['merchant', 'day', 'status'], name = 'daily_order_unique'),
+        ]
+
+class CourierWorkload(models.Model):
+    """
+    Number of orders actively assigned to a courier, per order status.
+    """
+    user = models.ForeignKey(to = "User", on_delete = models.CASCADE)
+    status = models.ForeignKey(to = "Status", on_delete = models.RESTRICT)
+    activeCount = models.IntegerField(default = 0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields = ['user', 'status'], name = 'workload_user_status_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} | {self.status_id}: {self.activeCount}"
+
+class Transaction(VersionedModel):
     amount = models.FloatField()
     paymentMethod = models.CharField(max_length = 255)
     balanceAfter = models.FloatField()
@@ -134,6 +314,22 @@ class Transaction(models.Model):
     merchant = models.ForeignKey(to = "Merchant", on_delete = models.RESTRICT)
     order = models.ForeignKey(to = "Order", on_delete = models.RESTRICT)
 
+    class Meta:
+        indexes = [
+            models.Index(fields = ['merchant', 'order', 'createdAt'], name = 'transaction_merchant_order_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so that the daily rollups can be corrected on save
+        instance._loadedRollup = (
+            instance.__dict__.get('paymentMethod'),
+            instance.__dict__.get('transactionStatus_id'),
+            instance.__dict__.get('amount'),
+        )
+        return instance
+
 class TransactionHistory(models.Model):
     fieldChanged = models.CharField(max_length = 255)
     oldValue = models.CharField(max_length = 255)
@@ -143,6 +339,80 @@ class TransactionHistory(models.Model):
 
     transaction = models.ForeignKey(to = "Transaction", on_delete = models.RESTRICT)
 
+    class Meta:
+        indexes = [
+            models.Index(fields = ['transaction', 'createdAt'], name = 'history_transaction_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.fieldChanged}: {self.oldValue} -> {self.newValue}"
+
+class ArchivedOrder(models.Model):
+    """
+    Closed order moved out of the Order table by the archival, with its original ID.
+    """
+    id = models.BigIntegerField(primary_key = True)
+    title = models.CharField(max_length = 255)
+    amount = models.FloatField()
+    customerName = models.CharField(max_length = 255)
+    addressText = models.CharField(max_length = 255)
+    addressLongitude = models.FloatField(blank = True, null = True)
+    addressLatitude = models.FloatField(blank = True, null = True)
+    additionalNotes = models.TextField(blank = True, null = True)
+    geoCell = models.BigIntegerField(blank = True, null = True)
+
+    version = models.PositiveIntegerField(default = 1)
+    createdAt = models.DateTimeField()
+    updatedAt = models.DateTimeField()
+    archivedAt = models.DateTimeField()
+
+    status = models.ForeignKey(to = "Status", on_delete = models.RESTRICT)
+    merchant = models.ForeignKey(to = "Merchant", on_delete = models.RESTRICT)
+
+    def __str__(self):
+        return self.title
+
+class ArchivedOrderAssignment(models.Model):
+    id = models.BigIntegerField(primary_key = True)
+    order = models.ForeignKey(to = "ArchivedOrder", on_delete = models.CASCADE)
+    user = models.ForeignKey(to = "User", on_delete = models.RESTRICT)
+
+    assignedAt = models.DateTimeField()
+    isActive = models.BooleanField()
+
+class ArchivedTransaction(models.Model):
+    """
+    Transaction of an archived order, with its original ID.
+    """
+    id = models.BigIntegerField(primary_key = True)
+    amount = models.FloatField()
+    paymentMethod = models.CharField(max_length = 255)
+    balanceAfter = models.FloatField()
+    cardNumber = models.CharField(max_length = 255, blank = True, null = True)
+
+    version = models.PositiveIntegerField(default = 1)
+    createdAt = models.DateTimeField()
+    updatedAt = models.DateTimeField()
+
+    transactionStatus = models.ForeignKey(to = "Status", on_delete = models.RESTRICT)
+    merchant = models.ForeignKey(to = "Merchant", on_delete = models.RESTRICT)
+    order = models.ForeignKey(to = "ArchivedOrder", on_delete = models.CASCADE)
+
+    class Meta:
+        indexes = [
+            models.Index(fields = ['merchant', 'id'], name = 'archived_tx_merchant_idx'),
+        ]
+
+class ArchivedTransactionHistory(models.Model):
+    id = models.BigIntegerField(primary_key = True)
+    fieldChanged = models.CharField(max_length = 255)
+    oldValue = models.CharField(max_length = 255)
+    newValue = models.CharField(max_length = 255)
+
+    createdAt = models.DateTimeField()
+
+    transaction = models.ForeignKey(to = "ArchivedTransaction", on_delete = models.CASCADE)
+
     def __str__(self):
         return f"{self.fieldChanged}: {self.oldValue} -> {self.newValue}"
 
@@ -150,6 +420,12 @@ class Status(models.Model):
     name = models.CharField(max_length = 255)
     type = models.CharField(max_length = 255)
 
+    class Meta:
+        indexes = [
+            models.Index(fields = ['name', 'type'], name = 'status_name_type_idx'),
+            models.Index(fields = ['type'], name = 'status_type_idx'),
+        ]
+
     def __str__(self):
         return f"{self.type} | {self.name}"
     
@@ -167,4 +443,7 @@ class Contact(models.Model):
         return f"{self.businessName} - {self.contactName}"
     
     class Meta:
-        ordering = ['createdAt']
\ No newline at end of file
+        ordering = ['createdAt']
+        indexes = [
+            models.Index(fields = ['createdAt'], name = 'contact_created_idx'),
+        ]
\ No newline at end of file
@@ -1,13 +1,35 @@
 from rest_framework import serializers
+from rest_framework.exceptions import AuthenticationFailed, Throttled
 from django.contrib.auth import get_user_model
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from django.db.models import Prefetch
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from .models import *
+from .utils.BlacklistUtils import CachedRefreshToken
+from .utils.LoginUtils import LoginRetryAfter, RecordFailedLogin, RecordLogin
 
 User = get_user_model()
 
-class OrderSerializer(serializers.ModelSerializer):
+class EagerLoadingMixin:
+    """
+    Lets a serializer declare the relations it reads through `select_related`
+    and `prefetch_related` on its Meta, so views can load them up front.
+    """
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        selectRelated = getattr(cls.Meta, 'select_related', None)
+        prefetchRelated = getattr(cls.Meta, 'prefetch_related', None)
+
+        if selectRelated:
+            queryset = queryset.select_related(*selectRelated)
+        if prefetchRelated:
+            queryset = queryset.prefetch_related(*prefetchRelated)
+
+        return queryset
+
+class OrderSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     merchantName = serializers.SerializerMethodField()
     merchantId = serializers.SerializerMethodField()
     statusName = serializers.SerializerMethodField()
@@ -30,6 +52,7 @@ class OrderSerializer(serializers.ModelSerializer):
             "statusName",
             "statusId"
         ]
+        select_related = ['merchant', 'status']
 
     def get_merchantName(self, obj):
         return obj.merchant.name
@@ -43,13 +66,14 @@ class OrderSerializer(serializers.ModelSerializer):
     def get_statusId(self, obj):
         return obj.status.id
     
-class OrderAssignmentSerializer(serializers.ModelSerializer):
+class OrderAssignmentSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     userFullName = serializers.SerializerMethodField()
     userEmail = serializers.SerializerMethodField()
 
     class Meta:
         model = OrderAssignment
         fields = ['id', 'user', 'isActive', 'userFullName', 'userEmail', 'assignedAt']
+        select_related = ['user']
 
     def get_userFullName(self, obj):
         return obj.user.fullName
@@ -57,7 +81,7 @@ class OrderAssignmentSerializer(serializers.ModelSerializer):
     def get_userEmail(self, obj):
         return obj.user.email
 
-class SingleOrderSerializer(serializers.ModelSerializer):
+class SingleOrderSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     merchantName = serializers.SerializerMethodField()
     merchantId = serializers.SerializerMethodField()
     statusName = serializers.SerializerMethodField()
@@ -82,6 +106,13 @@ class SingleOrderSerializer(serializers.ModelSerializer):
             "statusId",
             "orderAssignments"
         ]
+        select_related = ['merchant', 'status']
+        prefetch_related = [
+            Prefetch(
+                'orderassignment_set',
+                queryset = OrderAssignmentSerializer.setup_eager_loading(OrderAssignment.objects.all())
+            )
+        ]
 
     def get_merchantName(self, obj):
         return obj.merchant.name
@@ -96,9 +127,9 @@ class SingleOrderSerializer(serializers.ModelSerializer):
         return obj.status.id
     
     def get_orderAssignments(self, obj):
-        return OrderAssignmentSerializer(OrderAssignment.objects.filter(order=obj), many=True).data
+        return OrderAssignmentSerializer(obj.orderassignment_set.all(), many=True).data
 
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     merchantName = serializers.SerializerMethodField()
     merchantId = serializers.SerializerMethodField()
     statusName = serializers.SerializerMethodField()
@@ -120,6 +151,7 @@ class TransactionSerializer(serializers.ModelSerializer):
             "statusId",
             "orderId"
         ]
+        select_related = ['merchant', 'transactionStatus']
     
     def get_merchantName(self, obj):
         return obj.merchant.name
@@ -134,9 +166,34 @@ class TransactionSerializer(serializers.ModelSerializer):
         return obj.transactionStatus.id
     
     def get_orderId(self, obj):
-        return obj.order.id
+        return obj.order_id
+
+class ArchivedOrderAssignmentSerializer(OrderAssignmentSerializer):
+    class Meta(OrderAssignmentSerializer.Meta):
+        model = ArchivedOrderAssignment
+
+class ArchivedOrderSerializer(SingleOrderSerializer):
+    """
+    Serializes archived orders like live ones.
+    """
+
+    class Meta(SingleOrderSerializer.Meta):
+        model = ArchivedOrder
+        prefetch_related = [
+            Prefetch(
+                'archivedorderassignment_set',
+                queryset = ArchivedOrderAssignmentSerializer.setup_eager_loading(ArchivedOrderAssignment.objects.all())
+            )
+        ]
+
+    def get_orderAssignments(self, obj):
+        return ArchivedOrderAssignmentSerializer(obj.archivedorderassignment_set.all(), many=True).data
+
+class ArchivedTransactionSerializer(TransactionSerializer):
+    class Meta(TransactionSerializer.Meta):
+        model = ArchivedTransaction
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     roleName = serializers.SerializerMethodField()
     merchantName = serializers.SerializerMethodField()
 
@@ -144,6 +201,7 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ('id', 'email', 'fullName', 'is_active', 'is_staff', 'emailVerified', 'phoneNumber', 'role', 'roleName', 'merchant', 'merchantName')
         read_only_fields = ('id', 'email', 'is_active', 'is_staff', 'role', 'roleName', 'merchant', 'merchantName')
+        select_related = ['role', 'merchant']
     
     def get_roleName(self, obj):
         if obj.role:
@@ -158,6 +216,23 @@ class UserSerializer(serializers.ModelSerializer):
             return None
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    def validate(self, attrs):
+        email = attrs[self.username_field]
+
+        # Locked-out accounts are rejected before the password is hashed
+        retryAfter = LoginRetryAfter(email)
+        if retryAfter:
+            raise Throttled(wait=retryAfter, detail="Too many failed login attempts")
+
+        try:
+            data = super().validate(attrs)
+        except AuthenticationFailed:
+            RecordFailedLogin(email)
+            raise
+
+        RecordLogin(self.user)
+        return data
+
     @classmethod
     def get_token(cls, user):
         token = super().get_token(user)
@@ -169,6 +244,9 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         
         return token
 
+class CachedTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = CachedRefreshToken
+
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, style={'input_type': 'password'})
     password2 = serializers.CharField(write_only=True, required=True, style={'input_type': 'password'})
@@ -208,13 +286,20 @@ class ContactSerializer(serializers.ModelSerializer):
                  'businessType', 'driversCount', 'message', 'createdAt']
         read_only_fields = ['id', 'createdAt']
 
-class MerchantSerializer(serializers.ModelSerializer):
+class MerchantSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    currentBalance = serializers.SerializerMethodField()
+
     class Meta:
         model = Merchant
         fields = ['id', 'name', 'contactEmail', 'contactPhone', 'address', 'isActive', 'currentBalance']
         read_only_fields = ['id', 'createdAt']
+        prefetch_related = ['merchantbalanceshard_set']
+
+    def get_currentBalance(self, obj):
+        # Sharded merchants hold part of their balance in the shard rows
+        return obj.currentBalance + sum(shard.balance for shard in obj.merchantbalanceshard_set.all())
 
-class CourierSerializer(serializers.ModelSerializer):
+class CourierSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     totalOrders = serializers.SerializerMethodField()
     ordersByStatus = serializers.SerializerMethodField()
 
@@ -222,22 +307,26 @@ class CourierSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'email', 'fullName', 'is_active', 'phoneNumber', 'totalOrders', 'ordersByStatus']
         read_only_fields = ['id']
+        prefetch_related = [
+            Prefetch(
+                'courierworkload_set',
+                queryset = CourierWorkload.objects.filter(activeCount__gt=0).select_related('status'),
+                to_attr = 'activeWorkloads'
+            )
+        ]
+
+    def activeWorkloads(self, obj):
+        if hasattr(obj, 'activeWorkloads'):
+            return obj.activeWorkloads
+        return CourierWorkload.objects.filter(user=obj, activeCount__gt=0).select_related('status')
 
     def get_totalOrders(self, obj):
-        return OrderAssignment.objects.filter(user=obj, isActive=True).count()
+        return sum(workload.activeCount for workload in self.activeWorkloads(obj))
 
     def get_ordersByStatus(self, obj):
-        assignments = OrderAssignment.objects.filter(user=obj, isActive=True)
-        orders = Order.objects.filter(id__in=assignments.values_list('order', flat=True))
-        
-        statusCounts = {}
-        for order in orders:
-            status = order.status.name
-            statusCounts[status] = statusCounts.get(status, 0) + 1
-            
-        return statusCounts
-
-class StatusSerializer(serializers.ModelSerializer):
+        return {workload.status.name: workload.activeCount for workload in self.activeWorkloads(obj)}
+
+class StatusSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     class Meta:
         model = Status
         fields = ['id', 'name', 'type']
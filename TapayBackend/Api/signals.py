@@ -0,0 +1,97 @@
+"""
+Signal handlers for the API application.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Merchant, Order, Role, Status, Transaction, User
+from .utils.AuthUtils import InvalidateUser, InvalidateUsers
+from .utils.RegistryUtils import InvalidateRoles, InvalidateStatuses
+from .utils.RollupUtils import (
+    AddTransactionDelta, ApplyOrderRollups, ApplyTransactionRollups, RollupDay, TransactionDeltas
+)
+from .utils.WorkloadUtils import MoveOrderWorkload
+
+
+@receiver(post_save, sender=Order)
+def UpdateCountersOnOrderSave(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Count new orders in the daily rollup, and move the active assignee's
+    workload and the rollup between statuses when an order changes status.
+    """
+    if update_fields is not None and 'status' not in update_fields and 'status_id' not in update_fields:
+        return
+
+    day = RollupDay(instance.createdAt)
+    loadedStatusId = getattr(instance, '_loadedStatusId', None)
+
+    if created:
+        ApplyOrderRollups({(instance.merchant_id, day, instance.status_id): (1,)})
+    elif loadedStatusId is not None and loadedStatusId != instance.status_id:
+        MoveOrderWorkload(instance.pk, loadedStatusId, instance.status_id)
+        ApplyOrderRollups({
+            (instance.merchant_id, day, loadedStatusId): (-1,),
+            (instance.merchant_id, day, instance.status_id): (1,),
+        })
+
+    instance._loadedStatusId = instance.status_id
+
+
+@receiver(post_save, sender=Transaction)
+def UpdateRollupsOnTransactionSave(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Keep the daily transaction rollup in step with created and changed transactions.
+    """
+    if update_fields is not None and not {'amount', 'paymentMethod', 'transactionStatus'} & set(update_fields):
+        return
+
+    deltas = TransactionDeltas()
+    AddTransactionDelta(deltas, instance, created)
+    ApplyTransactionRollups(deltas)
+
+    instance._loadedRollup = (instance.paymentMethod, instance.transactionStatus_id, instance.amount)
+
+
+@receiver(post_save, sender=Status)
+@receiver(post_delete, sender=Status)
+def InvalidateStatusRegistry(sender, **kwargs):
+    """
+    Drop the cached statuses now and again once the change is committed.
+    """
+    InvalidateStatuses()
+    transaction.on_commit(InvalidateStatuses)
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def InvalidateRoleRegistry(sender, **kwargs):
+    """
+    Drop the cached roles, and the cached users carrying them, now and again once the change is committed.
+    """
+    InvalidateRoles()
+    InvalidateUsers()
+    transaction.on_commit(InvalidateRoles)
+    transaction.on_commit(InvalidateUsers)
+
+
+@receiver(post_save, sender=Merchant)
+@receiver(post_delete, sender=Merchant)
+def InvalidateMerchantUsers(sender, **kwargs):
+    """
+    Drop the cached users, which carry their merchant, now and again once the change is committed.
+    """
+    InvalidateUsers()
+    transaction.on_commit(InvalidateUsers)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def InvalidateCachedUser(sender, instance, **kwargs):
+    """
+    Drop the cached user now and again once the change is committed.
+    """
+    userId = instance.pk
+    InvalidateUser(userId)
+    transaction.on_commit(lambda: InvalidateUser(userId))
@@ -1,3 +1,1361 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import re
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from TapayBackend.routers import PIN_COOKIE, PIN_HEADER, ReadReplicaRouter, ReplicaRoutingMiddleware
+
+from .models import (
+    Merchant, Order, OrderAssignment, Transaction, TransactionHistory, Status, Role, User, Contact, CourierWorkload,
+    IdempotencyKey, DailyTransactionRollup, DailyOrderRollup, ArchivedOrder, ArchivedOrderAssignment,
+    ArchivedTransaction, ArchivedTransactionHistory
+)
+from .utils.AssignmentUtils import AssignOrders
+from .utils.AuthUtils import InvalidateUsers
+from .utils.BlacklistUtils import InvalidateBlacklist, IsBlacklisted, TokenBlacklist
+from .utils.ContactQueueUtils import ContactQueue, ContactTokenBucketThrottle, FlushContacts, CONTACT_BURST
+from .utils.LoginUtils import FlushLoginRecords, LoginThrottle, MAX_FAILED_LOGINS, ResetLoginThrottle
+from .utils.IdempotencyUtils import IDEMPOTENCY_LEASE, RequestFingerprint, ReserveKey, _storedResponses as idempotencyCache
+from .utils.RegistryUtils import GetStatus, LoadReferenceData, RoleIds, StatusIds
+from .utils.LedgerUtils import FindBalanceChainBreaks, FoldBalanceShards, MerchantBalance, ScanLedger, SetBalanceShards
+from .utils.GeoUtils import HaversineMatrixKm
+from .utils.RouteUtils import NearestNeighbourPath, TwoOptPath
+
+# A plan step that reads a whole table without any index
+FULL_SCAN = re.compile(r'^SCAN (\S+)$')
+
+
+class ApiTestCase(TestCase):
+    """
+    Base test case with a merchant, a courier, an order with one transaction and a contact.
+    """
+
+    def setUp(self):
+        self.merchant = Merchant.objects.create(
+            name="Merchant", contactEmail="merchant@tapay.com", contactPhone="0100", address="Street 1"
+        )
+        self.orderStatus = Status.objects.create(name="Pending", type="Order")
+        self.transactionStatus = Status.objects.create(name="Pending", type="Transaction")
+        Status.objects.create(name="Settled", type="Transaction")
+        self.driverRole = Role.objects.create(name="Driver")
+
+        self.courier = User.objects.create_user(
+            "courier@tapay.com", "Courier Driver", "password", role=self.driverRole, merchant=self.merchant
+        )
+        self.order = self.createOrder()
+        AssignOrders([(self.order.id, self.courier.id)])
+        self.transaction = Transaction.objects.create(
+            amount=10, paymentMethod="Cash", balanceAfter=10, transactionStatus=self.transactionStatus,
+            merchant=self.merchant, order=self.order
+        )
+        TransactionHistory.objects.create(
+            fieldChanged="amount", oldValue="5", newValue="10", transaction=self.transaction
+        )
+        self.contact = Contact.objects.create(
+            businessName="Business", contactName="Contact", email="contact@tapay.com", phone="0100",
+            businessType="Retail", driversCount="1-5", message="Hello"
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.courier)
+
+        # Reference data is served from memory once loaded, as in a warm process
+        LoadReferenceData()
+
+    def createOrder(self, **fields):
+        data = {
+            "title": "Order", "amount": 10, "customerName": "Customer", "addressText": "Street 2",
+            "status": self.orderStatus, "merchant": self.merchant,
+        }
+        data.update(fields)
+        return Order.objects.create(**data)
+
+    def viewRequests(self):
+        """
+        One request per endpoint served by the views in Api/views.
+        """
+        merchantUrl = f"/api/merchants/{self.merchant.id}"
+        orderUrl = f"{merchantUrl}/orders/{self.order.id}"
+
+        return [
+            ("get", "/api/merchants/", {}),
+            ("get", f"{merchantUrl}/couriers/", {}),
+            ("get", f"{merchantUrl}/orders/", {}),
+            ("get", f"{merchantUrl}/orders/", {"status": "Pending"}),
+            ("get", f"{merchantUrl}/orders/", {"q": "Cust"}),
+            ("get", f"{orderUrl}/", {}),
+            ("get", f"{orderUrl}/transactions/", {}),
+            ("post", f"{orderUrl}/transactions/", {"amount": 5, "paymentMethod": "Cash", "status": "Pending"}),
+            ("get", f"{orderUrl}/transactions/{self.transaction.id}/", {}),
+            ("put", f"{orderUrl}/transactions/{self.transaction.id}/", {"status": "Settled"}),
+            ("patch", f"{merchantUrl}/transactions/", {"transactions": [{"id": self.transaction.id, "status": "Settled"}]}),
+            ("post", f"{orderUrl}/order-assignments/", {"userId": str(self.courier.id)}),
+            ("get", f"/api/couriers/{self.courier.id}/orders/", {}),
+            ("get", f"/api/couriers/{self.courier.id}/orders/", {"status": "Pending"}),
+            ("get", "/api/contacts/", {}),
+            ("get", f"/api/contacts/{self.contact.id}/", {}),
+            ("get", "/api/statuses/", {"type": "Order"}),
+            ("get", "/api/auth/profile/", {}),
+            ("get", f"{merchantUrl}/orders/export/", {"from": "2020-01-01"}),
+            ("get", f"{merchantUrl}/transactions/export/", {"output": "ndjson"}),
+            ("get", f"/api/couriers/{self.courier.id}/nearby-orders/", {"lat": 30.05, "lng": 31.24, "radius": 20}),
+            ("get", f"/api/couriers/{self.courier.id}/route/", {"lat": 30.05, "lng": 31.24}),
+            ("post", f"{merchantUrl}/dispatch/", {"maxOrdersPerCourier": 5}),
+            ("get", f"{merchantUrl}/reports/", {}),
+        ]
+
+
+class QueryPlanTests(ApiTestCase):
+    """
+    Every query issued by the views must be answered through an index.
+    """
+
+    def explain(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            return [row[3] for row in cursor.fetchall()]
+
+    def test_active_assignments_use_the_partial_index(self):
+        queryset = OrderAssignment.objects.filter(user__in=[self.courier.id], isActive=True).values("order")
+
+        plan = self.explain(*queryset.query.sql_with_params())
+
+        self.assertTrue(any("assignment_active_user_idx" in step for step in plan), plan)
+
+    def test_views_do_not_scan_tables(self):
+        for method, url, data in self.viewRequests():
+            with CaptureQueriesContext(connection) as context:
+                response = getattr(self.client, method)(url, data, format="json")
+                if response.streaming:
+                    b"".join(response.streaming_content)
+            self.assertLess(response.status_code, 400, f"{method.upper()} {url}: {response}")
+
+            for query in context.captured_queries:
+                sql = query["sql"]
+                if not sql.startswith(("SELECT", "UPDATE", "DELETE")):
+                    continue
+
+                # captured SQL has its parameters inlined already
+                for step in self.explain(sql):
+                    self.assertIsNone(
+                        FULL_SCAN.match(step),
+                        f"{method.upper()} {url} scans a full table: {step}\n{sql}"
+                    )
+
+
+class QueryBudgetTests(ApiTestCase):
+    """
+    The number of queries issued by a view must not depend on the page size.
+    """
+
+    # Maximum number of queries per endpoint, keyed by URL suffix
+    BUDGETS = {
+        "merchants": 5,
+        "couriers": 4,
+        "orders": 3,
+        "order": 3,
+        "transactions": 3,
+        "transaction": 3,
+        "courier-orders": 3,
+    }
+
+    def setUp(self):
+        super().setUp()
+        otherCourier = User.objects.create_user(
+            "other@tapay.com", "Other Driver", "password", role=self.driverRole, merchant=self.merchant
+        )
+        for index in range(30):
+            order = self.createOrder(title=f"Order {index}")
+            AssignOrders([(order.id, self.courier.id if index % 2 else otherCourier.id)])
+            Transaction.objects.create(
+                amount=index, paymentMethod="Cash", balanceAfter=index, transactionStatus=self.transactionStatus,
+                merchant=self.merchant, order=self.order
+            )
+        for index in range(5):
+            Merchant.objects.create(
+                name=f"Merchant {index}", contactEmail="merchant@tapay.com", contactPhone="0100", address="Street 1"
+            )
+
+    def endpoints(self):
+        merchantUrl = f"/api/merchants/{self.merchant.id}"
+        orderUrl = f"{merchantUrl}/orders/{self.order.id}"
+
+        return {
+            "merchants": "/api/merchants/",
+            "couriers": f"{merchantUrl}/couriers/",
+            "orders": f"{merchantUrl}/orders/",
+            "order": f"{orderUrl}/",
+            "transactions": f"{orderUrl}/transactions/",
+            "transaction": f"{orderUrl}/transactions/{self.transaction.id}/",
+            "courier-orders": f"/api/couriers/{self.courier.id}/orders/",
+        }
+
+    def countQueries(self, url, params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return len(context.captured_queries), response
+
+    def test_views_stay_within_query_budget(self):
+        for name, url in self.endpoints().items():
+            for pageSize in (1, 10, 100):
+                queries, _ = self.countQueries(url, {"page_size": pageSize})
+                self.assertLessEqual(
+                    queries, self.BUDGETS[name], f"{url} with page_size={pageSize} ran {queries} queries"
+                )
+
+    def test_cursor_pages_stay_within_query_budget(self):
+        for name in ("merchants", "couriers", "orders", "transactions", "courier-orders"):
+            url = self.endpoints()[name]
+            _, response = self.countQueries(url, {"page_size": 1})
+            cursor = response.data["meta"]["nextCursor"]
+
+            # keyset pages skip the COUNT(*) of page-number pagination
+            queries, _ = self.countQueries(url, {"page_size": 1, "cursor": cursor})
+            self.assertLessEqual(queries, self.BUDGETS[name] - 1, f"{url} with a cursor ran {queries} queries")
+
+
+class PaginationTests(ApiTestCase):
+
+    def page(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        # Orders are listed under "orders", couriers directly
+        items = response.data["data"]
+        items = items["orders"] if isinstance(items, dict) else items
+        return [item["id"] for item in items], response.data["meta"]
+
+    def walk(self, url, pageSize):
+        """
+        Collect the ids of every page forwards from the first page, then backwards from the last.
+        """
+        ids, meta = self.page(url, page_size=pageSize)
+        forward = [ids]
+        while meta["nextCursor"]:
+            ids, meta = self.page(url, page_size=pageSize, cursor=meta["nextCursor"])
+            forward.append(ids)
+
+        backward = [ids]
+        while meta["previousCursor"]:
+            ids, meta = self.page(url, page_size=pageSize, cursor=meta["previousCursor"])
+            backward.insert(0, ids)
+        return forward, backward
+
+    def test_walks_cover_tied_timestamps_once(self):
+        for index in range(6):
+            self.createOrder(title=f"Order {index}")
+        # A bulk import gives a whole chunk the same createdAt
+        Order.objects.update(createdAt=timezone.now())
+
+        forward, backward = self.walk(f"/api/merchants/{self.merchant.id}/orders/", 3)
+
+        ids = [orderId for page in forward for orderId in page]
+        self.assertEqual(sorted(ids), sorted(Order.objects.values_list("id", flat=True)))
+        self.assertEqual(len(set(ids)), 7)
+        self.assertEqual(backward, forward)
+
+    def test_courier_cursors_carry_uuids(self):
+        for index in range(4):
+            User.objects.create_user(
+                f"driver{index}@tapay.com", "Driver", "password", role=self.driverRole, merchant=self.merchant
+            )
+        User.objects.update(createdAt=timezone.now())
+
+        forward, backward = self.walk(f"/api/merchants/{self.merchant.id}/couriers/", 2)
+
+        ids = [courierId for page in forward for courierId in page]
+        self.assertEqual(sorted(ids), sorted(str(pk) for pk in User.objects.values_list("id", flat=True)))
+        self.assertEqual(backward, forward)
+
+    def test_invalid_and_tampered_cursors_are_rejected(self):
+        url = f"/api/merchants/{self.merchant.id}/orders/"
+        self.createOrder()
+        cursor = self.page(url, page_size=1)[1]["nextCursor"]
+
+        def encode(payload):
+            return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+        createdAt = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))[0]
+        for tampered in (
+            "not-a-cursor", cursor[:-2], encode({"a": 1}), encode([createdAt, "1", "x"]),
+            encode(["yesterday", "1", "n"]), encode([createdAt, "not-an-id", "n"]),
+        ):
+            response = self.client.get(url, {"cursor": tampered})
+            self.assertEqual(response.status_code, 400, tampered)
+        couriersUrl = f"/api/merchants/{self.merchant.id}/couriers/"
+        self.assertEqual(self.client.get(couriersUrl, {"cursor": encode([createdAt, "1", "n"])}).status_code, 400)
+
+    def test_page_size_is_clamped(self):
+        url = f"/api/merchants/{self.merchant.id}/orders/"
+
+        self.assertEqual(self.page(url, page_size=500)[1]["pageSize"], 100)
+        self.assertEqual(self.client.get(url, {"page_size": 0}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"page_size": "ten"}).status_code, 400)
+
+
+class BulkOrderImportTests(ApiTestCase):
+
+    def post(self, body, contentType):
+        return self.client.generic(
+            "POST", f"/api/merchants/{self.merchant.id}/orders/bulk/", body, content_type=contentType
+        )
+
+    def test_ndjson_import_reports_row_errors(self):
+        body = "\n".join([
+            '{"title": "A", "amount": 5, "customerName": "C", "addressText": "S", "addressLatitude": 30.1}',
+            '{"title": "B", "amount": "five", "customerName": "C", "addressText": "S"}',
+            'not json',
+            '{"title": "C", "amount": 5, "customerName": "C", "addressText": "S", "status": "Unknown"}',
+        ])
+        response = self.post(body, "application/x-ndjson")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["data"]["created"], 1)
+        self.assertEqual([error["row"] for error in response.data["data"]["errors"]], [2, 3, 4])
+        self.assertTrue(Order.objects.filter(title="A", addressLatitude=30.1, status=self.orderStatus).exists())
+
+    def test_csv_import(self):
+        body = "title,amount,customerName,addressText,status\nA,5,C,S,Pending\nB,6,C,S,\n"
+        response = self.post(body, "text/csv")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["data"]["created"], 2)
+        self.assertEqual(Order.objects.filter(merchant=self.merchant, title__in=["A", "B"]).count(), 2)
+
+    def test_unsupported_content_type(self):
+        self.assertEqual(self.post("{}", "application/xml").status_code, 415)
+
+    def test_non_finite_numbers_are_row_errors(self):
+        body = "\n".join([
+            '{"title": "A", "amount": 5, "customerName": "C", "addressText": "S"}',
+            '{"title": "B", "amount": "NaN", "customerName": "C", "addressText": "S"}',
+            '{"title": "C", "amount": "Infinity", "customerName": "C", "addressText": "S"}',
+            '{"title": "D", "amount": 5, "customerName": "C", "addressText": "S", "addressLatitude": "nan"}',
+        ])
+        response = self.post(body, "application/x-ndjson")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["data"]["created"], 1)
+        self.assertEqual([error["row"] for error in response.data["data"]["errors"]], [2, 3, 4])
+        self.assertFalse(Order.objects.filter(title__in=["B", "C", "D"]).exists())
+
+    def test_import_without_valid_rows_is_an_error(self):
+        response = self.post('{"title": "A"}\nnot json\n', "application/x-ndjson")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error["row"] for error in response.data["errors"]], [1, 2])
+
+    def test_malformed_csv_is_rejected(self):
+        body = "title,amount,customerName,addressText\nA,5,C,S\n" + 'B,6,C,"' + "x" * 200000 + '"\n'
+        response = self.post(body, "text/csv")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("row 2", response.data["error"])
+        self.assertFalse(Order.objects.filter(title="A").exists())
+
+
+class ExportTests(ApiTestCase):
+
+    def export(self, path, params):
+        response = self.client.get(f"/api/merchants/{self.merchant.id}/{path}", params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_orders_csv_export(self):
+        self.createOrder(title="Second")
+        lines = self.export("orders/export/", {}).splitlines()
+
+        self.assertTrue(lines[0].startswith("id,title,amount"))
+        self.assertEqual(len(lines), 3)
+        self.assertIn("Second", lines[2])
+
+    def test_transactions_ndjson_export(self):
+        rows = [json.loads(line) for line in self.export("transactions/export/", {"output": "ndjson"}).splitlines()]
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["id"], self.transaction.id)
+        self.assertEqual(rows[0]["statusName"], "Pending")
+
+    def test_export_date_range(self):
+        self.assertEqual(len(self.export("orders/export/", {"to": "2000-01-01"}).splitlines()), 1)
+
+    def test_invalid_export_format(self):
+        response = self.client.get(f"/api/merchants/{self.merchant.id}/orders/export/", {"output": "xml"})
+        self.assertEqual(response.status_code, 400)
+
+
+class NearbyOrdersTests(ApiTestCase):
+
+    def test_nearby_orders_sorted_by_distance(self):
+        far = self.createOrder(title="Far", addressLatitude=30.2, addressLongitude=31.24)
+        near = self.createOrder(title="Near", addressLatitude=30.051, addressLongitude=31.241)
+        middle = self.createOrder(title="Middle", addressLatitude=30.1, addressLongitude=31.2)
+        self.createOrder(title="Outside", addressLatitude=31.0, addressLongitude=31.24)
+        assigned = self.createOrder(title="Assigned", addressLatitude=30.05, addressLongitude=31.24)
+        OrderAssignment.objects.create(order=assigned, user=self.courier)
+
+        response = self.client.get(
+            f"/api/couriers/{self.courier.id}/nearby-orders/", {"lat": 30.05, "lng": 31.24, "radius": 20}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        orders = response.data["data"]["orders"]
+        self.assertEqual([order["id"] for order in orders], [near.id, middle.id, far.id])
+        self.assertLess(orders[0]["distanceKm"], 0.2)
+        self.assertAlmostEqual(orders[2]["distanceKm"], 16.68, places=1)
+
+    def test_radius_is_validated_and_clamped(self):
+        url = f"/api/couriers/{self.courier.id}/nearby-orders/"
+        for radius, message in [("abc", "radius must be a number"), ("nan", "radius must be a positive number"),
+                                ("inf", "radius must be a positive number"), ("0", "radius must be a positive number")]:
+            response = self.client.get(url, {"lat": 30.05, "lng": 31.24, "radius": radius})
+            self.assertEqual(response.status_code, 400, radius)
+            self.assertEqual(response.data["error"], message)
+
+        response = self.client.get(url, {"lat": 30.05, "lng": 31.24, "radius": 500})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["meta"]["radiusKm"], 50)
+
+    def test_geo_cell_follows_coordinates(self):
+        order = self.createOrder(addressLatitude=30.05, addressLongitude=31.24)
+        self.assertIsNotNone(order.geoCell)
+
+        order.addressLatitude = None
+        order.save(update_fields=["addressLatitude"])
+        order.refresh_from_db()
+        self.assertIsNone(order.geoCell)
+
+
+class CourierRouteTests(ApiTestCase):
+
+    def test_route_visits_stops_along_the_line(self):
+        stops = [
+            self.createOrder(title=f"Stop {index}", addressLatitude=30.0 + latitude / 100, addressLongitude=31.0)
+            for index, latitude in enumerate([3, 1, 4, 2])
+        ]
+        for order in stops:
+            OrderAssignment.objects.create(order=order, user=self.courier)
+
+        response = self.client.get(f"/api/couriers/{self.courier.id}/route/", {"lat": 30.0, "lng": 31.0})
+
+        self.assertEqual(response.status_code, 200)
+        route = [stop["title"] for stop in response.data["data"]["stops"]]
+        self.assertEqual(route, ["Stop 1", "Stop 3", "Stop 0", "Stop 2"])
+        self.assertAlmostEqual(response.data["meta"]["totalDistanceKm"], 4.448, places=2)
+        self.assertEqual([order["id"] for order in response.data["data"]["unroutable"]], [self.order.id])
+
+    def test_two_opt_never_lengthens_the_path(self):
+        generator = np.random.default_rng(3)
+        latitudes = 30 + generator.random(60)
+        longitudes = 31 + generator.random(60)
+        matrix = HaversineMatrixKm(latitudes, longitudes)
+
+        greedy = NearestNeighbourPath(matrix)
+        improved = TwoOptPath(matrix, greedy.copy())
+
+        self.assertEqual(sorted(improved.tolist()), list(range(60)))
+        self.assertEqual(improved[0], 0)
+        self.assertLessEqual(matrix[improved[:-1], improved[1:]].sum(), matrix[greedy[:-1], greedy[1:]].sum())
+
+
+class DispatchTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.otherCourier = User.objects.create_user(
+            "other@tapay.com", "Other Driver", "password", role=self.driverRole, merchant=self.merchant
+        )
+
+    def dispatch(self, data):
+        return self.client.post(f"/api/merchants/{self.merchant.id}/dispatch/", data, format="json")
+
+    def test_dispatch_prefers_the_closest_courier(self):
+        north = self.createOrder(title="North", addressLatitude=30.5, addressLongitude=31.0)
+        south = self.createOrder(title="South", addressLatitude=29.5, addressLongitude=31.0)
+
+        response = self.dispatch({
+            "orderIds": [north.id, south.id],
+            "courierLocations": {
+                str(self.courier.id): {"lat": 30.45, "lng": 31.0},
+                str(self.otherCourier.id): {"lat": 29.55, "lng": 31.0},
+            },
+        })
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(OrderAssignment.objects.get(order=north, isActive=True).user, self.courier)
+        self.assertEqual(OrderAssignment.objects.get(order=south, isActive=True).user, self.otherCourier)
+
+    def test_dispatch_balances_load(self):
+        orders = [self.createOrder(title=f"Order {index}") for index in range(4)]
+
+        response = self.dispatch({})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data["data"]["assignments"]), 4)
+        # the courier already carrying the setUp order receives one order less
+        self.assertEqual(OrderAssignment.objects.filter(user=self.courier, isActive=True).count(), 3)
+        self.assertEqual(OrderAssignment.objects.filter(user=self.otherCourier, isActive=True).count(), 2)
+        self.assertFalse(OrderAssignment.objects.filter(order__in=orders, isActive=True).values("order").annotate(
+            assignees=Count("id")).filter(assignees__gt=1).exists())
+
+    def test_dispatch_respects_capacity(self):
+        orders = [self.createOrder(title=f"Order {index}") for index in range(4)]
+
+        response = self.dispatch({"orderIds": [order.id for order in orders], "maxOrdersPerCourier": 2})
+
+        self.assertEqual(len(response.data["data"]["assignments"]), 3)
+        self.assertEqual(len(response.data["data"]["unassignedOrderIds"]), 1)
+
+    def test_closed_and_assigned_orders_are_not_dispatched_again(self):
+        delivered = Status.objects.create(name="Delivered", type="Order")
+        closed = self.createOrder(title="Closed", status=delivered)
+        openOrder = self.createOrder(title="Open")
+
+        response = self.dispatch({"orderIds": [closed.id, self.order.id, openOrder.id]})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([row["orderId"] for row in response.data["data"]["assignments"]], [openOrder.id])
+        self.assertEqual(response.data["data"]["rejectedOrderIds"], sorted([closed.id, self.order.id]))
+        self.assertFalse(OrderAssignment.objects.filter(order=closed).exists())
+        self.assertEqual(OrderAssignment.objects.get(order=self.order, isActive=True).user, self.courier)
+        self.assertEqual(OrderAssignment.objects.filter(order=self.order).count(), 1)
+
+    def test_malformed_bodies_are_rejected(self):
+        for body in (
+            [self.order.id], 5, {"orderIds": self.order.id}, {"orderIds": [str(self.order.id)]},
+            {"courierIds": ["not-a-uuid"]}, {"courierLocations": [30.0, 31.0]},
+            {"courierLocations": {str(self.courier.id): {"lat": 30.0}}}, {"loadWeightKm": [2]},
+        ):
+            self.assertEqual(self.dispatch(body).status_code, 400, body)
+        self.assertFalse(OrderAssignment.objects.exclude(order=self.order).exists())
+
+
+class CourierWorkloadTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.otherCourier = User.objects.create_user(
+            "other@tapay.com", "Other Driver", "password", role=self.driverRole, merchant=self.merchant
+        )
+        self.deliveredStatus = Status.objects.create(name="Delivered", type="Order")
+
+    def workloads(self):
+        return {
+            (workload.user_id, workload.status.name): workload.activeCount
+            for workload in CourierWorkload.objects.select_related("status").filter(activeCount__gt=0)
+        }
+
+    def test_assignment_moves_counter_between_couriers(self):
+        response = self.client.post(
+            f"/api/merchants/{self.merchant.id}/orders/{self.order.id}/order-assignments/",
+            {"userId": self.otherCourier.id}, format="json"
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.workloads(), {(self.otherCourier.id, "Pending"): 1})
+
+    def test_assignment_requires_an_object_body(self):
+        response = self.client.post(
+            f"/api/merchants/{self.merchant.id}/orders/{self.order.id}/order-assignments/",
+            [{"userId": self.otherCourier.id}], format="json"
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["error"], "The request body must be a JSON object")
+        self.assertEqual(self.workloads(), {(self.courier.id, "Pending"): 1})
+
+    def test_status_change_moves_counter(self):
+        order = Order.objects.get(pk=self.order.id)
+        order.status = self.deliveredStatus
+        order.save()
+
+        self.assertEqual(self.workloads(), {(self.courier.id, "Delivered"): 1})
+
+    def test_status_change_and_counter_move_commit_together(self):
+        order = Order.objects.get(pk=self.order.id)
+        order.status = self.deliveredStatus
+
+        with mock.patch("Api.signals.MoveOrderWorkload", side_effect=DatabaseError("locked")):
+            with self.assertRaises(DatabaseError):
+                order.save()
+
+        self.assertEqual(Order.objects.get(pk=self.order.id).status, self.orderStatus)
+        self.assertEqual(self.workloads(), {(self.courier.id, "Pending"): 1})
+
+    def test_courier_list_reads_counters(self):
+        AssignOrders([(self.createOrder().id, self.courier.id), (self.createOrder().id, self.otherCourier.id)])
+        order = Order.objects.get(pk=self.order.id)
+        order.status = self.deliveredStatus
+        order.save()
+
+        response = self.client.get(f"/api/merchants/{self.merchant.id}/couriers/")
+
+        couriers = {courier["id"]: courier for courier in response.data["data"]}
+        self.assertEqual(couriers[str(self.courier.id)]["totalOrders"], 2)
+        self.assertEqual(couriers[str(self.courier.id)]["ordersByStatus"], {"Pending": 1, "Delivered": 1})
+        self.assertEqual(couriers[str(self.otherCourier.id)]["ordersByStatus"], {"Pending": 1})
+
+
+class OrderSearchTests(ApiTestCase):
+
+    def search(self, **params):
+        return self.client.get(f"/api/merchants/{self.merchant.id}/orders/", params)
+
+    def titles(self, response):
+        return [order["title"] for order in response.data["data"]["orders"]]
+
+    def test_search_ranks_matches(self):
+        self.createOrder(title="Lunch box", customerName="Mona Zaki", additionalNotes="call Ahmed first")
+        self.createOrder(title="Ahmed groceries", customerName="Ahmed Hassan")
+
+        response = self.search(q="ahm")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.titles(response), ["Ahmed groceries", "Lunch box"])
+        self.assertEqual(response.data["meta"]["total"], 2)
+
+    def test_search_follows_updates_and_merchant(self):
+        order = self.createOrder(title="Flowers")
+        otherMerchant = Merchant.objects.create(
+            name="Other", contactEmail="other@tapay.com", contactPhone="0100", address="Street 1"
+        )
+        self.createOrder(title="Flowers", merchant=otherMerchant)
+
+        self.assertEqual(self.titles(self.search(q="flowers")), ["Flowers"])
+
+        order.title = "Cake"
+        order.save()
+
+        self.assertEqual(self.titles(self.search(q="flowers")), [])
+        self.assertEqual(self.titles(self.search(q="cake", page_size=1)), ["Cake"])
+
+    def test_search_quotes_user_input(self):
+        response = self.search(q='"Order"* -(')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.titles(response), ["Order"])
+
+
+class LedgerTests(ApiTestCase):
+
+    def post(self, amount):
+        return self.client.post(
+            f"/api/merchants/{self.merchant.id}/orders/{self.order.id}/transactions/",
+            {"amount": amount, "paymentMethod": "Cash", "status": "Pending"}, format="json"
+        )
+
+    def test_transactions_move_the_merchant_balance(self):
+        for amount in (5, 7.5, -2):
+            self.assertEqual(self.post(amount).status_code, 201)
+
+        self.merchant.refresh_from_db()
+        self.assertEqual(self.merchant.currentBalance, 10.5)
+        self.assertEqual(
+            list(Transaction.objects.filter(merchant=self.merchant).order_by("id").values_list("balanceAfter", flat=True)),
+            [10, 5, 12.5, 10.5]
+        )
+
+    def test_invalid_amount_is_rejected(self):
+        self.assertEqual(self.post("ten").status_code, 400)
+        self.merchant.refresh_from_db()
+        self.assertEqual(self.merchant.currentBalance, 0)
+
+    def test_sharded_balance_sums_and_folds(self):
+        SetBalanceShards(self.merchant.id, 4)
+        for amount in range(1, 11):
+            self.assertEqual(self.post(amount).status_code, 201)
+
+        self.assertEqual(MerchantBalance(self.merchant.id), 55)
+        response = self.client.get("/api/merchants/", {"page_size": 100})
+        balances = {merchant["id"]: merchant["currentBalance"] for merchant in response.data["data"]["merchants"]}
+        self.assertEqual(balances[self.merchant.id], 55)
+
+        self.assertEqual(FoldBalanceShards(self.merchant.id), 55)
+        self.merchant.refresh_from_db()
+        self.assertEqual(self.merchant.currentBalance, 55)
+        self.assertEqual(MerchantBalance(self.merchant.id), 55)
+
+
+class ReconcileTests(ApiTestCase):
+
+    def reconcile(self):
+        output = io.StringIO()
+        try:
+            call_command("reconcile_ledger", "--workers", "1", stdout=output, stderr=io.StringIO())
+        except CommandError:
+            pass
+        return json.loads(output.getvalue())
+
+    def setUp(self):
+        super().setUp()
+        # The fixture transaction is created directly, so book it on the balance
+        Merchant.objects.filter(pk=self.merchant.id).update(currentBalance=self.transaction.amount)
+
+    def test_consistent_ledgers_pass(self):
+        self.client.post(
+            f"/api/merchants/{self.merchant.id}/orders/{self.order.id}/transactions/",
+            {"amount": 5, "paymentMethod": "Cash", "status": "Pending"}, format="json"
+        )
+
+        report = self.reconcile()
+
+        self.assertEqual(report["merchantsChecked"], Merchant.objects.count())
+        self.assertEqual(report["discrepancies"], [])
+
+    def test_tampered_balance_and_chain_are_reported(self):
+        Merchant.objects.filter(pk=self.merchant.id).update(currentBalance=99)
+        Transaction.objects.filter(pk=self.transaction.id).update(balanceAfter=3)
+
+        with self.assertRaises(CommandError):
+            call_command("reconcile_ledger", "--workers", "1", stdout=io.StringIO())
+        discrepancies = self.reconcile()["discrepancies"]
+
+        self.assertEqual([row["merchantId"] for row in discrepancies], [self.merchant.id])
+        self.assertEqual(len(discrepancies[0]["problems"]), 3)
+        self.assertEqual(discrepancies[0]["difference"], 89)
+
+class IdempotencyTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        idempotencyCache.clear()
+
+    def post(self, key, amount=5):
+        return self.client.post(
+            f"/api/merchants/{self.merchant.id}/orders/{self.order.id}/transactions/",
+            {"amount": amount, "paymentMethod": "Cash", "status": "Pending"}, format="json",
+            HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_retry_replays_without_a_second_payment(self):
+        first = self.post("payment-1")
+        idempotencyCache.clear()
+        retry = self.post("payment-1")
+        cachedRetry = self.post("payment-1")
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.data, json.loads(json.dumps(first.data)))
+        self.assertEqual(cachedRetry["Idempotent-Replayed"], "true")
+        self.assertEqual(Transaction.objects.filter(merchant=self.merchant).count(), 2)
+        self.merchant.refresh_from_db()
+        self.assertEqual(self.merchant.currentBalance, 5)
+
+    def test_key_reused_for_another_request_is_rejected(self):
+        self.post("payment-1")
+
+        self.assertEqual(self.post("payment-1", amount=6).status_code, 422)
+
+    def test_expired_key_runs_again(self):
+        self.post("payment-1")
+        IdempotencyKey.objects.update(expiresAt=timezone.now())
+        idempotencyCache.clear()
+
+        self.assertEqual(self.post("payment-1").status_code, 201)
+        self.assertEqual(Transaction.objects.filter(merchant=self.merchant).count(), 3)
+
+    def test_abandoned_reservation_is_taken_over_after_its_lease(self):
+        url = f"/api/merchants/{self.merchant.id}/orders/{self.order.id}/transactions/"
+        request = SimpleNamespace(method="POST", path=url, data={"amount": 5, "paymentMethod": "Cash", "status": "Pending"})
+        # A worker that died after reserving the key never stores a response
+        ReserveKey(self.courier.pk, "payment-1", RequestFingerprint(request))
+
+        self.assertEqual(self.post("payment-1").status_code, 409)
+
+        IdempotencyKey.objects.update(expiresAt=timezone.now())
+
+        self.assertEqual(self.post("payment-1").status_code, 201)
+        stored = IdempotencyKey.objects.get()
+        self.assertEqual(stored.statusCode, 201)
+        self.assertGreater(stored.expiresAt, timezone.now() + IDEMPOTENCY_LEASE)
+
+    def test_non_object_body_is_rejected_before_reserving(self):
+        url = f"/api/merchants/{self.merchant.id}/orders/{self.order.id}/transactions/"
+
+        for headers in [{"HTTP_IDEMPOTENCY_KEY": "payment-1"}, {}]:
+            response = self.client.post(url, [{"amount": 5}], format="json", **headers)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data["error"], "The request body must be a JSON object")
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class TransactionUpdateTests(ApiTestCase):
+
+    def test_amount_changes_are_rejected(self):
+        url = f"/api/merchants/{self.merchant.id}/orders/{self.order.id}/transactions/{self.transaction.id}/"
+
+        self.assertEqual(self.client.put(url, {"amount": 12, "status": "Settled"}, format="json").status_code, 400)
+        self.transaction.refresh_from_db()
+        self.assertEqual((self.transaction.amount, self.transaction.transactionStatus.name), (10, "Pending"))
+
+        response = self.client.put(url, {"amount": 10, "status": "Settled"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["data"]["transaction"]["amount"], 10)
+
+
+class BulkTransactionUpdateTests(ApiTestCase):
+
+    def patch(self, transactions):
+        return self.client.patch(
+            f"/api/merchants/{self.merchant.id}/transactions/", {"transactions": transactions}, format="json"
+        )
+
+    def test_settles_a_batch_with_per_item_results(self):
+        second = Transaction.objects.create(
+            amount=3, paymentMethod="Cash", balanceAfter=13, transactionStatus=self.transactionStatus,
+            merchant=self.merchant, order=self.order
+        )
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.patch([
+                {"id": self.transaction.id, "status": "Settled"},
+                {"id": second.id, "status": "Settled", "paymentMethod": "Card"},
+                {"id": second.id + 100, "status": "Settled"},
+                {"id": self.transaction.id, "status": "Pending"},
+            ])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [result["result"] for result in response.data["data"]["results"]],
+            ["updated", "updated", "failed", "failed"]
+        )
+        self.assertEqual(response.data["meta"], {"updated": 2, "unchanged": 0, "failed": 2})
+        self.assertEqual(Transaction.objects.filter(transactionStatus__name="Settled").count(), 2)
+        self.assertEqual(TransactionHistory.objects.filter(transaction=second).count(), 2)
+        # merchant, transactions, one UPDATE and one history INSERT, then one rollup INSERT
+        # and an UPDATE per touched rollup row (Cash/Pending, Cash/Settled, Card/Settled), plus savepoints
+        self.assertLessEqual(len([query for query in context.captured_queries if "SAVEPOINT" not in query["sql"]]), 8)
+
+    def test_booleans_are_not_ids(self):
+        # True == 1 would otherwise match the transaction with id 1
+        response = self.patch([{"id": True, "status": "Settled"}])
+
+        self.assertEqual(response.data["data"]["results"], [{"id": True, "result": "failed", "error": "Transaction not found"}])
+        self.assertFalse(Transaction.objects.filter(transactionStatus__name="Settled").exists())
+
+    def test_body_must_be_an_object(self):
+        url = f"/api/merchants/{self.merchant.id}/transactions/"
+        for body in ([{"id": self.transaction.id, "status": "Settled"}], 5):
+            self.assertEqual(self.client.patch(url, body, format="json").status_code, 400)
+
+    def test_invalid_item_is_not_written(self):
+        response = self.patch([{"id": self.transaction.id, "paymentMethod": "Card", "status": "Unknown"}])
+
+        self.assertEqual(response.data["data"]["results"][0]["result"], "failed")
+        self.transaction.refresh_from_db()
+        self.assertEqual(self.transaction.paymentMethod, "Cash")
+
+    def test_amount_changes_are_rejected(self):
+        Merchant.objects.filter(pk=self.merchant.id).update(currentBalance=self.transaction.amount)
+
+        response = self.patch([{"id": self.transaction.id, "status": "Settled", "amount": 12}])
+
+        self.assertEqual(response.status_code, 400)
+        self.transaction.refresh_from_db()
+        self.assertEqual((self.transaction.amount, self.transaction.transactionStatus.name), (10, "Pending"))
+
+        # The current amount may be sent back, as with a single PUT
+        self.assertEqual(self.patch([{"id": self.transaction.id, "status": "Settled", "amount": 10}]).status_code, 200)
+        self.assertEqual(FindBalanceChainBreaks(self.merchant.id), ([], 10))
+        self.assertEqual(MerchantBalance(self.merchant.id), 10)
+
+
+class ReferenceRegistryTests(ApiTestCase):
+
+    def test_names_resolve_without_queries(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(GetStatus("Pending", "Order"), self.orderStatus)
+            self.assertEqual(StatusIds("Pending"), sorted([self.orderStatus.id, self.transactionStatus.id]))
+            self.assertEqual(StatusIds("Pending", "Order"), [self.orderStatus.id])
+            self.assertEqual(RoleIds("Driver"), [self.driverRole.id])
+
+    def test_saves_and_deletes_invalidate_the_registry(self):
+        delivered = Status.objects.create(name="Delivered", type="Order")
+        self.assertEqual(GetStatus("Delivered", "Order"), delivered)
+
+        delivered.name = "Completed"
+        delivered.save()
+        self.assertEqual(StatusIds("Delivered"), [])
+        self.assertEqual(StatusIds("Completed"), [delivered.id])
+
+        dispatcher = Role.objects.create(name="Dispatcher")
+        self.assertEqual(RoleIds("Dispatcher"), [dispatcher.id])
+        dispatcher.delete()
+        self.assertEqual(RoleIds("Dispatcher"), [])
+        with self.assertRaises(Status.DoesNotExist):
+            GetStatus("Unknown", "Order")
+
+
+class ConditionalGetTests(ApiTestCase):
+
+    def assertRevalidates(self, url, change, queries=1):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        etag = first["ETag"]
+
+        with self.assertNumQueries(queries):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+
+        change()
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed["ETag"], etag)
+
+    def test_single_order(self):
+        orderUrl = f"/api/merchants/{self.merchant.id}/orders/{self.order.id}/"
+        otherCourier = User.objects.create_user(
+            "other@tapay.com", "Other Driver", "password", role=self.driverRole, merchant=self.merchant
+        )
+
+        self.assertRevalidates(orderUrl, lambda: AssignOrders([(self.order.id, otherCourier.id)]))
+        self.assertTrue(self.client.get(orderUrl).has_header("Last-Modified"))
+
+    def test_related_renames_change_the_single_views(self):
+        orderUrl = f"/api/merchants/{self.merchant.id}/orders/{self.order.id}/"
+        transactionUrl = f"{orderUrl}transactions/{self.transaction.id}/"
+
+        def rename():
+            self.merchant.name = f"{self.merchant.name} Renamed"
+            self.merchant.save()
+
+        self.assertRevalidates(orderUrl, rename)
+        self.assertRevalidates(transactionUrl, rename)
+        self.assertRevalidates(orderUrl, lambda: Status.objects.filter(pk=self.orderStatus.pk).update(name="Waiting"))
+        self.assertEqual(self.client.get(orderUrl).data["data"]["order"]["merchantName"], "Merchant Renamed Renamed")
+
+    def test_single_transaction(self):
+        url = f"/api/merchants/{self.merchant.id}/orders/{self.order.id}/transactions/{self.transaction.id}/"
+
+        self.assertRevalidates(url, lambda: self.client.put(url, {"status": "Settled"}, format="json"))
+
+    def test_merchant_list_follows_balances(self):
+        self.assertRevalidates("/api/merchants/", lambda: self.client.post(
+            f"/api/merchants/{self.merchant.id}/orders/{self.order.id}/transactions/",
+            {"amount": 5, "paymentMethod": "Cash", "status": "Pending"}, format="json"
+        ), queries=2)
+
+    def test_status_list(self):
+        self.assertRevalidates(
+            "/api/statuses/?type=Order", lambda: Status.objects.create(name="Delivered", type="Order"), queries=0
+        )
+
+
+class RollupTests(ApiTestCase):
+
+    def report(self):
+        response = self.client.get(f"/api/merchants/{self.merchant.id}/reports/")
+        self.assertEqual(response.status_code, 200)
+        return response.data["data"]
+
+    def test_rollups_follow_writes(self):
+        self.client.post(
+            f"/api/merchants/{self.merchant.id}/orders/{self.order.id}/transactions/",
+            {"amount": 5, "paymentMethod": "Card", "cardNumber": "4111", "status": "Pending"}, format="json"
+        )
+        self.client.patch(f"/api/merchants/{self.merchant.id}/transactions/", {
+            "transactions": [{"id": self.transaction.id, "status": "Settled"}]
+        }, format="json")
+        delivered = Status.objects.create(name="Delivered", type="Order")
+        order = Order.objects.get(pk=self.order.id)
+        order.status = delivered
+        order.save()
+        self.createOrder()
+
+        report = self.report()
+
+        self.assertEqual(report["transactions"]["count"], 2)
+        self.assertEqual(report["transactions"]["amount"], 15)
+        self.assertEqual(report["transactions"]["byPaymentMethod"]["Card"], {"count": 1, "amount": 5})
+        self.assertEqual(report["transactions"]["byStatus"]["Settled"], {"count": 1, "amount": 10})
+        self.assertEqual(report["orders"], {"count": 2, "byStatus": {"Pending": 1, "Delivered": 1}})
+        self.assertEqual(len(report["days"]), 1)
+
+    def test_backfill_matches_incremental_rollups(self):
+        self.createOrder()
+        before = self.report()
+
+        DailyTransactionRollup.objects.all().delete()
+        DailyOrderRollup.objects.all().delete()
+        call_command("backfill_rollups", stdout=io.StringIO())
+
+        self.assertEqual(self.report(), before)
+
+    def test_invalid_days_are_rejected(self):
+        for day in ["yesterday", "2024-02-30", "2024-13-01"]:
+            response = self.client.get(f"/api/merchants/{self.merchant.id}/reports/", {"from": day})
+            self.assertEqual(response.status_code, 400, day)
+            self.assertEqual(response.data["error"], "from must be YYYY-MM-DD")
+
+
+class ArchiveTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.delivered = Status.objects.create(name="Delivered", type="Order")
+        self.order.status = self.delivered
+        self.order.save()
+
+        longAgo = timezone.now() - timedelta(days=400)
+        self.recentOrder = self.createOrder(status=self.delivered)
+        self.openOrder = self.createOrder()
+        Order.objects.exclude(pk=self.recentOrder.id).update(updatedAt=longAgo)
+        Transaction.objects.update(updatedAt=longAgo)
+
+    def test_closed_orders_move_to_the_archive(self):
+        report = self.client.get(f"/api/merchants/{self.merchant.id}/reports/").data["data"]
+
+        call_command("archive_orders", "--older-than", "180", stdout=io.StringIO())
+
+        self.assertEqual(list(ArchivedOrder.objects.values_list("id", flat=True)), [self.order.id])
+        self.assertEqual(set(Order.objects.values_list("id", flat=True)), {self.recentOrder.id, self.openOrder.id})
+        self.assertEqual(ArchivedOrderAssignment.objects.count(), 1)
+        self.assertEqual(ArchivedTransaction.objects.get().balanceAfter, 10)
+        self.assertEqual(ArchivedTransactionHistory.objects.count(), 1)
+        self.assertFalse(Transaction.objects.exists())
+        self.assertFalse(CourierWorkload.objects.filter(activeCount__gt=0).exists())
+
+        scan = ScanLedger(self.merchant.id)
+        self.assertEqual((scan["transactionCount"], scan["amountTotal"]), (1, 10))
+
+        call_command("backfill_rollups", stdout=io.StringIO())
+        self.assertEqual(self.client.get(f"/api/merchants/{self.merchant.id}/reports/").data["data"], report)
+
+    def test_single_views_fall_back_to_the_archive(self):
+        orderUrl = f"/api/merchants/{self.merchant.id}/orders/{self.order.id}/"
+        transactionUrl = f"{orderUrl}transactions/{self.transaction.id}/"
+        liveOrder = self.client.get(orderUrl)
+        liveTransaction = self.client.get(transactionUrl)
+
+        call_command("archive_orders", stdout=io.StringIO())
+
+        archivedOrder = self.client.get(orderUrl)
+        self.assertEqual(archivedOrder.status_code, 200)
+        self.assertEqual(archivedOrder.data["data"], liveOrder.data["data"])
+        self.assertEqual(archivedOrder.data["meta"], {"archived": True})
+        self.assertEqual(archivedOrder["ETag"], liveOrder["ETag"])
+
+        archivedTransaction = self.client.get(transactionUrl)
+        self.assertEqual(archivedTransaction.status_code, 200)
+        self.assertEqual(archivedTransaction.data["data"], liveTransaction.data["data"])
+        self.assertEqual(self.client.get(transactionUrl, HTTP_IF_NONE_MATCH=liveTransaction["ETag"]).status_code, 304)
+
+        missing = f"/api/merchants/{self.merchant.id}/orders/{self.openOrder.id + 100}/"
+        self.assertEqual(self.client.get(missing).status_code, 404)
+
+
+class CachedAuthenticationTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        InvalidateUsers()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.courier).access_token}")
+
+    def test_repeated_requests_resolve_the_user_without_queries(self):
+        self.assertEqual(self.client.get("/api/auth/profile/").status_code, 200)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/auth/profile/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["roleName"], "Driver")
+        self.assertEqual(response.data["merchantName"], "Merchant")
+        self.assertEqual(len(queries), 0)
+
+    def test_saves_invalidate_the_cached_user(self):
+        self.client.get("/api/auth/profile/")
+
+        self.merchant.name = "Renamed"
+        self.merchant.save()
+        self.assertEqual(self.client.get("/api/auth/profile/").data["merchantName"], "Renamed")
+
+        self.courier.is_active = False
+        self.courier.save()
+        self.assertEqual(self.client.get("/api/auth/profile/").status_code, 401)
+
+    def test_updates_do_not_write_back_the_cached_user(self):
+        self.client.get("/api/auth/profile/")
+        # Queryset updates, like the login bookkeeping, leave the cached copy stale
+        User.objects.filter(pk=self.courier.pk).update(failedLoginAttempts=3)
+
+        response = self.client.patch("/api/auth/profile/", {"fullName": "Renamed Driver"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.courier.refresh_from_db()
+        self.assertEqual((self.courier.fullName, self.courier.failedLoginAttempts), ("Renamed Driver", 3))
+
+        response = self.client.put("/api/auth/change-password/", {
+            "old_password": "password", "new_password": "changed", "new_password2": "changed"
+        }, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.courier.refresh_from_db()
+        self.assertEqual(self.courier.failedLoginAttempts, 3)
+        self.assertTrue(self.courier.check_password("changed"))
+
+
+class TokenBlacklistTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        InvalidateBlacklist()
+
+    def refresh(self, token):
+        return APIClient().post("/api/auth/refresh/", {"refresh": str(token)}, format="json")
+
+    def test_rotated_and_logged_out_tokens_are_rejected(self):
+        token = RefreshToken.for_user(self.courier)
+
+        response = self.refresh(token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+        rotated = response.data["refresh"]
+        self.assertEqual(self.client.post("/api/auth/logout/", {"refresh_token": rotated}, format="json").status_code, 205)
+        self.assertEqual(self.refresh(rotated).status_code, 401)
+
+    def test_unknown_tokens_are_checked_without_queries(self):
+        self.assertFalse(IsBlacklisted("warm-up"))
+
+        with self.assertNumQueries(0):
+            self.assertFalse(IsBlacklisted("not-blacklisted"))
+
+    def test_filter_is_sized_for_the_blacklist(self):
+        tokens = [RefreshToken.for_user(self.courier) for _ in range(3)]
+        for token in tokens:
+            token.blacklist()
+        blacklist = TokenBlacklist(capacity=2)
+
+        self.assertTrue(all(blacklist.contains(token["jti"]) for token in tokens))
+        self.assertEqual(blacklist._filter.capacity, 6)
+        self.assertFalse(blacklist.contains("not-blacklisted"))
+
+    def test_purge_deletes_expired_tokens_only(self):
+        expired = timezone.now() - timedelta(days=1)
+        for index in range(3):
+            token = OutstandingToken.objects.create(jti=f"expired-{index}", token="-", expires_at=expired)
+            if index:
+                BlacklistedToken.objects.create(token=token)
+        RefreshToken.for_user(self.courier)
+
+        output = io.StringIO()
+        call_command("purge_tokens", "--chunk-size", "2", stdout=output)
+
+        self.assertIn("Deleted 3 expired outstanding tokens and 2 blacklist entries", output.getvalue())
+        self.assertEqual(OutstandingToken.objects.count(), 1)
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+class LoginThrottleTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        ResetLoginThrottle()
+
+    def login(self, password):
+        return APIClient().post(
+            "/api/auth/login/", {"email": self.courier.email, "password": password}, format="json"
+        )
+
+    def test_repeated_failures_lock_the_account_out(self):
+        for _ in range(MAX_FAILED_LOGINS):
+            self.assertEqual(self.login("wrong").status_code, 401)
+
+        response = self.login("password")
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+
+        self.assertEqual(FlushLoginRecords(), 1)
+        self.courier.refresh_from_db()
+        self.assertEqual(self.courier.failedLoginAttempts, MAX_FAILED_LOGINS)
+        self.assertIsNotNone(self.courier.lastFailedLogin)
+
+    def test_logins_are_recorded_in_batches(self):
+        self.login("wrong")
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.login("password").status_code, 200)
+        self.assertFalse([query for query in queries if query["sql"].startswith('UPDATE "Api_user"')])
+
+        FlushLoginRecords()
+        self.courier.refresh_from_db()
+        self.assertEqual(self.courier.failedLoginAttempts, 0)
+        self.assertIsNotNone(self.courier.lastLogin)
+        self.assertEqual(self.courier.last_login, self.courier.lastLogin)
+
+    def test_failures_on_many_emails_stay_bounded(self):
+        throttle = LoginThrottle(capacity=10)
+
+        for index in range(50):
+            throttle.recordFailure(f"sprayed{index}@tapay.com")
+
+        self.assertEqual(len(throttle._failures), 10)
+
+
+@override_settings(CONTACT_WRITE_BEHIND=False)
+class ContactQueueTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        ContactTokenBucketThrottle.buckets.clear()
+        # Queued contacts are written before the test's transaction is rolled back
+        self.addCleanup(FlushContacts)
+
+    def submit(self, **extra):
+        return APIClient().post("/api/contacts/", {
+            "businessName": "Shop", "contactName": "Owner", "email": "owner@shop.com", "phone": "0100",
+            "businessType": "Retail", "driversCount": "1-5", "message": "Call me",
+        }, format="json", **extra)
+
+    def test_submissions_are_written_in_batches(self):
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(3):
+                self.assertEqual(self.submit().status_code, 202)
+        self.assertEqual(len(queries), 0)
+
+        stats = self.client.get("/api/contacts/stats/").data["data"]
+        self.assertEqual((stats["queueDepth"], stats["writerRunning"]), (3, False))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(FlushContacts(), 3)
+        self.assertEqual(Contact.objects.filter(businessName="Shop").count(), 3)
+
+        stats = self.client.get("/api/contacts/stats/").data["data"]
+        self.assertEqual(stats["queueDepth"], 0)
+        self.assertIsNotNone(stats["lastFlushMilliseconds"])
+
+    def test_invalid_and_excess_submissions_are_rejected(self):
+        self.assertEqual(APIClient().post("/api/contacts/", {"email": "nope"}, format="json").status_code, 400)
+
+        # The invalid submission used up a token as well
+        for _ in range(CONTACT_BURST - 1):
+            self.assertEqual(self.submit().status_code, 202)
+        response = self.submit()
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+
+        self.assertEqual(self.submit(REMOTE_ADDR="10.0.0.9").status_code, 202)
+        # X-Forwarded-For is set by the client and does not get it a fresh bucket
+        self.assertEqual(self.submit(HTTP_X_FORWARDED_FOR="10.0.0.10").status_code, 429)
+        self.assertEqual(FlushContacts(), CONTACT_BURST)
+
+    def test_failed_batches_are_retried_then_logged(self):
+        contacts = ContactQueue(retrySeconds=0)
+        contacts.submit(Contact(businessName="Shop", contactName="Owner", email="owner@shop.com", phone="0100"))
+        bulkCreate = Contact.objects.bulk_create
+        failures = [DatabaseError("locked")]
+
+        def failOnce(*args, **kwargs):
+            if failures:
+                raise failures.pop()
+            return bulkCreate(*args, **kwargs)
+
+        # The test's transaction has to survive the connection being closed after a failure
+        with mock.patch("Api.utils.ContactQueueUtils.connection"):
+            with mock.patch.object(Contact.objects, "bulk_create", side_effect=failOnce):
+                self.assertEqual(contacts.flush(), 1)
+            self.assertEqual(Contact.objects.filter(businessName="Shop").count(), 1)
+
+            contacts.submit(Contact(
+                businessName="Lost", contactName="Owner", email="lost@shop.com", phone="0100",
+                businessType="Retail", driversCount="1-5", message="Call me"
+            ))
+            with tempfile.TemporaryDirectory() as directory:
+                deadLetterFile = Path(directory) / "contacts.ndjson"
+                with mock.patch.object(Contact.objects, "bulk_create", side_effect=DatabaseError("locked")), \
+                        override_settings(CONTACT_DEAD_LETTER_FILE=deadLetterFile):
+                    with self.assertLogs("Api.utils.ContactQueueUtils", "ERROR") as logs:
+                        self.assertEqual(contacts.flush(), 1)
+                kept = json.loads(deadLetterFile.read_text())
+
+        # The whole submission is kept, the log carries no personal data
+        self.assertNotIn("lost@shop.com", "\n".join(logs.output))
+        self.assertEqual((kept["email"], kept["message"], kept["driversCount"]), ("lost@shop.com", "Call me", "1-5"))
+        stats = contacts.stats()
+        self.assertEqual((stats["written"], stats["retries"], stats["failed"]), (1, 3, 1))
+
+
+class SqliteBackendTests(TestCase):
+
+    def test_connections_are_tuned(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 20000)
+
+        # The test database lives in memory, where WAL does not apply
+        self.assertNotIn("journal_mode", connection.pragmas())
+
+
+class SqliteTransactionModeTests(TransactionTestCase):
+
+    def test_read_transactions_can_be_deferred(self):
+        with CaptureQueriesContext(connection) as queries:
+            with connection.deferred(), transaction.atomic():
+                Merchant.objects.count()
+            with transaction.atomic():
+                Merchant.objects.count()
+
+        begins = [query["sql"] for query in queries.captured_queries if query["sql"].startswith("BEGIN")]
+        self.assertEqual(begins, ["BEGIN DEFERRED", "BEGIN IMMEDIATE"])
+
+
+@override_settings(READ_REPLICA_ALIAS="replica")
+class ReadReplicaRouterTests(SimpleTestCase):
+
+    def route(self, method, authorization, write=False, **extra):
+        """
+        Return the database the router picks for a read in a request, after an optional write, and the response.
+        """
+        router = ReadReplicaRouter()
+        chosen = []
+
+        def view(request):
+            if write:
+                router.db_for_write(Order)
+            chosen.append(router.db_for_read(Order))
+            return HttpResponse()
+
+        request = getattr(RequestFactory(), method)("/", HTTP_AUTHORIZATION=authorization, **extra)
+        response = ReplicaRoutingMiddleware(view)(request)
+        return chosen[0], response
+
+    def test_safe_reads_go_to_the_replica(self):
+        self.assertEqual(self.route("get", "Bearer reader")[0], "replica")
+        self.assertEqual(self.route("post", "Bearer reader")[0], "default")
+        self.assertIsNone(ReadReplicaRouter().db_for_read(Order))
+
+    def test_writers_read_their_writes_from_the_primary(self):
+        chosen, response = self.route("post", "Bearer writer", write=True)
+        self.assertEqual(chosen, "default")
+        pin = response.cookies[PIN_COOKIE].value
+        self.assertEqual(response[PIN_HEADER], pin)
+
+        # Any worker honours the pin, it travels with the client
+        self.assertEqual(self.route("get", "Bearer writer", HTTP_COOKIE=f"{PIN_COOKIE}={pin}")[0], "default")
+        self.assertEqual(self.route("get", "Bearer writer", HTTP_READ_YOUR_WRITES=pin)[0], "default")
+        self.assertEqual(self.route("get", "Bearer writer")[0], "replica")
+        self.assertEqual(self.route("get", "Bearer someone-else", HTTP_READ_YOUR_WRITES=pin)[0], "replica")
+        self.assertEqual(self.route("get", "Bearer writer", HTTP_READ_YOUR_WRITES=pin + "x")[0], "replica")
+
+        with override_settings(READ_YOUR_WRITES_SECONDS=0):
+            self.assertNotIn(PIN_COOKIE, self.route("put", "Bearer brief-writer", write=True)[1].cookies)
+            self.assertEqual(self.route("get", "Bearer writer", HTTP_READ_YOUR_WRITES=pin)[0], "replica")
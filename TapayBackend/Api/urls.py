@@ -3,10 +3,12 @@ from rest_framework_simplejwt.views import TokenRefreshView
 from .views import (
     CustomTokenObtainPairView, RegisterView, ChangePasswordView, UserProfileView, LogoutView,
     MerchantOrdersView, SingleOrderView, TransactionsView, SingleTransactionView, CourierOrdersView,
-    MerchantsView, MerchantCouriersView, StatusListView
+    MerchantsView, MerchantCouriersView, StatusListView, BulkOrderImportView,
+    MerchantOrdersExportView, MerchantTransactionsExportView, CourierNearbyOrdersView,
+    CourierRouteView, MerchantDispatchView, MerchantTransactionsView, MerchantReportView
 )
 from .views.OrderAssignmentView import OrderAssignmentView
-from .views.ContactViews import ContactListView, ContactDetailView
+from .views.ContactViews import ContactListView, ContactDetailView, ContactQueueStatsView
 
 urlpatterns = [
     path('auth/login/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
@@ -21,14 +23,23 @@ urlpatterns = [
     path("merchants/<int:merchantId>/couriers/", MerchantCouriersView.as_view(), name='merchant-couriers'),
 
     path("merchants/<int:merchantId>/orders/", MerchantOrdersView.as_view(), name='merchant-orders'),
+    path("merchants/<int:merchantId>/orders/export/", MerchantOrdersExportView.as_view(), name='merchant-orders-export'),
+    path("merchants/<int:merchantId>/orders/bulk/", BulkOrderImportView.as_view(), name='merchant-orders-bulk'),
     path("merchants/<int:merchantId>/orders/<int:orderId>/", SingleOrderView.as_view(), name='single-order'),
     path("merchants/<int:merchantId>/orders/<int:orderId>/transactions/", TransactionsView.as_view(), name='transactions'),
     path("merchants/<int:merchantId>/orders/<int:orderId>/transactions/<int:transactionId>/", SingleTransactionView.as_view(), name='single-transaction'),
     path("merchants/<int:merchantId>/orders/<int:orderId>/order-assignments/", OrderAssignmentView.as_view(), name='order-assignments'),
+    path("merchants/<int:merchantId>/dispatch/", MerchantDispatchView.as_view(), name='merchant-dispatch'),
+    path("merchants/<int:merchantId>/reports/", MerchantReportView.as_view(), name='merchant-reports'),
+    path("merchants/<int:merchantId>/transactions/", MerchantTransactionsView.as_view(), name='merchant-transactions'),
+    path("merchants/<int:merchantId>/transactions/export/", MerchantTransactionsExportView.as_view(), name='merchant-transactions-export'),
 
     path("couriers/<str:courierId>/orders/", CourierOrdersView.as_view(), name='courier-orders'),
+    path("couriers/<str:courierId>/nearby-orders/", CourierNearbyOrdersView.as_view(), name='courier-nearby-orders'),
+    path("couriers/<str:courierId>/route/", CourierRouteView.as_view(), name='courier-route'),
     
     path("contacts/", ContactListView.as_view(), name='contact-list'),
+    path("contacts/stats/", ContactQueueStatsView.as_view(), name='contact-queue-stats'),
     path("contacts/<int:pk>/", ContactDetailView.as_view(), name='contact-detail'),
 
     path("statuses/", StatusListView.as_view(), name='status-list'),
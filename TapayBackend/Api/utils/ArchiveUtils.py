@@ -0,0 +1,143 @@
+"""
+Archive utilities for the API application.
+This module moves closed orders, with their assignments, transactions and history, into the archive tables.
+
+An order is archived as a unit once it has a closed status (see
+Order.CLOSED_STATUSES) and neither it nor any of its transactions changed
+for ARCHIVE_AFTER_DAYS. Archived rows keep their IDs, so the single order
+and transaction views can fall back to the archive on a miss. They are
+read-only; the daily rollups and merchant balances already include them.
+"""
+
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import (
+    ArchivedOrder, ArchivedOrderAssignment, ArchivedTransaction, ArchivedTransactionHistory,
+    Order, OrderAssignment, Transaction, TransactionHistory
+)
+from .RegistryUtils import StatusIds
+from .WorkloadUtils import ApplyWorkloadDeltas
+
+# Days without changes after which a closed order is archived
+ARCHIVE_AFTER_DAYS = 180
+
+
+def _CopyRows(queryset, archiveModel, **extra):
+    """
+    Insert the rows of a queryset into an archive model with the same field names.
+
+    Returns:
+        int: The number of copied rows
+    """
+    fields = [field.attname for field in archiveModel._meta.concrete_fields if field.attname not in extra]
+    rows = [archiveModel(**row, **extra) for row in queryset.values(*fields)]
+    archiveModel.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def ArchivableOrders(cutoff, merchantId=None):
+    """
+    Get the closed orders that, like their transactions, did not change since the cutoff.
+    """
+    orders = Order.objects.filter(
+        status__in=StatusIds(Order.CLOSED_STATUSES, "Order"), updatedAt__lt=cutoff
+    ).exclude(transaction__updatedAt__gte=cutoff)
+
+    if merchantId is not None:
+        orders = orders.filter(merchant=merchantId)
+    return orders
+
+
+def ArchiveOrderBatch(orderIds, cutoff):
+    """
+    Move one batch of orders and everything attached to them into the archive tables.
+
+    The orders are checked again inside the transaction, so an order that
+    changed since it was selected stays where it is.
+
+    Returns:
+        Counter: Archived rows per kind
+    """
+    archived = Counter()
+    now = timezone.now()
+
+    with transaction.atomic():
+        orderIds = list(ArchivableOrders(cutoff).filter(id__in=orderIds).values_list('id', flat=True))
+        if not orderIds:
+            return archived
+
+        orders = Order.objects.filter(id__in=orderIds)
+        assignments = OrderAssignment.objects.filter(order__in=orderIds)
+        transactions = Transaction.objects.filter(order__in=orderIds)
+        history = TransactionHistory.objects.filter(transaction__order__in=orderIds)
+
+        archived["orders"] = _CopyRows(orders, ArchivedOrder, archivedAt=now)
+        archived["assignments"] = _CopyRows(assignments, ArchivedOrderAssignment)
+        archived["transactions"] = _CopyRows(transactions, ArchivedTransaction)
+        archived["history"] = _CopyRows(history, ArchivedTransactionHistory)
+
+        # Active assignments of closed orders still count in the courier workloads
+        workloadDeltas = Counter()
+        for userId, statusId in assignments.filter(isActive=True).values_list('user_id', 'order__status_id'):
+            workloadDeltas[(userId, statusId)] -= 1
+        ApplyWorkloadDeltas(workloadDeltas)
+
+        history.delete()
+        transactions.delete()
+        assignments.delete()
+        orders.delete()
+
+    return archived
+
+
+def ArchiveClosedOrders(olderThanDays=ARCHIVE_AFTER_DAYS, batchSize=500, merchantId=None, progress=None):
+    """
+    Archive all archivable orders in batches, each in its own transaction.
+
+    Small batches keep every write transaction, and the time other writers
+    wait for the database lock, short.
+
+    Args:
+        olderThanDays: Days without changes after which a closed order is archived
+        batchSize: Orders moved per transaction
+        merchantId: Optional merchant to archive, all merchants by default
+        progress: Optional callable receiving the running totals after each batch
+
+    Returns:
+        Counter: Archived rows per kind
+    """
+    cutoff = timezone.now() - timedelta(days=olderThanDays)
+    totals = Counter()
+    lastId = 0
+
+    while True:
+        orderIds = list(
+            ArchivableOrders(cutoff, merchantId).filter(id__gt=lastId).order_by('id').values_list('id', flat=True)[:batchSize]
+        )
+        if not orderIds:
+            return totals
+
+        totals.update(ArchiveOrderBatch(orderIds, cutoff))
+        lastId = orderIds[-1]
+        if progress is not None:
+            progress(totals)
+
+
+def GetWithArchive(liveQueryset, archiveQueryset, **lookup):
+    """
+    Get a row from the live table, or from the archive when it has been archived.
+
+    Returns:
+        tuple: (instance, whether it came from the archive)
+
+    Raises:
+        ObjectDoesNotExist: When the row is in neither table
+    """
+    try:
+        return liveQueryset.get(**lookup), False
+    except liveQueryset.model.DoesNotExist:
+        return archiveQueryset.get(**lookup), True
@@ -0,0 +1,108 @@
+"""
+Assignment utilities for the API application.
+This module contains utility functions for assigning orders to couriers.
+"""
+
+from collections import Counter
+
+import numpy as np
+from django.db import transaction
+
+from ..models import Order, OrderAssignment, VersionBump
+from .GeoUtils import HaversineCrossKm
+from .WorkloadUtils import ApplyWorkloadDeltas
+
+# Each order a courier already carries weighs like this many extra kilometres
+DEFAULT_LOAD_WEIGHT_KM = 2.0
+
+
+def AssignOrders(pairs):
+    """
+    Make each user the only active assignee of the paired order.
+
+    Previous active assignments of the orders are deactivated with one
+    UPDATE and the new ones inserted with one bulk INSERT, in a single
+    database transaction together with the courier workload counters.
+
+    Args:
+        pairs: List of (orderId, userId) tuples, at most one per order
+
+    Returns:
+        list: The created OrderAssignment instances, in the order of pairs
+    """
+    if not pairs:
+        return []
+
+    orderIds = [orderId for orderId, _ in pairs]
+
+    with transaction.atomic():
+        previousAssignments = OrderAssignment.objects.filter(order_id__in=orderIds, isActive=True)
+
+        deltas = Counter()
+        for userId, statusId in previousAssignments.values_list('user_id', 'order__status_id'):
+            deltas[(userId, statusId)] -= 1
+
+        statusIds = dict(Order.objects.filter(id__in=orderIds).values_list('id', 'status_id'))
+        for orderId, userId in pairs:
+            deltas[(userId, statusIds[orderId])] += 1
+
+        previousAssignments.update(isActive=False)
+
+        assignments = OrderAssignment.objects.bulk_create([
+            OrderAssignment(order_id=orderId, user_id=userId, isActive=True)
+            for orderId, userId in pairs
+        ])
+
+        ApplyWorkloadDeltas(deltas)
+
+        # The assignments are part of the order's representation
+        Order.objects.filter(id__in=orderIds).update(**VersionBump())
+
+    return assignments
+
+
+def PlanDispatch(orderPoints, courierPoints, loads, loadWeightKm=DEFAULT_LOAD_WEIGHT_KM, capacity=None):
+    """
+    Choose a courier for each order, balancing distance against workload.
+
+    Orders are taken in the given order and each goes to the courier with
+    the lowest distance + loadWeightKm * load, where load counts the orders
+    the courier already carries plus those planned so far. Unknown
+    positions (NaN) contribute no distance.
+
+    Args:
+        orderPoints: n x 2 array of order (latitude, longitude), NaN when unknown
+        courierPoints: m x 2 array of courier (latitude, longitude), NaN when unknown
+        loads: Length m array of current active order counts
+        loadWeightKm: Cost of one carried order in kilometres
+        capacity: Optional maximum load per courier
+
+    Returns:
+        list: (courierIndex or None, distanceKm or None) for each order
+    """
+    orderPoints = np.asarray(orderPoints, dtype=float).reshape(-1, 2)
+    courierPoints = np.asarray(courierPoints, dtype=float).reshape(-1, 2)
+    loads = np.asarray(loads, dtype=float).copy()
+
+    if not len(courierPoints):
+        return [(None, None)] * len(orderPoints)
+
+    distances = HaversineCrossKm(orderPoints[:, 0], orderPoints[:, 1], courierPoints[:, 0], courierPoints[:, 1])
+    known = ~np.isnan(distances)
+    distances = np.where(known, distances, 0.0)
+
+    plan = []
+    for row in range(len(orderPoints)):
+        costs = distances[row] + loadWeightKm * loads
+        if capacity is not None:
+            costs = np.where(loads < capacity, costs, np.inf)
+
+        courier = int(np.argmin(costs))
+        if np.isinf(costs[courier]):
+            plan.append((None, None))
+            continue
+
+        loads[courier] += 1
+        plan.append((courier, float(distances[row, courier]) if known[row, courier] else None))
+
+    return plan
@@ -0,0 +1,88 @@
+"""
+Authentication utilities for the API application.
+This module resolves JWT-authenticated users, with their role and merchant, from a short-lived in-process cache.
+
+Saves and deletes of users, roles and merchants made by this process drop
+the affected entries through signals (see Api/signals.py); changes made
+by other processes or by queryset updates are picked up after
+USER_CACHE_TTL_SECONDS.
+"""
+
+import copy
+import time
+
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from ..models import User
+from .CacheUtils import LruCache
+
+USER_CACHE_TTL_SECONDS = 30
+
+# (user, loadedAt) by user ID
+_users = LruCache(capacity=10000)
+
+
+def CachedUser(userId):
+    """
+    Get a user with its role and merchant, from the cache when the entry is fresh.
+
+    Every caller gets its own copy, so changes made while handling a
+    request never leak into the cached instance.
+
+    Returns:
+        User: The user, or None when there is no such user
+    """
+    key = str(userId)
+    entry = _users.get(key)
+
+    if entry is None or time.monotonic() - entry[1] >= USER_CACHE_TTL_SECONDS:
+        user = User.objects.select_related('role', 'merchant').filter(
+            **{api_settings.USER_ID_FIELD: userId}
+        ).first()
+        if user is None:
+            _users.delete(key)
+            return None
+        entry = (user, time.monotonic())
+        _users.set(key, entry)
+
+    return copy.copy(entry[0])
+
+
+def InvalidateUser(userId):
+    _users.delete(str(userId))
+
+
+def InvalidateUsers():
+    _users.clear()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the token's user through CachedUser.
+
+    The checks are those of JWTAuthentication.get_user, so inactive users
+    and revoked tokens are rejected as before.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            userId = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = CachedUser(userId)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
@@ -0,0 +1,155 @@
+"""
+Token blacklist utilities for the API application.
+This module checks refresh tokens against the token blacklist in memory and purges expired tokens.
+
+Each process keeps a Bloom filter of the blacklisted jti values, loaded on
+first use. A token missing from the filter is not blacklisted and needs no
+query; a hit is confirmed against the database once and then remembered.
+Tokens blacklisted by this process are added at once, those blacklisted by
+other processes after at most BLACKLIST_SYNC_SECONDS. The filter is rebuilt
+from the unexpired tokens every BLACKLIST_REBUILD_SECONDS, or when it fills up,
+sized for twice their number and at least BLACKLIST_CAPACITY.
+"""
+
+import threading
+import time
+
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .CacheUtils import BloomFilter, LruCache
+
+BLACKLIST_CAPACITY = 200000
+BLACKLIST_SYNC_SECONDS = 5
+BLACKLIST_REBUILD_SECONDS = 600
+
+
+class TokenBlacklist:
+    """
+    Process-local view of the BlacklistedToken table.
+    """
+
+    def __init__(self, capacity=BLACKLIST_CAPACITY):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._filter = None
+        self._confirmed = LruCache(capacity=10000)
+        self._lastId = 0
+        self._syncedAt = 0.0
+        self._builtAt = 0.0
+
+    def _rebuild(self):
+        now = time.monotonic()
+        lastId = BlacklistedToken.objects.aggregate(lastId=Max('id'))['lastId'] or 0
+        unexpired = BlacklistedToken.objects.filter(id__lte=lastId, token__expires_at__gt=timezone.now())
+        # Room to grow, so a large blacklist does not trigger a rebuild on every sync
+        bloom = BloomFilter(max(self.capacity, 2 * unexpired.count()))
+
+        for jti in unexpired.values_list('token__jti', flat=True).iterator(chunk_size=5000):
+            bloom.add(jti)
+
+        self._filter, self._lastId = bloom, lastId
+        self._confirmed.clear()
+        self._syncedAt = self._builtAt = now
+
+    def _sync(self):
+        """
+        Add the tokens blacklisted since the last sync, or rebuild when due.
+
+        Returns:
+            BloomFilter: The current filter
+        """
+        now = time.monotonic()
+        bloom = self._filter
+        if bloom is not None and now - self._syncedAt < BLACKLIST_SYNC_SECONDS:
+            return bloom
+
+        with self._lock:
+            if self._filter is not None and now - self._syncedAt < BLACKLIST_SYNC_SECONDS:
+                return self._filter
+            if (
+                self._filter is None or now - self._builtAt >= BLACKLIST_REBUILD_SECONDS
+                or self._filter.count >= self._filter.capacity
+            ):
+                self._rebuild()
+                return self._filter
+
+            for blacklistedId, jti in BlacklistedToken.objects.filter(id__gt=self._lastId).order_by('id').values_list(
+                'id', 'token__jti'
+            ):
+                self._filter.add(jti)
+                self._lastId = blacklistedId
+            self._syncedAt = now
+            return self._filter
+
+    def contains(self, jti):
+        if jti not in self._sync():
+            return False
+        if self._confirmed.get(jti):
+            return True
+
+        blacklisted = BlacklistedToken.objects.filter(token__jti=jti).exists()
+        if blacklisted:
+            self._confirmed.set(jti, True)
+        return blacklisted
+
+    def add(self, jti):
+        self._sync().add(jti)
+        self._confirmed.set(jti, True)
+
+    def invalidate(self):
+        with self._lock:
+            self._filter = None
+
+
+_blacklist = TokenBlacklist()
+
+
+def IsBlacklisted(jti):
+    return _blacklist.contains(jti)
+
+
+def InvalidateBlacklist():
+    _blacklist.invalidate()
+
+
+class CachedRefreshToken(RefreshToken):
+    """
+    RefreshToken checked against the in-memory blacklist instead of a query per check.
+    """
+
+    def check_blacklist(self):
+        if IsBlacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        result = super().blacklist()
+        _blacklist.add(self.payload[api_settings.JTI_CLAIM])
+        return result
+
+
+def PurgeExpiredTokens(chunkSize=5000):
+    """
+    Delete expired outstanding tokens and their blacklist entries in chunks.
+
+    Each chunk is its own short statement, so other writers are never
+    locked out for long.
+
+    Returns:
+        tuple: (deleted outstanding tokens, deleted blacklist entries)
+    """
+    outstandingDeleted = 0
+    blacklistedDeleted = 0
+    now = timezone.now()
+
+    while True:
+        ids = list(OutstandingToken.objects.filter(expires_at__lte=now).values_list('id', flat=True)[:chunkSize])
+        if not ids:
+            return outstandingDeleted, blacklistedDeleted
+        blacklistedDeleted += BlacklistedToken.objects.filter(token__in=ids).delete()[0]
+        outstandingDeleted += OutstandingToken.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,82 @@
+"""
+Cache utilities for the API application.
+This module contains small in-process caches shared by the utilities.
+"""
+
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LruCache:
+    """
+    Thread-safe mapping that keeps the `capacity` most recently used entries.
+
+    The cache is per process; every worker keeps its own copy, so it may
+    only front data that is also stored in the database.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is _MISSING:
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class BloomFilter:
+    """
+    Set membership with no false negatives and about `errorRate` false positives at `capacity` entries.
+
+    Entries cannot be removed; rebuild the filter to drop them.
+    """
+
+    def __init__(self, capacity, errorRate=0.001):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(errorRate) / math.log(2) ** 2))
+        self.hashCount = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+        self._lock = threading.Lock()
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + index * second) % self.size for index in range(self.hashCount)]
+
+    def add(self, key):
+        positions = self._positions(key)
+        with self._lock:
+            for position in positions:
+                self._bits[position >> 3] |= 1 << (position & 7)
+            self.count += 1
+
+    def __contains__(self, key):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
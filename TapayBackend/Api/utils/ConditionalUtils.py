@@ -0,0 +1,127 @@
+"""
+Conditional request utilities for the API application.
+This module answers repeated GET requests with 304 Not Modified from cheap row versions.
+"""
+
+import functools
+import hashlib
+
+from django.db.models import Count, Max, Sum
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from ..models import ArchivedOrder, ArchivedTransaction, Merchant, MerchantBalanceShard, Order, Transaction
+from .RegistryUtils import StatusesByName, AllStatuses
+
+
+def HashEtag(*parts):
+    """
+    Build an ETag value from the parts identifying a representation.
+    """
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def ConditionalGet(stateFunc):
+    """
+    Decorator to answer GET requests with 304 when the client's copy is current.
+
+    stateFunc(request, **kwargs) returns (etag, lastModified) for the
+    requested resource, or (None, None) when it cannot tell, e.g. because
+    the resource does not exist. When If-None-Match or If-Modified-Since
+    match, the view (and its serializer) does not run at all.
+
+    Args:
+        stateFunc: Function computing the ETag value and last modification time
+
+    Returns:
+        The decorator for API view methods
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, request, *args, **kwargs):
+            etag, lastModified = stateFunc(request, **kwargs)
+            etag = quote_etag(etag) if etag else None
+            timestamp = int(lastModified.timestamp()) if lastModified else None
+
+            response = None
+            if etag or timestamp:
+                response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+            if response is None:
+                response = func(self, request, *args, **kwargs)
+
+            if response.status_code in (200, 304):
+                if etag and not response.has_header('ETag'):
+                    response['ETag'] = etag
+                if timestamp and not response.has_header('Last-Modified'):
+                    response['Last-Modified'] = http_date(timestamp)
+            return response
+        return wrapper
+    return decorator
+
+
+def _VersionRow(lookup, related, *models):
+    """
+    Get (version, updatedAt, *related) of the first model with a matching row, live tables before archives.
+
+    related names the values of joined rows that the representation shows,
+    e.g. the merchant name, which change without bumping the row's version.
+    """
+    for model in models:
+        row = model.objects.filter(**lookup).values_list('version', 'updatedAt', *related).first()
+        if row is not None:
+            return row
+    return None
+
+
+def SingleOrderState(request, merchantId=None, orderId=None, **kwargs):
+    """
+    Assignment changes bump the order's version, the merchant and status
+    names are folded in from the joined rows.
+    """
+    row = _VersionRow(
+        {'merchant': merchantId, 'pk': orderId}, ('merchant__updatedAt', 'merchant__name', 'status__name'),
+        Order, ArchivedOrder
+    )
+    if row is None:
+        return None, None
+
+    return HashEtag("order", orderId, *row), max(row[1], row[2])
+
+
+def SingleTransactionState(request, merchantId=None, orderId=None, transactionId=None, **kwargs):
+    row = _VersionRow(
+        {'merchant': merchantId, 'order': orderId, 'pk': transactionId},
+        ('merchant__updatedAt', 'merchant__name', 'transactionStatus__name'), Transaction, ArchivedTransaction
+    )
+    if row is None:
+        return None, None
+
+    return HashEtag("transaction", transactionId, *row), max(row[1], row[2])
+
+
+def MerchantListState(request, **kwargs):
+    """
+    Every merchant change bumps a version, so (count, last id, sum of
+    versions) changes whenever any listed merchant does. Shard balances
+    are part of the listed balance and are included as well.
+    """
+    merchants = Merchant.objects.aggregate(count=Count('id'), lastId=Max('id'), versions=Sum('version'))
+    shards = MerchantBalanceShard.objects.aggregate(balance=Sum('balance'))
+
+    return HashEtag(
+        "merchants", request.GET.urlencode(), merchants['count'], merchants['lastId'], merchants['versions'],
+        shards['balance']
+    ), None
+
+
+def StatusListState(request, **kwargs):
+    """
+    Statuses are served from the in-process registry, so no query is needed.
+    """
+    statusType = request.query_params.get('type')
+    statuses = StatusesByName(statusType).values() if statusType else AllStatuses()
+
+    return HashEtag(
+        "statuses", statusType, sorted((status.id, status.name, status.type) for status in statuses)
+    ), None
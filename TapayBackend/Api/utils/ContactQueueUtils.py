@@ -0,0 +1,255 @@
+"""
+Contact queue utilities for the API application.
+This module buffers contact form submissions in memory and writes them in batches from a background thread.
+
+Submissions are validated by the view and queued; the writer thread
+inserts them with bulk_create every CONTACT_FLUSH_SECONDS or once
+CONTACT_BATCH_SIZE are waiting, so a flood of submissions costs a few
+short write transactions instead of one per request. The queue holds at
+most CONTACT_QUEUE_CAPACITY submissions; a full queue is reported to the
+client instead of growing. A batch that cannot be written is retried
+CONTACT_WRITE_ATTEMPTS times with exponential backoff; what still fails is
+appended as NDJSON to settings.CONTACT_DEAD_LETTER_FILE (default
+contact-dead-letters.ndjson next to manage.py) so that it can be loaded
+later, and only counted in the log. Queued submissions of a process
+that is killed are lost, those of a process that exits normally are
+written at exit.
+
+With settings.CONTACT_WRITE_BEHIND set to False no thread is started and
+submissions stay queued until FlushContacts() is called.
+"""
+
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.utils import timezone
+from rest_framework.throttling import BaseThrottle
+
+from ..models import Contact
+from .CacheUtils import LruCache
+
+logger = logging.getLogger(__name__)
+
+CONTACT_QUEUE_CAPACITY = 10000
+CONTACT_BATCH_SIZE = 200
+CONTACT_FLUSH_SECONDS = 0.5
+
+# Attempts per batch, waiting CONTACT_RETRY_SECONDS, then twice as long, between them
+CONTACT_WRITE_ATTEMPTS = 3
+CONTACT_RETRY_SECONDS = 0.5
+
+# Contact fields kept for submissions that could not be written
+DEAD_LETTER_FIELDS = ("businessName", "contactName", "email", "phone", "businessType", "driversCount", "message")
+
+# Token bucket per client IP: sustained submissions per minute and burst size
+CONTACT_RATE_PER_MINUTE = 6
+CONTACT_BURST = 10
+
+
+class ContactQueueFull(Exception):
+    pass
+
+
+class ContactQueue:
+    """
+    Bounded queue of Contact rows drained by one writer thread.
+    """
+
+    def __init__(
+        self, capacity=CONTACT_QUEUE_CAPACITY, batchSize=CONTACT_BATCH_SIZE, flushSeconds=CONTACT_FLUSH_SECONDS,
+        retrySeconds=CONTACT_RETRY_SECONDS
+    ):
+        self.batchSize = batchSize
+        self.flushSeconds = flushSeconds
+        self.retrySeconds = retrySeconds
+        self._queue = queue.Queue(maxsize=capacity)
+        self._lock = threading.Lock()
+        self._flushLock = threading.Lock()
+        self._thread = None
+        self._stats = {
+            "accepted": 0, "rejected": 0, "written": 0, "retries": 0, "failed": 0, "flushes": 0,
+            "lastFlushMilliseconds": None, "maxFlushMilliseconds": 0.0, "totalFlushMilliseconds": 0.0,
+        }
+
+    def submit(self, contact):
+        try:
+            self._queue.put_nowait(contact)
+        except queue.Full:
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise ContactQueueFull()
+
+        with self._lock:
+            self._stats["accepted"] += 1
+        self._ensureWriter()
+
+    def _ensureWriter(self):
+        if self._thread is not None or not getattr(settings, 'CONTACT_WRITE_BEHIND', True):
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="contact-writer", daemon=True)
+                self._thread.start()
+
+    def _take(self, wait):
+        """
+        Collect up to batchSize queued contacts, waiting at most `wait` seconds for the first one.
+        """
+        batch = []
+        deadline = time.monotonic() + wait
+        while len(batch) < self.batchSize:
+            timeout = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        for attempt in range(CONTACT_WRITE_ATTEMPTS):
+            start = time.perf_counter()
+            try:
+                Contact.objects.bulk_create(batch, batch_size=self.batchSize)
+                break
+            except Exception:
+                # The connection may be broken, the next attempt opens a new one
+                connection.close()
+                if attempt == CONTACT_WRITE_ATTEMPTS - 1:
+                    self._drop(batch)
+                    return
+                logger.warning(f"Could not write {len(batch)} contacts, retrying", exc_info=True)
+                with self._lock:
+                    self._stats["retries"] += 1
+                time.sleep(self.retrySeconds * 2 ** attempt)
+
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._stats["written"] += len(batch)
+            self._stats["flushes"] += 1
+            self._stats["lastFlushMilliseconds"] = elapsed
+            self._stats["maxFlushMilliseconds"] = max(self._stats["maxFlushMilliseconds"], elapsed)
+            self._stats["totalFlushMilliseconds"] += elapsed
+
+    def _drop(self, batch):
+        path = DeadLetterFile()
+        try:
+            with open(path, "a", encoding="utf-8") as deadLetters:
+                failedAt = timezone.now()
+                for contact in batch:
+                    payload = {field: getattr(contact, field) for field in DEAD_LETTER_FIELDS}
+                    deadLetters.write(json.dumps({**payload, "failedAt": failedAt}, cls=DjangoJSONEncoder) + "\n")
+            logger.error(
+                f"Could not write {len(batch)} contacts after {CONTACT_WRITE_ATTEMPTS} attempts, kept in {path}",
+                exc_info=True
+            )
+        except OSError:
+            logger.error(f"Could not write {len(batch)} contacts nor keep them in {path}, they are lost", exc_info=True)
+
+        with self._lock:
+            self._stats["failed"] += len(batch)
+
+    def _run(self):
+        while True:
+            batch = self._take(self.flushSeconds)
+            if batch:
+                with self._flushLock:
+                    self._write(batch)
+
+    def flush(self):
+        """
+        Write everything queued so far from the calling thread.
+
+        Returns:
+            int: The number of contacts taken from the queue
+        """
+        taken = 0
+        with self._flushLock:
+            while True:
+                batch = self._take(0)
+                if not batch:
+                    return taken
+                self._write(batch)
+                taken += len(batch)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        flushes = stats.pop("flushes")
+        totalMilliseconds = stats.pop("totalFlushMilliseconds")
+
+        return {
+            "queueDepth": self._queue.qsize(),
+            "queueCapacity": self._queue.maxsize,
+            "writerRunning": self._thread is not None and self._thread.is_alive(),
+            "flushes": flushes,
+            "averageFlushMilliseconds": totalMilliseconds / flushes if flushes else None,
+            **stats,
+        }
+
+
+def DeadLetterFile():
+    return getattr(settings, 'CONTACT_DEAD_LETTER_FILE', None) or settings.BASE_DIR / "contact-dead-letters.ndjson"
+
+
+_contacts = ContactQueue()
+
+
+def QueueContact(contact):
+    """
+    Queue an unsaved Contact for the background writer.
+
+    Raises:
+        ContactQueueFull: When the queue is at capacity
+    """
+    _contacts.submit(contact)
+
+
+def FlushContacts():
+    return _contacts.flush()
+
+
+def ContactQueueStats():
+    return _contacts.stats()
+
+
+atexit.register(FlushContacts)
+
+
+class ContactTokenBucketThrottle(BaseThrottle):
+    """
+    Per-IP token bucket: CONTACT_BURST submissions at once, refilled at CONTACT_RATE_PER_MINUTE.
+
+    Buckets are kept per process in an LRU, so each worker throttles on
+    its own. Clients are keyed on REMOTE_ADDR, which a client cannot set,
+    unlike X-Forwarded-For; behind a proxy, have it set REMOTE_ADDR.
+    """
+
+    buckets = LruCache(capacity=100000)
+    lock = threading.Lock()
+
+    def allow_request(self, request, view):
+        key = request.META.get('REMOTE_ADDR', '')
+        now = time.monotonic()
+        ratePerSecond = CONTACT_RATE_PER_MINUTE / 60
+
+        with self.lock:
+            tokens, updatedAt = self.buckets.get(key, (CONTACT_BURST, now))
+            tokens = min(CONTACT_BURST, tokens + (now - updatedAt) * ratePerSecond)
+
+            if tokens < 1:
+                self.waitSeconds = (1 - tokens) / ratePerSecond
+                self.buckets.set(key, (tokens, now))
+                return False
+
+            self.buckets.set(key, (tokens - 1, now))
+            return True
+
+    def wait(self):
+        return getattr(self, 'waitSeconds', None)
@@ -0,0 +1,131 @@
+"""
+Geo utilities for the API application.
+This module contains the grid cell scheme used to index order locations and vectorized distance math.
+"""
+
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+# Side of a grid cell in degrees, roughly 1.1 km of latitude
+GEO_CELL_DEGREES = 0.01
+
+LATITUDE_CELLS = int(round(180 / GEO_CELL_DEGREES))
+LONGITUDE_CELLS = int(round(360 / GEO_CELL_DEGREES))
+
+
+def _LatitudeIndex(latitude):
+    return min(int((latitude + 90) / GEO_CELL_DEGREES), LATITUDE_CELLS - 1)
+
+
+def _LongitudeIndex(longitude):
+    return min(int((longitude + 180) / GEO_CELL_DEGREES), LONGITUDE_CELLS - 1)
+
+
+def GeoCell(latitude, longitude):
+    """
+    Get the grid cell of a coordinate.
+
+    Cells are numbered row by row, so the cells of one latitude row form a
+    contiguous range of keys.
+
+    Args:
+        latitude: Latitude in degrees
+        longitude: Longitude in degrees
+
+    Returns:
+        int: The cell key, or None if the coordinate is incomplete
+    """
+    if latitude is None or longitude is None:
+        return None
+    return _LatitudeIndex(latitude) * LONGITUDE_CELLS + _LongitudeIndex(longitude)
+
+
+def GeoCellRanges(latitude, longitude, radiusKm):
+    """
+    Get the cell key ranges covering a circle's bounding box.
+
+    The box is clamped at the poles and the antimeridian rather than wrapped.
+
+    Args:
+        latitude: Latitude of the centre in degrees
+        longitude: Longitude of the centre in degrees
+        radiusKm: Radius in kilometres
+
+    Returns:
+        list: Inclusive (firstCell, lastCell) ranges, one per latitude row
+    """
+    latitudeSpan = radiusKm / KM_PER_DEGREE
+    cosine = math.cos(math.radians(min(abs(latitude) + latitudeSpan, 90)))
+    longitudeSpan = 180 if cosine < 1e-6 else min(radiusKm / (KM_PER_DEGREE * cosine), 180)
+
+    firstRow = _LatitudeIndex(max(latitude - latitudeSpan, -90))
+    lastRow = _LatitudeIndex(min(latitude + latitudeSpan, 90))
+    firstColumn = _LongitudeIndex(max(longitude - longitudeSpan, -180))
+    lastColumn = _LongitudeIndex(min(longitude + longitudeSpan, 180))
+
+    return [
+        (row * LONGITUDE_CELLS + firstColumn, row * LONGITUDE_CELLS + lastColumn)
+        for row in range(firstRow, lastRow + 1)
+    ]
+
+
+def HaversineKm(latitude, longitude, latitudes, longitudes):
+    """
+    Great-circle distances from one point to many points.
+
+    Args:
+        latitude: Latitude of the origin in degrees
+        longitude: Longitude of the origin in degrees
+        latitudes: Array-like of latitudes in degrees
+        longitudes: Array-like of longitudes in degrees
+
+    Returns:
+        numpy.ndarray: Distances in kilometres
+    """
+    lat1 = np.radians(latitude)
+    lat2 = np.radians(np.asarray(latitudes, dtype=float))
+    deltaLat = lat2 - lat1
+    deltaLng = np.radians(np.asarray(longitudes, dtype=float) - longitude)
+
+    a = np.sin(deltaLat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(deltaLng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def HaversineCrossKm(latitudesA, longitudesA, latitudesB, longitudesB):
+    """
+    Great-circle distances between every point of one set and every point of another.
+
+    Args:
+        latitudesA: Array-like of latitudes in degrees
+        longitudesA: Array-like of longitudes in degrees
+        latitudesB: Array-like of latitudes in degrees
+        longitudesB: Array-like of longitudes in degrees
+
+    Returns:
+        numpy.ndarray: len(A) x len(B) matrix of distances in kilometres
+    """
+    latA = np.radians(np.asarray(latitudesA, dtype=float))[:, None]
+    lngA = np.radians(np.asarray(longitudesA, dtype=float))[:, None]
+    latB = np.radians(np.asarray(latitudesB, dtype=float))[None, :]
+    lngB = np.radians(np.asarray(longitudesB, dtype=float))[None, :]
+
+    a = np.sin((latB - latA) / 2) ** 2 + np.cos(latA) * np.cos(latB) * np.sin((lngB - lngA) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def HaversineMatrixKm(latitudes, longitudes):
+    """
+    Pairwise great-circle distances between points.
+
+    Args:
+        latitudes: Array-like of latitudes in degrees
+        longitudes: Array-like of longitudes in degrees
+
+    Returns:
+        numpy.ndarray: Symmetric n x n matrix of distances in kilometres
+    """
+    return HaversineCrossKm(latitudes, longitudes, latitudes, longitudes)
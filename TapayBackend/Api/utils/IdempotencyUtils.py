@@ -0,0 +1,202 @@
+"""
+Idempotency utilities for the API application.
+This module lets clients retry POST requests safely by sending an Idempotency-Key header.
+"""
+
+import functools
+import hashlib
+import json
+from collections import namedtuple
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from ..models import IdempotencyKey
+from .CacheUtils import LruCache
+from .ResponseUtils import ErrorResponse
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+MAX_KEY_LENGTH = 255
+
+# How long a stored response is replayed for
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+
+# How long a reservation without a response blocks retries, e.g. after the worker died
+IDEMPOTENCY_LEASE = timedelta(seconds=30)
+
+# Completed responses kept in memory in front of the IdempotencyKey table
+_storedResponses = LruCache(capacity=10000)
+
+StoredResponse = namedtuple("StoredResponse", ["requestHash", "statusCode", "responseBody", "expiresAt"])
+
+
+def RequestFingerprint(request):
+    """
+    Hash the method, path and body of a request.
+    """
+    body = json.dumps(request.data, cls=JSONEncoder, sort_keys=True)
+    payload = f"{request.method} {request.path}\n{body}"
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def LoadStoredResponse(userId, key):
+    """
+    Get the unexpired stored response of a key from the cache or the database.
+    """
+    now = timezone.now()
+
+    stored = _storedResponses.get((userId, key))
+    if stored is not None and stored.expiresAt > now:
+        return stored
+
+    row = IdempotencyKey.objects.filter(user=userId, key=key, expiresAt__gt=now).values_list(
+        'requestHash', 'statusCode', 'responseBody', 'expiresAt'
+    ).first()
+    if row is None:
+        return None
+
+    stored = StoredResponse(*row)
+    if stored.statusCode is not None:
+        _storedResponses.set((userId, key), stored)
+    return stored
+
+
+def ReserveKey(userId, key, requestHash):
+    """
+    Claim a key for a request that is about to run.
+
+    The reservation expires after IDEMPOTENCY_LEASE unless a response is
+    stored, so a request that never finishes does not block its retries
+    for the whole IDEMPOTENCY_KEY_TTL.
+
+    Returns:
+        IdempotencyKey: The reservation, or None when the key is already taken
+    """
+    now = timezone.now()
+
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(
+                    user_id=userId, key=key, requestHash=requestHash, expiresAt=now + IDEMPOTENCY_LEASE
+                )
+        except IntegrityError:
+            # An expired key may be reused, anything else belongs to another request
+            if not IdempotencyKey.objects.filter(user=userId, key=key, expiresAt__lte=now).delete()[0]:
+                return None
+
+    return None
+
+
+def ReplayResponse(stored):
+    response = Response(json.loads(stored.responseBody), status=stored.statusCode)
+    response[REPLAYED_HEADER] = "true"
+    return response
+
+
+def StoredResponseResult(stored, requestHash):
+    """
+    Build the response for a request whose key has already been used.
+    """
+    if stored.requestHash != requestHash:
+        return ErrorResponse(
+            f"{IDEMPOTENCY_HEADER} was already used for a different request",
+            status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    if stored.statusCode is None:
+        return ErrorResponse(
+            f"A request with this {IDEMPOTENCY_HEADER} is still being processed",
+            status.HTTP_409_CONFLICT
+        )
+    return ReplayResponse(stored)
+
+
+def IdempotentRequest(func):
+    """
+    Decorator to replay the stored response of API view methods retried with the same Idempotency-Key.
+
+    The key is reserved before the view runs, so concurrent retries get a
+    409 instead of running twice. The view runs in one database transaction
+    with the storing of its response, so its writes are never committed
+    without the response that replays them. Responses below 500 are stored
+    for IDEMPOTENCY_KEY_TTL; server errors and exceptions release the key
+    so that the request can be retried. Keys are scoped per user, and
+    reusing one for a different request is answered with 422.
+
+    Args:
+        func: The view method to decorate, below ApiExceptionHandler
+
+    Returns:
+        The decorated function
+    """
+    @functools.wraps(func)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return func(self, request, *args, **kwargs)
+
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise ValueError(f"{IDEMPOTENCY_HEADER} must be between 1 and {MAX_KEY_LENGTH} characters")
+        # Idempotent views take an object body, reject others without reserving the key
+        if not isinstance(request.data, dict):
+            raise ValueError("The request body must be a JSON object")
+
+        userId = request.user.pk
+        requestHash = RequestFingerprint(request)
+
+        stored = LoadStoredResponse(userId, key)
+        if stored is not None:
+            return StoredResponseResult(stored, requestHash)
+
+        reservation = ReserveKey(userId, key, requestHash)
+        if reservation is None:
+            stored = LoadStoredResponse(userId, key)
+            if stored is None:
+                raise ValueError(f"{IDEMPOTENCY_HEADER} could not be reserved, please retry")
+            return StoredResponseResult(stored, requestHash)
+
+        try:
+            with transaction.atomic():
+                response = func(self, request, *args, **kwargs)
+                if response.status_code < 500:
+                    # Fails, and rolls the view back, when the lease ran out and a retry took the key over
+                    reservation.statusCode = response.status_code
+                    reservation.responseBody = json.dumps(response.data, cls=JSONEncoder)
+                    reservation.expiresAt = timezone.now() + IDEMPOTENCY_KEY_TTL
+                    reservation.save(update_fields=['statusCode', 'responseBody', 'expiresAt'])
+        except Exception:
+            reservation.delete()
+            raise
+
+        if response.status_code >= 500:
+            reservation.delete()
+            return response
+
+        _storedResponses.set((userId, key), StoredResponse(
+            requestHash, reservation.statusCode, reservation.responseBody, reservation.expiresAt
+        ))
+        return response
+    return wrapper
+
+
+def PurgeExpiredKeys(chunkSize=5000):
+    """
+    Delete expired idempotency keys in chunks.
+
+    Returns:
+        int: The number of deleted keys
+    """
+    deleted = 0
+    now = timezone.now()
+
+    while True:
+        ids = list(IdempotencyKey.objects.filter(expiresAt__lte=now).values_list('id', flat=True)[:chunkSize])
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,216 @@
+"""
+Ledger utilities for the API application.
+This module appends transactions to a merchant's ledger and keeps the merchant balance in step with it.
+
+A merchant balance lives in Merchant.currentBalance, or for merchants with
+balanceShards > 0 in currentBalance plus their MerchantBalanceShard rows.
+Sharded merchants spread their writes over several rows and have the
+shards folded back into currentBalance periodically (see fold_balances).
+"""
+
+import heapq
+import math
+import random
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+
+from ..models import ArchivedTransaction, Merchant, MerchantBalanceShard, Transaction, VersionBump
+
+# Tolerance when comparing float balances
+BALANCE_TOLERANCE = 1e-6
+
+
+def ParseAmount(value):
+    """
+    Read a transaction amount as a finite float.
+    """
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        raise ValueError("amount must be a number")
+
+    if not math.isfinite(amount):
+        raise ValueError("amount must be a finite number")
+    return amount
+
+
+def AppendTransaction(merchantId, orderId, amount, **fields):
+    """
+    Add a transaction to a merchant's ledger and move the merchant's balance.
+
+    The balance is incremented with an UPDATE ... SET currentBalance =
+    currentBalance + amount as the first statement of the database
+    transaction, which takes the write lock (the row lock on databases with
+    row locking) before the new balance is read back. Concurrent appends for
+    the same merchant are therefore serialized and every balanceAfter equals
+    the previous one plus the amount.
+
+    Sharded merchants increment a randomly chosen shard instead, so that
+    concurrent appends lock different rows. Their balanceAfter is the
+    balance as seen by the writer, which only forms a gapless chain on
+    databases that serialize all writes, like SQLite.
+
+    Args:
+        merchantId: The ID of the merchant
+        orderId: The ID of the order the payment belongs to
+        amount: The transaction amount
+        **fields: Other Transaction fields, e.g. paymentMethod and transactionStatus
+
+    Returns:
+        Transaction: The created transaction
+    """
+    amount = ParseAmount(amount)
+
+    # Read before the transaction starts, so that its first statement is the write
+    shards = Merchant.objects.values_list('balanceShards', flat=True).get(pk=merchantId)
+
+    with transaction.atomic():
+        if shards:
+            AddToBalanceShard(merchantId, random.randrange(shards), amount)
+            balanceAfter = MerchantBalance(merchantId)
+        else:
+            merchants = Merchant.objects.filter(pk=merchantId)
+            merchants.update(currentBalance=F('currentBalance') + amount, **VersionBump())
+            balanceAfter = merchants.values_list('currentBalance', flat=True).get()
+
+        return Transaction.objects.create(
+            amount=amount,
+            balanceAfter=balanceAfter,
+            merchant_id=merchantId,
+            order_id=orderId,
+            **fields
+        )
+
+
+def AddToBalanceShard(merchantId, shard, amount):
+    """
+    Add an amount to one balance shard, creating the shard row when missing.
+    """
+    shardRows = MerchantBalanceShard.objects.filter(merchant_id=merchantId, shard=shard)
+    if shardRows.update(balance=F('balance') + amount):
+        return
+
+    MerchantBalanceShard.objects.bulk_create(
+        [MerchantBalanceShard(merchant_id=merchantId, shard=shard)], ignore_conflicts=True
+    )
+    shardRows.update(balance=F('balance') + amount)
+
+
+def MerchantBalance(merchantId):
+    """
+    Read a merchant's balance, currentBalance plus all of its shards, in one query.
+    """
+    currentBalance, shardBalance = Merchant.objects.filter(pk=merchantId).annotate(
+        shardBalance=Coalesce(Sum('merchantbalanceshard__balance'), 0.0)
+    ).values_list('currentBalance', 'shardBalance').get()
+
+    return currentBalance + shardBalance
+
+
+def SetBalanceShards(merchantId, shards):
+    """
+    Switch a merchant between single-row (0) and sharded balance mode.
+
+    Shard rows are created up front; rows beyond the new count keep counting
+    towards the balance until they are folded.
+    """
+    with transaction.atomic():
+        Merchant.objects.filter(pk=merchantId).update(balanceShards=shards, **VersionBump())
+        MerchantBalanceShard.objects.bulk_create(
+            [MerchantBalanceShard(merchant_id=merchantId, shard=shard) for shard in range(shards)],
+            ignore_conflicts=True
+        )
+
+
+def FoldBalanceShards(merchantId):
+    """
+    Move the amounts held by a merchant's shards into currentBalance.
+
+    Every shard is decremented by the amount read from it rather than reset,
+    so deltas written while folding are kept and the total balance never
+    changes.
+
+    Returns:
+        float: The amount moved into currentBalance
+    """
+    shardBalances = list(
+        MerchantBalanceShard.objects.filter(merchant_id=merchantId).exclude(balance=0).values_list('id', 'balance')
+    )
+    if not shardBalances:
+        return 0.0
+
+    total = sum(balance for _, balance in shardBalances)
+
+    with transaction.atomic():
+        Merchant.objects.filter(pk=merchantId).update(currentBalance=F('currentBalance') + total, **VersionBump())
+        for shardId, balance in shardBalances:
+            MerchantBalanceShard.objects.filter(pk=shardId).update(balance=F('balance') - balance)
+
+    return total
+
+
+def FindBalanceChainBreaks(merchantId, openingBalance=0.0, limit=100):
+    """
+    Find transactions whose balanceAfter does not follow from the previous one.
+
+    Args:
+        merchantId: The ID of the merchant
+        openingBalance: The balance before the merchant's first transaction
+        limit: Maximum number of breaks reported
+
+    Returns:
+        tuple: (breaks, closingBalance) where breaks lists the IDs of the
+            offending transactions and closingBalance is the last balanceAfter
+    """
+    scan = ScanLedger(merchantId, openingBalance, limit)
+    return scan["chainBreaks"], scan["closingBalance"]
+
+
+def ScanLedger(merchantId, openingBalance=0.0, limit=100):
+    """
+    Stream a merchant's transactions once, checking the balanceAfter chain and totalling the amounts.
+
+    Transactions are walked in id order, which is the order in which
+    AppendTransaction wrote them (createdAt only adds ties), and read
+    through the merchant index without sorting. Archived transactions are
+    merged in by ID.
+
+    Args:
+        merchantId: The ID of the merchant
+        openingBalance: The balance before the merchant's first transaction
+        limit: Maximum number of breaks reported
+
+    Returns:
+        dict: transactionCount, amountTotal, closingBalance, chainBreakCount
+            and chainBreaks (at most limit transaction IDs)
+    """
+    breaks = []
+    breakCount = 0
+    count = 0
+    total = 0.0
+    balance = openingBalance
+
+    rows = heapq.merge(*(
+        model.objects.filter(merchant=merchantId).order_by('id').values_list(
+            'id', 'amount', 'balanceAfter'
+        ).iterator(chunk_size=10000)
+        for model in (Transaction, ArchivedTransaction)
+    ))
+    for transactionId, amount, balanceAfter in rows:
+        if not math.isclose(balance + amount, balanceAfter, rel_tol=0, abs_tol=BALANCE_TOLERANCE):
+            breakCount += 1
+            if len(breaks) < limit:
+                breaks.append(transactionId)
+        balance = balanceAfter
+        total += amount
+        count += 1
+
+    return {
+        "transactionCount": count,
+        "amountTotal": total,
+        "closingBalance": balance,
+        "chainBreakCount": breakCount,
+        "chainBreaks": breaks,
+    }
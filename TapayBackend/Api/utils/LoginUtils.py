@@ -0,0 +1,174 @@
+"""
+Login utilities for the API application.
+This module throttles failed logins in memory and writes login bookkeeping to the User rows in batches.
+
+Failed attempts are counted per email in a sliding window. Once an account
+has MAX_FAILED_LOGINS failures within LOGIN_FAILURE_WINDOW_SECONDS, further
+attempts are rejected before the password is hashed. The counters are per
+process. User.failedLoginAttempts, User.lastFailedLogin and the last login
+times are written in batches by FlushLoginRecords, from the first login
+attempt LOGIN_FLUSH_SECONDS after the oldest pending record, or once
+LOGIN_FLUSH_SIZE records are pending. A crashed process loses at most those
+pending records.
+"""
+
+import threading
+import time
+from collections import deque
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import User
+from .CacheUtils import LruCache
+
+MAX_FAILED_LOGINS = 5
+LOGIN_FAILURE_WINDOW_SECONDS = 15 * 60
+
+LOGIN_FLUSH_SECONDS = 5
+LOGIN_FLUSH_SIZE = 500
+
+# Emails whose recent failures are remembered; attempts on many random emails evict the oldest
+LOGIN_THROTTLE_CAPACITY = 100000
+
+
+class LoginThrottle:
+    """
+    Sliding-window failure counter per key, with pending User row changes.
+    """
+
+    def __init__(
+        self, maxFailures=MAX_FAILED_LOGINS, windowSeconds=LOGIN_FAILURE_WINDOW_SECONDS,
+        capacity=LOGIN_THROTTLE_CAPACITY
+    ):
+        self.maxFailures = maxFailures
+        self.windowSeconds = windowSeconds
+        self._lock = threading.Lock()
+        self._failures = LruCache(capacity=capacity)
+        self._pendingFailures = {}
+        self._pendingLogins = {}
+        self._pendingSince = None
+
+    def _window(self, key, now):
+        failures = self._failures.get(key)
+        if failures is None:
+            return None
+        while failures and now - failures[0] >= self.windowSeconds:
+            failures.popleft()
+        if not failures:
+            self._failures.delete(key)
+            return None
+        return failures
+
+    def retryAfter(self, key):
+        """
+        Seconds until the key may try again, 0 when it is not locked out.
+        """
+        now = time.monotonic()
+        with self._lock:
+            failures = self._window(key, now)
+            if failures is None or len(failures) < self.maxFailures:
+                return 0
+            return max(1, int(failures[-self.maxFailures] + self.windowSeconds - now) + 1)
+
+    def recordFailure(self, key):
+        now = time.monotonic()
+        with self._lock:
+            failures = self._window(key, now)
+            if failures is None:
+                failures = deque(maxlen=self.maxFailures)
+                self._failures.set(key, failures)
+            failures.append(now)
+
+            count, _ = self._pendingFailures.get(key, (0, None))
+            self._pendingFailures[key] = (count + 1, timezone.now())
+            self._pendingSince = self._pendingSince or now
+
+    def recordLogin(self, key, userId):
+        with self._lock:
+            self._failures.delete(key)
+            self._pendingFailures.pop(key, None)
+            self._pendingLogins[userId] = timezone.now()
+            self._pendingSince = self._pendingSince or time.monotonic()
+
+    def flushDue(self):
+        pendingSince = self._pendingSince
+        return pendingSince is not None and (
+            len(self._pendingFailures) + len(self._pendingLogins) >= LOGIN_FLUSH_SIZE
+            or time.monotonic() - pendingSince >= LOGIN_FLUSH_SECONDS
+        )
+
+    def takePending(self):
+        with self._lock:
+            failures, self._pendingFailures = self._pendingFailures, {}
+            logins, self._pendingLogins = self._pendingLogins, {}
+            self._pendingSince = None
+        return failures, logins
+
+    def clear(self):
+        with self._lock:
+            self._failures.clear()
+            self._pendingFailures.clear()
+            self._pendingLogins.clear()
+            self._pendingSince = None
+
+
+_throttle = LoginThrottle()
+
+
+def LoginKey(email):
+    return User.objects.normalize_email(email or "").lower()
+
+
+def LoginRetryAfter(email):
+    """
+    Seconds until logins for an email are accepted again, 0 when they are.
+    """
+    return _throttle.retryAfter(LoginKey(email))
+
+
+def RecordFailedLogin(email):
+    _throttle.recordFailure(LoginKey(email))
+    if _throttle.flushDue():
+        FlushLoginRecords()
+
+
+def RecordLogin(user):
+    _throttle.recordLogin(LoginKey(user.email), user.pk)
+    if _throttle.flushDue():
+        FlushLoginRecords()
+
+
+def FlushLoginRecords():
+    """
+    Write the pending failed-login counts and last login times to the User rows.
+
+    Failures are added with F() so that the counts of several processes
+    add up; a successful login resets the count. All pending logins are
+    written with one bulk UPDATE.
+
+    Returns:
+        int: The number of records written
+    """
+    failures, logins = _throttle.takePending()
+    if not failures and not logins:
+        return 0
+
+    with transaction.atomic():
+        # Logins first, failures recorded after a login have to survive its reset
+        User.objects.bulk_update([
+            User(pk=userId, last_login=loggedInAt, lastLogin=loggedInAt, failedLoginAttempts=0)
+            for userId, loggedInAt in logins.items()
+        ], ['last_login', 'lastLogin', 'failedLoginAttempts'], batch_size=500)
+
+        for email, (count, failedAt) in failures.items():
+            User.objects.filter(email__iexact=email).update(
+                failedLoginAttempts=F('failedLoginAttempts') + count, lastFailedLogin=failedAt
+            )
+
+    return len(failures) + len(logins)
+
+
+def ResetLoginThrottle():
+    _throttle.clear()
@@ -0,0 +1,185 @@
+"""
+Pagination utilities for the API application.
+This module contains helpers for page-number and keyset (cursor) pagination.
+"""
+
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator, InvalidPage
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+
+CURSOR_NEXT = "n"
+CURSOR_PREVIOUS = "p"
+
+
+def ParsePageSize(request):
+    """
+    Read the page_size query parameter and clamp it to MAX_PAGE_SIZE.
+
+    Args:
+        request: The HTTP request
+
+    Returns:
+        int: The page size to use
+    """
+    pageSize = request.query_params.get('page_size', DEFAULT_PAGE_SIZE)
+
+    try:
+        pageSize = int(pageSize)
+    except (TypeError, ValueError):
+        raise ValueError("page_size must be an integer")
+
+    if pageSize < 1:
+        raise ValueError("page_size must be a positive integer")
+
+    return min(pageSize, MAX_PAGE_SIZE)
+
+
+def EncodeCursor(instance, direction=CURSOR_NEXT):
+    """
+    Encode the keyset position of an instance as an opaque cursor.
+
+    Args:
+        instance: The model instance the cursor points at
+        direction: CURSOR_NEXT or CURSOR_PREVIOUS
+
+    Returns:
+        str: A URL-safe cursor string
+    """
+    payload = json.dumps(
+        [instance.createdAt.isoformat(), str(instance.pk), direction],
+        separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def DecodeCursor(cursor):
+    """
+    Decode a cursor produced by EncodeCursor.
+
+    Args:
+        cursor: The cursor string from the query parameters
+
+    Returns:
+        tuple: (createdAt, pk, direction)
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        createdAt, pk, direction = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        createdAt = parse_datetime(createdAt)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+    if createdAt is None or direction not in (CURSOR_NEXT, CURSOR_PREVIOUS):
+        raise ValueError("Invalid cursor")
+
+    return createdAt, pk, direction
+
+
+def _KeysetFilter(createdAt, pk, after):
+    """
+    Build the (createdAt, id) row-value comparison for a keyset page.
+    """
+    if after:
+        return Q(createdAt__gt=createdAt) | Q(createdAt=createdAt, pk__gt=pk)
+    return Q(createdAt__lt=createdAt) | Q(createdAt=createdAt, pk__lt=pk)
+
+
+def CursorPaginate(queryset, cursor, pageSize, descending=True):
+    """
+    Paginate a queryset by keyset on (createdAt, id).
+
+    The cost of a page does not depend on how deep it is, as no OFFSET or
+    COUNT(*) is issued.
+
+    Args:
+        queryset: The queryset to paginate (its ordering is replaced)
+        cursor: The cursor from the query parameters
+        pageSize: Number of items per page
+        descending: Whether the list is sorted newest first
+
+    Returns:
+        tuple: (items, meta)
+    """
+    createdAt, pk, direction = DecodeCursor(cursor)
+    backwards = direction == CURSOR_PREVIOUS
+
+    # A tampered cursor may carry a key of the wrong type, e.g. an integer for a UUID list
+    try:
+        pk = queryset.model._meta.pk.to_python(pk)
+    except ValidationError:
+        raise ValueError("Invalid cursor")
+
+    # Walking backwards flips both the comparison and the sort order,
+    # the page is reversed again once fetched.
+    after = descending == backwards
+    ordering = ('createdAt', 'pk') if after else ('-createdAt', '-pk')
+
+    rows = list(
+        queryset.filter(_KeysetFilter(createdAt, pk, after)).order_by(*ordering)[:pageSize + 1]
+    )
+    hasMore = len(rows) > pageSize
+    items = rows[:pageSize]
+
+    if backwards:
+        items.reverse()
+        hasNext, hasPrevious = True, hasMore
+    else:
+        hasNext, hasPrevious = hasMore, True
+
+    return items, {
+        "pageSize": pageSize,
+        "hasNext": hasNext,
+        "hasPrevious": hasPrevious,
+        "nextCursor": EncodeCursor(items[-1]) if items and hasNext else None,
+        "previousCursor": EncodeCursor(items[0], CURSOR_PREVIOUS) if items and hasPrevious else None,
+    }
+
+
+def PagePaginate(queryset, page, pageSize, descending=True):
+    """
+    Paginate a queryset by page number.
+
+    Cursors for the neighbouring pages are included in the metadata so that
+    clients can switch to keyset pagination after the first page.
+
+    Args:
+        queryset: The queryset to paginate (its ordering is replaced)
+        page: The page number from the query parameters
+        pageSize: Number of items per page
+        descending: Whether the list is sorted newest first
+
+    Returns:
+        tuple: (items, meta)
+    """
+    try:
+        page = int(page)
+    except (TypeError, ValueError):
+        raise ValueError("page must be an integer")
+
+    ordering = ('-createdAt', '-pk') if descending else ('createdAt', 'pk')
+    paginator = Paginator(queryset.order_by(*ordering), pageSize)
+
+    try:
+        currentPage = paginator.page(page)
+    except InvalidPage:
+        raise ValueError(f"Invalid page {page}")
+
+    items = list(currentPage.object_list)
+
+    return items, {
+        "total": paginator.count,
+        "page": page,
+        "pageSize": pageSize,
+        "totalPages": paginator.num_pages,
+        "hasNext": currentPage.has_next(),
+        "hasPrevious": currentPage.has_previous(),
+        "nextCursor": EncodeCursor(items[-1]) if items and currentPage.has_next() else None,
+        "previousCursor": EncodeCursor(items[0], CURSOR_PREVIOUS) if items and currentPage.has_previous() else None,
+    }
@@ -0,0 +1,119 @@
+"""
+Reconciliation utilities for the API application.
+This module verifies merchant ledgers in parallel worker processes.
+"""
+
+import contextlib
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.apps import apps
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from ..models import Merchant
+from .LedgerUtils import MerchantBalance, ScanLedger, BALANCE_TOLERANCE
+
+# Relative tolerance when comparing a balance with the sum of millions of amounts
+TOTAL_RELATIVE_TOLERANCE = 1e-9
+
+
+def ReconcileMerchant(merchantId, limit=100):
+    """
+    Check one merchant's ledger.
+
+    The balance (currentBalance plus shards) must equal the sum of the
+    transaction amounts and the last balanceAfter, and every balanceAfter
+    must follow from the previous one. The ledger and the balance are read
+    in one transaction, so that writes committed in between cannot show up
+    as a discrepancy. On the tuned SQLite backend it is a deferred one,
+    which does not hold up writers.
+
+    Returns:
+        dict: The scan results, or None when the ledger is consistent
+    """
+    connection = connections[DEFAULT_DB_ALIAS]
+    with getattr(connection, "deferred", contextlib.nullcontext)(), transaction.atomic():
+        scan = ScanLedger(merchantId, limit=limit)
+        balance = MerchantBalance(merchantId)
+
+    def Matches(value):
+        return math.isclose(balance, value, rel_tol=TOTAL_RELATIVE_TOLERANCE, abs_tol=BALANCE_TOLERANCE)
+
+    problems = []
+    if not Matches(scan["amountTotal"]):
+        problems.append("balance differs from the sum of the transaction amounts")
+    if scan["transactionCount"] and not Matches(scan["closingBalance"]):
+        problems.append("balance differs from the last balanceAfter")
+    if scan["chainBreakCount"]:
+        problems.append("balanceAfter chain is broken")
+
+    if not problems:
+        return None
+
+    return {
+        "merchantId": merchantId,
+        "balance": balance,
+        "difference": balance - scan["amountTotal"],
+        "problems": problems,
+        **scan,
+    }
+
+
+def _InitWorker():
+    # Spawned workers start without Django; forked ones must not share the parent's connections
+    if not apps.ready:
+        django.setup()
+    connections.close_all()
+
+
+def _ReconcileMerchantTask(arguments):
+    merchantId, limit = arguments
+    return merchantId, ReconcileMerchant(merchantId, limit)
+
+
+def ReconcileLedger(merchantIds=None, workers=1, limit=100, progress=None):
+    """
+    Reconcile many merchants, spread over a pool of worker processes.
+
+    Merchants are handed out one at a time, so a few very large ledgers do
+    not hold up the others. Each worker streams its merchant's rows with
+    its own database connection.
+
+    Args:
+        merchantIds: Merchants to check, all merchants by default
+        workers: Number of processes, 1 checks in the current process
+        limit: Maximum number of chain breaks listed per merchant
+        progress: Optional callable receiving the number of merchants checked so far
+
+    Returns:
+        tuple: (number of merchants checked, list of discrepancies)
+    """
+    if merchantIds is None:
+        merchantIds = list(Merchant.objects.order_by('id').values_list('id', flat=True))
+
+    tasks = [(merchantId, limit) for merchantId in merchantIds]
+    discrepancies = []
+
+    if workers <= 1:
+        results = map(_ReconcileMerchantTask, tasks)
+        return _Collect(results, discrepancies, progress), discrepancies
+
+    # Forked children must open their own connections
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_InitWorker) as pool:
+        results = pool.map(_ReconcileMerchantTask, tasks, chunksize=1)
+        checked = _Collect(results, discrepancies, progress)
+
+    return checked, discrepancies
+
+
+def _Collect(results, discrepancies, progress):
+    checked = 0
+    for _, discrepancy in results:
+        checked += 1
+        if discrepancy is not None:
+            discrepancies.append(discrepancy)
+        if progress is not None:
+            progress(checked)
+    return checked
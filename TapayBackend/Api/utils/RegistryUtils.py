@@ -0,0 +1,118 @@
+"""
+Registry utilities for the API application.
+This module keeps the Status and Role reference tables in memory so that names resolve to rows without a query.
+
+The registry is per process. Saves and deletes made by this process
+invalidate it through signals (see Api/signals.py); changes made by other
+processes are picked up after REGISTRY_TTL_SECONDS.
+"""
+
+import threading
+import time
+
+from ..models import Role, Status
+
+REGISTRY_TTL_SECONDS = 300
+
+
+class ReferenceRegistry:
+    """
+    Lazily loaded, thread-safe snapshot of a small table.
+    """
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._loadedAt = 0.0
+
+    def snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._loadedAt < REGISTRY_TTL_SECONDS:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is None or time.monotonic() - self._loadedAt >= REGISTRY_TTL_SECONDS:
+                self._snapshot = self._loader()
+                self._loadedAt = time.monotonic()
+            return self._snapshot
+
+    def invalidate(self):
+        self._snapshot = None
+
+
+def _LoadStatuses():
+    return {(status.name, status.type): status for status in Status.objects.all()}
+
+
+def _LoadRoles():
+    return {role.name: role for role in Role.objects.all()}
+
+
+_statuses = ReferenceRegistry(_LoadStatuses)
+_roles = ReferenceRegistry(_LoadRoles)
+
+
+def GetStatus(name, type):
+    """
+    Get a status by name and type.
+
+    Raises:
+        Status.DoesNotExist: When there is no such status
+    """
+    status = _statuses.snapshot().get((name, type))
+    if status is None:
+        raise Status.DoesNotExist(f"Status '{name}' of type '{type}' not found")
+    return status
+
+
+def StatusesByName(type):
+    """
+    Get all statuses of a type keyed by name.
+    """
+    return {name: status for (name, statusType), status in _statuses.snapshot().items() if statusType == type}
+
+
+def AllStatuses():
+    """
+    Get all statuses.
+    """
+    return list(_statuses.snapshot().values())
+
+
+def StatusIds(names, type=None):
+    """
+    Get the IDs of the statuses with any of the given names, optionally of one type only.
+
+    Filtering on these IDs replaces a join on status__name; unknown names
+    simply contribute no IDs.
+    """
+    names = {names} if isinstance(names, str) else set(names)
+    return [
+        status.id for (name, statusType), status in _statuses.snapshot().items()
+        if name in names and (type is None or statusType == type)
+    ]
+
+
+def RoleIds(names):
+    """
+    Get the IDs of the roles with any of the given names.
+    """
+    names = {names} if isinstance(names, str) else set(names)
+    return [role.id for name, role in _roles.snapshot().items() if name in names]
+
+
+def LoadReferenceData():
+    """
+    Load the registries now instead of on first use.
+    """
+    _statuses.snapshot()
+    _roles.snapshot()
+
+
+def InvalidateStatuses():
+    _statuses.invalidate()
+
+
+def InvalidateRoles():
+    _roles.invalidate()
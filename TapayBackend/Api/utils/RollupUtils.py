@@ -0,0 +1,238 @@
+"""
+Rollup utilities for the API application.
+This module maintains the per-merchant daily rollups of transactions and orders and reads reports from them.
+
+Single-row saves are rolled up by the signal handlers in Api/signals.py;
+bulk writes (the order import and the bulk transaction update) apply their
+deltas here explicitly. The backfill_rollups command rebuilds the tables
+from the raw rows, live and archived.
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from ..models import (
+    ArchivedOrder, ArchivedTransaction, DailyOrderRollup, DailyTransactionRollup, Order, Transaction
+)
+from .RegistryUtils import AllStatuses
+
+# Longest period a report may cover
+MAX_REPORT_DAYS = 366
+
+
+def RollupDay(createdAt):
+    """
+    The day a row is rolled up under, in the configured time zone.
+    """
+    return timezone.localdate(createdAt) if timezone.is_aware(createdAt) else createdAt.date()
+
+
+def _ApplyDeltas(model, keyFields, valueFields, deltas):
+    """
+    Add deltas to rollup rows, creating missing rows first, with F() updates.
+
+    Args:
+        model: The rollup model
+        keyFields: Names of the fields forming a key, in key order
+        valueFields: Names of the counter fields, in delta order
+        deltas: Mapping of key tuples to tuples of counter deltas
+    """
+    deltas = {key: values for key, values in deltas.items() if any(values)}
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        model.objects.bulk_create(
+            [model(**dict(zip(keyFields, key))) for key in deltas], ignore_conflicts=True
+        )
+        for key, values in deltas.items():
+            model.objects.filter(**dict(zip(keyFields, key))).update(**{
+                field: F(field) + value for field, value in zip(valueFields, values) if value
+            })
+
+
+def ApplyTransactionRollups(deltas):
+    """
+    Args:
+        deltas: Mapping of (merchantId, day, paymentMethod, statusId) to (count, amount) deltas
+    """
+    _ApplyDeltas(
+        DailyTransactionRollup, ('merchant_id', 'day', 'paymentMethod', 'transactionStatus_id'), ('count', 'amount'),
+        deltas
+    )
+
+
+def ApplyOrderRollups(deltas):
+    """
+    Args:
+        deltas: Mapping of (merchantId, day, statusId) to (count,) deltas
+    """
+    _ApplyDeltas(DailyOrderRollup, ('merchant_id', 'day', 'status_id'), ('count',), deltas)
+
+
+def AddTransactionDelta(deltas, transactionInstance, created=False):
+    """
+    Record how saving a transaction changes the rollups.
+
+    The values the instance was loaded with (see Transaction.from_db) are
+    taken out and the current ones added.
+
+    Args:
+        deltas: defaultdict(lambda: [0, 0.0]) collecting (count, amount) deltas
+        transactionInstance: The saved Transaction
+        created: Whether the transaction was just inserted
+    """
+    day = RollupDay(transactionInstance.createdAt)
+    merchantId = transactionInstance.merchant_id
+    current = (transactionInstance.paymentMethod, transactionInstance.transactionStatus_id, transactionInstance.amount)
+    loaded = None if created else getattr(transactionInstance, '_loadedRollup', None)
+
+    if loaded == current or (loaded is None and not created):
+        return
+
+    if loaded is not None:
+        paymentMethod, statusId, amount = loaded
+        delta = deltas[(merchantId, day, paymentMethod, statusId)]
+        delta[0] -= 1
+        delta[1] -= amount
+
+    paymentMethod, statusId, amount = current
+    delta = deltas[(merchantId, day, paymentMethod, statusId)]
+    delta[0] += 1
+    delta[1] += amount
+
+
+def TransactionDeltas():
+    return defaultdict(lambda: [0, 0.0])
+
+
+def RebuildRollups(merchantId=None, start=None, end=None):
+    """
+    Recompute the rollups from the raw transactions and orders, archived ones included.
+
+    Args:
+        merchantId: Optional merchant to rebuild, all merchants by default
+        start: Optional first day to rebuild
+        end: Optional last day to rebuild
+
+    Returns:
+        tuple: (transaction rollup rows, order rollup rows) written
+    """
+    transactionRollups = DailyTransactionRollup.objects.all()
+    orderRollups = DailyOrderRollup.objects.all()
+
+    if merchantId is not None:
+        transactionRollups = transactionRollups.filter(merchant=merchantId)
+        orderRollups = orderRollups.filter(merchant=merchantId)
+    if start is not None:
+        transactionRollups = transactionRollups.filter(day__gte=start)
+        orderRollups = orderRollups.filter(day__gte=start)
+    if end is not None:
+        transactionRollups = transactionRollups.filter(day__lte=end)
+        orderRollups = orderRollups.filter(day__lte=end)
+
+    transactionTotals = defaultdict(lambda: [0, 0.0])
+    for model in (Transaction, ArchivedTransaction):
+        rows = _RollupRows(model.objects.all(), merchantId, start, end).values(
+            'merchant_id', 'day', 'paymentMethod', 'transactionStatus_id'
+        ).annotate(rowCount=Count('id'), total=Sum('amount')).order_by()
+        for row in rows.iterator(chunk_size=2000):
+            totals = transactionTotals[(row['merchant_id'], row['day'], row['paymentMethod'], row['transactionStatus_id'])]
+            totals[0] += row['rowCount']
+            totals[1] += row['total']
+
+    orderTotals = defaultdict(int)
+    for model in (Order, ArchivedOrder):
+        rows = _RollupRows(model.objects.all(), merchantId, start, end).values(
+            'merchant_id', 'day', 'status_id'
+        ).annotate(rowCount=Count('id')).order_by()
+        for row in rows.iterator(chunk_size=2000):
+            orderTotals[(row['merchant_id'], row['day'], row['status_id'])] += row['rowCount']
+
+    with transaction.atomic():
+        transactionRollups.delete()
+        orderRollups.delete()
+
+        written = DailyTransactionRollup.objects.bulk_create([
+            DailyTransactionRollup(
+                merchant_id=merchant, day=day, paymentMethod=paymentMethod, transactionStatus_id=statusId,
+                count=count, amount=amount
+            )
+            for (merchant, day, paymentMethod, statusId), (count, amount) in transactionTotals.items()
+        ], batch_size=1000)
+        writtenOrders = DailyOrderRollup.objects.bulk_create([
+            DailyOrderRollup(merchant_id=merchant, day=day, status_id=statusId, count=count)
+            for (merchant, day, statusId), count in orderTotals.items()
+        ], batch_size=1000)
+
+    return len(written), len(writtenOrders)
+
+
+def _RollupRows(queryset, merchantId, start, end):
+    """
+    Restrict raw rows to a merchant and a day range, annotated with their day.
+    """
+    if merchantId is not None:
+        queryset = queryset.filter(merchant=merchantId)
+
+    queryset = queryset.annotate(day=TruncDate('createdAt'))
+    if start is not None:
+        queryset = queryset.filter(day__gte=start)
+    if end is not None:
+        queryset = queryset.filter(day__lte=end)
+    return queryset
+
+
+def MerchantReport(merchantId, start, end):
+    """
+    Summarize a merchant's transactions and orders between two days, from the rollups only.
+
+    Args:
+        merchantId: The ID of the merchant
+        start: The first day of the period
+        end: The last day of the period
+
+    Returns:
+        dict: Totals, breakdowns by payment method and status, and one entry per day with activity
+    """
+    statusNames = {status.id: status.name for status in AllStatuses()}
+
+    transactions = {"count": 0, "amount": 0.0, "byPaymentMethod": {}, "byStatus": {}}
+    orders = {"count": 0, "byStatus": {}}
+    days = defaultdict(lambda: {"transactionCount": 0, "transactionAmount": 0.0, "orderCount": 0})
+
+    transactionRows = DailyTransactionRollup.objects.filter(
+        merchant=merchantId, day__range=(start, end), count__gt=0
+    ).values_list('day', 'paymentMethod', 'transactionStatus_id', 'count', 'amount')
+
+    for day, paymentMethod, statusId, count, amount in transactionRows:
+        statusName = statusNames.get(statusId, str(statusId))
+        for group in (
+            transactions["byPaymentMethod"].setdefault(paymentMethod, {"count": 0, "amount": 0.0}),
+            transactions["byStatus"].setdefault(statusName, {"count": 0, "amount": 0.0}),
+            transactions,
+        ):
+            group["count"] += count
+            group["amount"] += amount
+        days[day]["transactionCount"] += count
+        days[day]["transactionAmount"] += amount
+
+    orderRows = DailyOrderRollup.objects.filter(
+        merchant=merchantId, day__range=(start, end), count__gt=0
+    ).values_list('day', 'status_id', 'count')
+
+    for day, statusId, count in orderRows:
+        statusName = statusNames.get(statusId, str(statusId))
+        orders["byStatus"][statusName] = orders["byStatus"].get(statusName, 0) + count
+        orders["count"] += count
+        days[day]["orderCount"] += count
+
+    return {
+        "transactions": transactions,
+        "orders": orders,
+        "days": [{"day": day, **totals} for day, totals in sorted(days.items())],
+    }
@@ -0,0 +1,124 @@
+"""
+Route utilities for the API application.
+This module contains the heuristics used to order a courier's stops.
+"""
+
+import numpy as np
+
+from .GeoUtils import HaversineMatrixKm
+
+# Improvements smaller than this (in km) are ignored to guarantee termination
+IMPROVEMENT_EPSILON = 1e-9
+
+MAX_TWO_OPT_PASSES = 50
+
+
+def NearestNeighbourPath(matrix):
+    """
+    Build an open path from node 0 by always visiting the closest unvisited node.
+
+    Args:
+        matrix: n x n distance matrix
+
+    Returns:
+        numpy.ndarray: Node indices starting with 0
+    """
+    size = len(matrix)
+    visited = np.zeros(size, dtype=bool)
+    path = np.empty(size, dtype=int)
+
+    current = 0
+    visited[0] = True
+    path[0] = 0
+
+    for position in range(1, size):
+        distances = np.where(visited, np.inf, matrix[current])
+        current = int(np.argmin(distances))
+        visited[current] = True
+        path[position] = current
+
+    return path
+
+
+def TwoOptPath(matrix, path):
+    """
+    Improve an open path with 2-opt segment reversals, keeping node 0 first.
+
+    A zero-cost end node is appended so that the last edge can be reversed
+    like any other; for each segment start all segment ends are evaluated
+    in one vectorized step.
+
+    Args:
+        matrix: n x n distance matrix
+        path: Node indices starting with 0
+
+    Returns:
+        numpy.ndarray: The improved path
+    """
+    size = len(path)
+    if size < 4:
+        return path
+
+    extended = np.zeros((size + 1, size + 1))
+    extended[:size, :size] = matrix
+    path = np.append(path, size)
+
+    for _ in range(MAX_TWO_OPT_PASSES):
+        improved = False
+
+        for first in range(1, size - 1):
+            before, start = path[first - 1], path[first]
+            ends = path[first + 1:size]
+            afters = path[first + 2:size + 1]
+
+            # Reversing path[first..end] swaps edges (before, start), (end, after)
+            # for (before, end), (start, after)
+            gains = (
+                extended[before, ends] + extended[start, afters]
+                - extended[before, start] - extended[ends, afters]
+            )
+            best = int(np.argmin(gains))
+
+            if gains[best] < -IMPROVEMENT_EPSILON:
+                last = first + 1 + best
+                path[first:last + 1] = path[first:last + 1][::-1]
+                improved = True
+
+        if not improved:
+            break
+
+    return path[:size]
+
+
+def OptimizeRoute(latitudes, longitudes, startLatitude=None, startLongitude=None):
+    """
+    Order stops to shorten the driven distance.
+
+    Args:
+        latitudes: Latitudes of the stops in degrees
+        longitudes: Longitudes of the stops in degrees
+        startLatitude: Optional latitude of the courier
+        startLongitude: Optional longitude of the courier
+
+    Returns:
+        tuple: (order, legs) where order lists stop indices in visiting order
+            and legs holds the distance in km driven to reach each of them
+    """
+    if not len(latitudes):
+        return [], []
+
+    hasStart = startLatitude is not None and startLongitude is not None
+    matrix = HaversineMatrixKm(
+        np.concatenate(([startLatitude if hasStart else 0.0], latitudes)),
+        np.concatenate(([startLongitude if hasStart else 0.0], longitudes))
+    )
+
+    if not hasStart:
+        # Without a known position the route may begin at any stop
+        matrix[0, :] = 0
+        matrix[:, 0] = 0
+
+    path = TwoOptPath(matrix, NearestNeighbourPath(matrix))
+    legs = matrix[path[:-1], path[1:]]
+
+    return (path[1:] - 1).tolist(), legs.tolist()
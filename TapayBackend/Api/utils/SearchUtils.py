@@ -0,0 +1,170 @@
+"""
+Search utilities for the API application.
+This module contains the full-text search over orders backed by the SQLite FTS5 table Api_order_search.
+
+The table is kept in sync by triggers on Api_order. SQLite migrations that
+change Order rebuild Api_order and drop those triggers, so they must end
+with RestoreOrderSearchTriggers.
+"""
+
+import math
+import re
+
+from django.db import connections
+from django.db.models import Q
+
+# FTS5 table created by migration 0015_order_search
+ORDER_SEARCH_TABLE = "Api_order_search"
+
+# bm25 weights of title, customerName, addressText and additionalNotes
+ORDER_SEARCH_WEIGHTS = (4.0, 4.0, 2.0, 1.0)
+
+ORDER_SEARCH_FIELDS = ("title", "customerName", "addressText", "additionalNotes")
+
+MAX_SEARCH_TERMS = 16
+
+ORDER_SEARCH_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS Api_order_search_insert AFTER INSERT ON Api_order BEGIN
+        INSERT INTO Api_order_search(rowid, title, customerName, addressText, additionalNotes)
+        VALUES (new.id, new.title, new.customerName, new.addressText, new.additionalNotes);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS Api_order_search_delete AFTER DELETE ON Api_order BEGIN
+        INSERT INTO Api_order_search(Api_order_search, rowid, title, customerName, addressText, additionalNotes)
+        VALUES ('delete', old.id, old.title, old.customerName, old.addressText, old.additionalNotes);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS Api_order_search_update
+    AFTER UPDATE OF title, customerName, addressText, additionalNotes ON Api_order BEGIN
+        INSERT INTO Api_order_search(Api_order_search, rowid, title, customerName, addressText, additionalNotes)
+        VALUES ('delete', old.id, old.title, old.customerName, old.addressText, old.additionalNotes);
+        INSERT INTO Api_order_search(rowid, title, customerName, addressText, additionalNotes)
+        VALUES (new.id, new.title, new.customerName, new.addressText, new.additionalNotes);
+    END
+    """,
+]
+
+
+def RestoreOrderSearchTriggers(apps, schema_editor):
+    """
+    Migration step re-creating the search triggers and rebuilding the index after Api_order was rebuilt.
+    """
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for statement in ORDER_SEARCH_TRIGGERS:
+        schema_editor.execute(statement)
+    schema_editor.execute(f"INSERT INTO {ORDER_SEARCH_TABLE}({ORDER_SEARCH_TABLE}) VALUES ('rebuild')")
+
+
+def SearchTerms(text):
+    """
+    Split free text into at most MAX_SEARCH_TERMS words.
+    """
+    terms = re.findall(r"\w+", text or "")[:MAX_SEARCH_TERMS]
+    if not terms:
+        raise ValueError("q must contain at least one letter or digit")
+    return terms
+
+
+def BuildMatchQuery(terms):
+    """
+    Build an FTS5 query matching rows that contain every term as a word prefix.
+
+    Terms are quoted so that user input can never be parsed as FTS5 syntax.
+    """
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def SearchOrders(queryset, text, page, pageSize):
+    """
+    Rank the orders of a queryset against a free text query and return one page.
+
+    The FTS5 index finds the matching rows, which are restricted to the
+    queryset with a rowid IN (subquery) and ordered by bm25 relevance. Only
+    the ids of the requested page are read from the index, the orders
+    themselves are loaded with the queryset (and its eager loading), from
+    the same database the router picked for the queryset, so that a
+    lagging read replica cannot drop matches from the page.
+
+    Args:
+        queryset: The orders to search within
+        text: The free text query
+        page: The page number (1-based)
+        pageSize: Number of orders per page
+
+    Returns:
+        tuple: (items, meta) where meta is the pagination metadata
+    """
+    terms = SearchTerms(text)
+
+    try:
+        page = int(page)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid page {page}")
+    if page < 1:
+        raise ValueError(f"Invalid page {page}")
+
+    # Resolved once, so that the index and the rows are read from the same database
+    queryset = queryset.using(queryset.db)
+    connection = connections[queryset.db]
+
+    if connection.vendor != "sqlite":
+        return _SearchOrdersWithoutIndex(queryset, terms, page, pageSize)
+
+    scopeSql, scopeParams = queryset.order_by().values("id").query.sql_with_params()
+    where = f"{ORDER_SEARCH_TABLE} MATCH %s AND rowid IN ({scopeSql})"
+    params = [BuildMatchQuery(terms), *scopeParams]
+    weights = ", ".join(str(weight) for weight in ORDER_SEARCH_WEIGHTS)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) FROM {ORDER_SEARCH_TABLE} WHERE {where}", params)
+        total = cursor.fetchone()[0]
+
+        cursor.execute(
+            f"SELECT rowid FROM {ORDER_SEARCH_TABLE} WHERE {where} "
+            f"ORDER BY bm25({ORDER_SEARCH_TABLE}, {weights}), rowid LIMIT %s OFFSET %s",
+            [*params, pageSize, (page - 1) * pageSize]
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+
+    orders = queryset.in_bulk(ids) if ids else {}
+    items = [orders[orderId] for orderId in ids if orderId in orders]
+
+    return items, _SearchMeta(total, page, pageSize)
+
+
+def _SearchOrdersWithoutIndex(queryset, terms, page, pageSize):
+    """
+    Unranked substring search for databases without the FTS5 table.
+    """
+    for term in terms:
+        termFilter = Q()
+        for field in ORDER_SEARCH_FIELDS:
+            termFilter |= Q(**{f"{field}__icontains": term})
+        queryset = queryset.filter(termFilter)
+
+    total = queryset.count()
+    offset = (page - 1) * pageSize
+    items = list(queryset.order_by("-createdAt", "-id")[offset:offset + pageSize])
+
+    return items, _SearchMeta(total, page, pageSize)
+
+
+def _SearchMeta(total, page, pageSize):
+    totalPages = max(1, math.ceil(total / pageSize))
+    if page > totalPages:
+        raise ValueError(f"Invalid page {page}")
+
+    return {
+        "total": total,
+        "page": page,
+        "pageSize": pageSize,
+        "totalPages": totalPages,
+        "hasNext": page < totalPages,
+        "hasPrevious": page > 1,
+        "nextCursor": None,
+        "previousCursor": None,
+    }
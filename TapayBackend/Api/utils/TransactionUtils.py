@@ -3,7 +3,30 @@ Transaction utilities for the API application.
 This module contains utility functions for transaction-related operations.
 """
 
-from ..models import Transaction, TransactionHistory, Status
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from ..models import Transaction, TransactionHistory
+from .LedgerUtils import ParseAmount
+from .RegistryUtils import StatusesByName
+from .RollupUtils import AddTransactionDelta, ApplyTransactionRollups, TransactionDeltas
+
+# Maximum number of transactions changed by one bulk update
+MAX_BULK_TRANSACTIONS = 1000
+
+# Transaction model fields written for each tracked field name
+CHANGED_MODEL_FIELDS = {
+    "paymentMethod": "paymentMethod",
+    "cardNumber": "cardNumber",
+    "status": "transactionStatus",
+}
+
+
+def TransactionStatuses():
+    """
+    Get all transaction statuses keyed by name, from the registry.
+    """
+    return StatusesByName("Transaction")
 
 
 def TrackTransactionChanges(transaction_instance, changes):
@@ -17,44 +40,82 @@ def TrackTransactionChanges(transaction_instance, changes):
     Returns:
         list: The created TransactionHistory instances
     """
-    history_records = []
-    
-    for change in changes:
-        history = TransactionHistory.objects.create(
+    return TransactionHistory.objects.bulk_create(
+        HistoryRecords(transaction_instance, changes)
+    )
+
+
+def HistoryRecords(transaction_instance, changes):
+    """
+    Build unsaved TransactionHistory records for a list of changes.
+    """
+    return [
+        TransactionHistory(
             fieldChanged=change["fieldChanged"],
             oldValue=change["oldValue"],
             newValue=change["newValue"],
             transaction=transaction_instance
         )
-        history_records.append(history)
-    
-    return history_records
+        for change in changes
+    ]
 
 
-def UpdateTransactionFields(transaction, data):
+def UpdateTransactionFields(transaction, data, statuses=None):
     """
     Update transaction fields and track changes.
     
     Args:
         transaction: The Transaction instance to update
         data: Dictionary containing the fields to update
+        statuses: Optional transaction statuses keyed by name, see TransactionStatuses
         
     Returns:
         tuple: (updated_transaction, changes_list)
     """
+    changes = ApplyTransactionChanges(transaction, data, statuses)
+
+    # Save the transaction if there were changes
+    if changes:
+        transaction.save(update_fields=ChangedModelFields(changes))
+        TrackTransactionChanges(transaction, changes)
+    
+    return transaction, changes
+
+
+def ChangedModelFields(changes):
+    return [CHANGED_MODEL_FIELDS[change["fieldChanged"]] for change in changes]
+
+
+def CheckAmountUnchanged(transaction, data):
+    """
+    Reject data that changes the amount of a transaction.
+
+    The amount is part of the merchant balance and the balanceAfter chain
+    and cannot be edited in place; an amount equal to the current one is
+    accepted.
+    """
+    if "amount" in data and ParseAmount(data.get("amount")) != transaction.amount:
+        raise ValueError("Transaction amounts cannot be changed, post a correcting transaction instead")
+
+
+def ApplyTransactionChanges(transaction, data, statuses=None):
+    """
+    Set the fields given in data on a transaction without saving it.
+
+    An amount equal to the current one is accepted, any other amount is
+    rejected.
+    
+    Args:
+        transaction: The Transaction instance to change
+        data: Dictionary containing the fields to update
+        statuses: Optional transaction statuses keyed by name, read from the registry when omitted
+        
+    Returns:
+        list: Dictionaries with fieldChanged, oldValue, and newValue
+    """
     changes = []
     
-    # Update amount if provided
-    if "amount" in data:
-        old_amount = transaction.amount
-        new_amount = data.get("amount")
-        if old_amount != new_amount:
-            changes.append({
-                "fieldChanged": "amount",
-                "oldValue": str(old_amount),
-                "newValue": str(new_amount)
-            })
-            transaction.amount = new_amount
+    CheckAmountUnchanged(transaction, data)
     
     # Update payment method if provided
     if "paymentMethod" in data:
@@ -85,21 +146,115 @@ def UpdateTransactionFields(transaction, data):
         old_status = transaction.transactionStatus.name
         new_status_name = data.get("status")
         
-        try:
-            new_status = Status.objects.get(name=new_status_name, type="Transaction")
-            if old_status != new_status_name:
-                changes.append({
-                    "fieldChanged": "status",
-                    "oldValue": old_status,
-                    "newValue": new_status_name
-                })
-                transaction.transactionStatus = new_status
-        except Status.DoesNotExist:
+        if statuses is None:
+            statuses = TransactionStatuses()
+        new_status = statuses.get(new_status_name)
+
+        if new_status is None:
             raise ValueError(f"Status '{new_status_name}' not found")
+
+        if old_status != new_status_name:
+            changes.append({
+                "fieldChanged": "status",
+                "oldValue": old_status,
+                "newValue": new_status_name
+            })
+            transaction.transactionStatus = new_status
     
-    # Save the transaction if there were changes
-    if changes:
-        transaction.save()
-        TrackTransactionChanges(transaction, changes)
+    return changes
+
+
+def _TransactionId(update):
+    """
+    Get the integer id of a bulk update item, None when it has none (booleans are not ids).
+    """
+    transaction_id = update.get("id") if isinstance(update, dict) else None
+    if isinstance(transaction_id, bool) or not isinstance(transaction_id, int):
+        return None
+    return transaction_id
+
+
+def BulkUpdateTransactions(merchant_id, updates):
+    """
+    Update many transactions of a merchant in one database transaction.
+
+    Transactions are loaded with one query and the statuses with another;
+    changed rows are written with one bulk UPDATE and their history with
+    one bulk INSERT. Invalid items are reported and skipped, the others
+    are still applied. An item that changes an amount rejects the whole
+    update, see CheckAmountUnchanged; bulk_update would bypass the merchant
+    balance and the balanceAfter chain.
     
-    return transaction, changes 
\ No newline at end of file
+    Args:
+        merchant_id: The ID of the merchant owning the transactions
+        updates: List of dictionaries with the transaction id and the fields to update
+        
+    Returns:
+        list: One result per item with id, result ("updated", "unchanged" or "failed") and changes or error
+    """
+    if not isinstance(updates, list) or not updates:
+        raise ValueError("transactions must be a non-empty list")
+    if len(updates) > MAX_BULK_TRANSACTIONS:
+        raise ValueError(f"At most {MAX_BULK_TRANSACTIONS} transactions can be updated at once")
+
+    ids = [_TransactionId(update) for update in updates]
+    statuses = TransactionStatuses()
+
+    results = []
+    changed = []
+    history = []
+    fields = set()
+    seen = set()
+
+    with db_transaction.atomic():
+        transactions = Transaction.objects.select_related("transactionStatus").filter(
+            merchant=merchant_id
+        ).in_bulk([transaction_id for transaction_id in ids if transaction_id is not None])
+
+        for update, transaction_id in zip(updates, ids):
+            transaction = transactions.get(transaction_id)
+
+            if transaction is None:
+                requested_id = update.get("id") if isinstance(update, dict) else None
+                results.append({"id": requested_id, "result": "failed", "error": "Transaction not found"})
+                continue
+            if transaction_id in seen:
+                results.append({"id": transaction_id, "result": "failed", "error": "Transaction listed more than once"})
+                continue
+            seen.add(transaction_id)
+            # Raised out of the loop, so that the whole update is rolled back
+            CheckAmountUnchanged(transaction, update)
+
+            try:
+                changes = ApplyTransactionChanges(transaction, update, statuses)
+            except ValueError as e:
+                # The partly changed instance is simply not saved
+                results.append({"id": transaction_id, "result": "failed", "error": str(e)})
+                continue
+
+            if changes:
+                transaction.version += 1
+                changed.append(transaction)
+                history.extend(HistoryRecords(transaction, changes))
+                fields.update(ChangedModelFields(changes))
+
+            results.append({
+                "id": transaction_id,
+                "result": "updated" if changes else "unchanged",
+                "changes": changes
+            })
+
+        if changed:
+            updatedAt = timezone.now()
+            for transaction in changed:
+                transaction.updatedAt = updatedAt
+            Transaction.objects.bulk_update(changed, sorted(fields | {"version", "updatedAt"}), batch_size=500)
+            TransactionHistory.objects.bulk_create(history, batch_size=500)
+
+            # bulk_update sends no post_save, so the rollups are corrected here
+            deltas = TransactionDeltas()
+            for transaction in changed:
+                AddTransactionDelta(deltas, transaction)
+            ApplyTransactionRollups(deltas)
+
+    return results
@@ -0,0 +1,75 @@
+"""
+Workload utilities for the API application.
+This module keeps the CourierWorkload counters in step with order assignments and order statuses.
+"""
+
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from ..models import CourierWorkload, OrderAssignment
+
+
+def ApplyWorkloadDeltas(deltas):
+    """
+    Add deltas to courier workload counters.
+
+    Missing counter rows are created first, then every counter is changed
+    with an UPDATE ... SET activeCount = activeCount + delta so that
+    concurrent writers do not lose updates.
+
+    Args:
+        deltas: Mapping of (userId, statusId) to the change in active orders
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        CourierWorkload.objects.bulk_create(
+            [CourierWorkload(user_id=userId, status_id=statusId) for userId, statusId in deltas],
+            ignore_conflicts=True
+        )
+        for (userId, statusId), delta in deltas.items():
+            CourierWorkload.objects.filter(user_id=userId, status_id=statusId).update(
+                activeCount=F('activeCount') + delta
+            )
+
+
+def MoveOrderWorkload(orderId, oldStatusId, newStatusId):
+    """
+    Move an order's active assignee from one status counter to another.
+
+    Args:
+        orderId: The ID of the order whose status changed
+        oldStatusId: The previous status ID
+        newStatusId: The new status ID
+    """
+    deltas = Counter()
+    for userId in OrderAssignment.objects.filter(order_id=orderId, isActive=True).values_list('user_id', flat=True):
+        deltas[(userId, oldStatusId)] -= 1
+        deltas[(userId, newStatusId)] += 1
+
+    ApplyWorkloadDeltas(deltas)
+
+
+def RebuildCourierWorkloads():
+    """
+    Recompute all courier workload counters from the active assignments.
+
+    Returns:
+        int: The number of counter rows written
+    """
+    counts = OrderAssignment.objects.filter(isActive=True).values('user_id', 'order__status_id').annotate(
+        activeCount=Count('id')
+    )
+
+    with transaction.atomic():
+        CourierWorkload.objects.all().delete()
+        workloads = CourierWorkload.objects.bulk_create([
+            CourierWorkload(user_id=row['user_id'], status_id=row['order__status_id'], activeCount=row['activeCount'])
+            for row in counts
+        ], batch_size=1000)
+
+    return len(workloads)
@@ -2,7 +2,6 @@ from rest_framework import status, generics, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
 
 from ..serializers import (
@@ -10,6 +9,7 @@ from ..serializers import (
     ChangePasswordSerializer
 )
 from ..utils.ExceptionUtils import ApiExceptionHandler
+from ..utils.BlacklistUtils import CachedRefreshToken
 
 User = get_user_model()
 
@@ -21,12 +21,22 @@ class RegisterView(generics.CreateAPIView):
     permission_classes = (permissions.AllowAny,)
     serializer_class = RegisterSerializer
 
+def FreshUser(request):
+    """
+    Load the authenticated user's row from the database.
+
+    request.user may be a cached copy up to USER_CACHE_TTL_SECONDS old;
+    saving it would write back stale login bookkeeping and passwords, so
+    views that save the user load it again first.
+    """
+    return User.objects.select_related('role', 'merchant').get(pk=request.user.pk)
+
 class ChangePasswordView(generics.UpdateAPIView):
     serializer_class = ChangePasswordSerializer
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
-        return self.request.user
+        return FreshUser(self.request)
 
     @ApiExceptionHandler
     def update(self, request, *args, **kwargs):
@@ -49,7 +59,9 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
-        return self.request.user
+        if self.request.method in permissions.SAFE_METHODS:
+            return self.request.user
+        return FreshUser(self.request)
 
     @ApiExceptionHandler
     def update(self, request, *args, **kwargs):
@@ -61,7 +73,7 @@ class LogoutView(APIView):
     def post(self, request):
         try:
             refresh_token = request.data["refresh_token"]
-            token = RefreshToken(refresh_token)
+            token = CachedRefreshToken(refresh_token)
             token.blacklist()
             return Response(status=status.HTTP_205_RESET_CONTENT)
         except Exception:
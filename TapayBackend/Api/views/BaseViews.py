@@ -0,0 +1,47 @@
+"""
+Base views for the API application.
+This module contains shared base classes for API views.
+"""
+
+from rest_framework.views import APIView
+
+from ..utils.PaginationUtils import ParsePageSize, CursorPaginate, PagePaginate
+
+
+class PaginatedListView(APIView):
+    """
+    Base API view for list endpoints sorted by (createdAt, id).
+
+    Requests carrying a `cursor` query parameter are paginated by keyset,
+    all other requests fall back to page-number pagination.
+    """
+
+    # Whether the list is sorted newest first
+    descending = True
+
+    # Serializer for the listed items, its declared relations are loaded eagerly
+    serializer_class = None
+
+    def paginate(self, request, queryset):
+        """
+        Paginate a queryset according to the request's query parameters.
+
+        Query Parameters:
+            cursor (str, optional): Opaque cursor from a previous response's meta
+            page (int): The page number to retrieve when no cursor is given (default: 1)
+            page_size (int): Number of items per page (default: 10, max: 100)
+
+        Returns:
+            tuple: (items, meta) where meta is the pagination metadata
+        """
+        pageSize = ParsePageSize(request)
+        cursor = request.query_params.get('cursor')
+
+        if self.serializer_class is not None:
+            queryset = self.serializer_class.setup_eager_loading(queryset)
+
+        if cursor:
+            return CursorPaginate(queryset, cursor, pageSize, self.descending)
+
+        page = request.query_params.get('page', 1)
+        return PagePaginate(queryset, page, pageSize, self.descending)
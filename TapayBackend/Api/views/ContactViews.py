@@ -1,9 +1,14 @@
-from rest_framework import generics, permissions
+from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.views import APIView
 from ..models import Contact
 from ..serializers import ContactSerializer
 from ..utils.ExceptionUtils import ApiExceptionHandler
+from ..utils.ResponseUtils import SuccessResponse, ErrorResponse
+from ..utils.ContactQueueUtils import (
+    ContactQueueFull, ContactQueueStats, ContactTokenBucketThrottle, QueueContact, CONTACT_FLUSH_SECONDS
+)
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 10
@@ -23,13 +28,32 @@ class ContactListView(generics.ListCreateAPIView):
             return [permissions.IsAuthenticated()]
         return [permissions.AllowAny()]
 
+    def get_throttles(self):
+        if self.request.method == 'POST':
+            return [ContactTokenBucketThrottle()]
+        return super().get_throttles()
+
     @ApiExceptionHandler
     def create(self, request, *args, **kwargs):
+        """
+        Validate a contact submission and queue it for the background writer.
+
+        Returns:
+            Response: 202 with the submitted contact, which is stored shortly after;
+                400 when it is invalid, 429 when the client submits too often and 503 when the queue is full
+        """
         serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        self.perform_create(serializer)
-        headers = self.get_success_headers(serializer.data)
-        return Response(serializer.data, status=201, headers=headers)
+        if not serializer.is_valid():
+            return ErrorResponse("Invalid contact submission", status.HTTP_400_BAD_REQUEST, serializer.errors)
+
+        try:
+            QueueContact(Contact(**serializer.validated_data))
+        except ContactQueueFull:
+            response = ErrorResponse("Too many contact submissions, please retry shortly", status.HTTP_503_SERVICE_UNAVAILABLE)
+            response['Retry-After'] = str(max(1, round(CONTACT_FLUSH_SECONDS)))
+            return response
+
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
 
 class ContactDetailView(generics.RetrieveAPIView):
     """
@@ -37,4 +61,20 @@ class ContactDetailView(generics.RetrieveAPIView):
     """
     queryset = Contact.objects.all()
     serializer_class = ContactSerializer
-    permission_classes = [permissions.IsAuthenticated]
\ No newline at end of file
+    permission_classes = [permissions.IsAuthenticated]
+
+class ContactQueueStatsView(APIView):
+    """
+    View for the state of the contact write-behind queue.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    @ApiExceptionHandler
+    def get(self, request, *args, **kwargs):
+        """
+        Get the queue depth, counters and flush latency of this process's contact queue.
+
+        Returns:
+            Response: The queue statistics
+        """
+        return SuccessResponse(ContactQueueStats())
@@ -0,0 +1,418 @@
+"""
+Dispatch views for the API application.
+This module contains location-based views for couriers.
+"""
+
+import math
+import uuid
+from functools import reduce
+from operator import or_
+
+import numpy as np
+from django.db.models import Avg, Count, Exists, OuterRef, Q
+from rest_framework.views import APIView
+from rest_framework import permissions
+from rest_framework import status as httpStatus
+
+from ..models import Merchant, Order, OrderAssignment, User
+from ..serializers import OrderSerializer
+from ..utils.ResponseUtils import SuccessResponse
+from ..utils.ExceptionUtils import ApiExceptionHandler
+from ..utils.GeoUtils import GeoCellRanges, HaversineKm
+from ..utils.PaginationUtils import ParsePageSize
+from ..utils.RouteUtils import OptimizeRoute
+from ..utils.AssignmentUtils import AssignOrders, PlanDispatch, DEFAULT_LOAD_WEIGHT_KM
+from ..utils.RegistryUtils import RoleIds, StatusIds
+
+DEFAULT_NEARBY_RADIUS_KM = 5
+MAX_NEARBY_RADIUS_KM = 50
+
+# Upper bound on the orders planned by one dispatch request
+MAX_DISPATCH_ORDERS = 1000
+
+
+def ParseCoordinate(request, name, limit, required=True):
+    """
+    Read a latitude or longitude query parameter.
+    """
+    value = request.query_params.get(name)
+    if value is None:
+        if required:
+            raise ValueError(f"{name} is required")
+        return None
+
+    try:
+        value = float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number")
+
+    if not -limit <= value <= limit:
+        raise ValueError(f"{name} must be between {-limit} and {limit}")
+    return value
+
+
+def ParseRadius(request):
+    """
+    Read the radius query parameter in kilometres and clamp it to MAX_NEARBY_RADIUS_KM.
+    """
+    try:
+        radius = float(request.query_params.get('radius', DEFAULT_NEARBY_RADIUS_KM))
+    except ValueError:
+        raise ValueError("radius must be a number")
+
+    if not math.isfinite(radius) or radius <= 0:
+        raise ValueError("radius must be a positive number")
+
+    return min(radius, MAX_NEARBY_RADIUS_KM)
+
+
+def ParseBodyNumber(data, name, cast, default=None):
+    """
+    Read an optional number from a request body.
+    """
+    value = data.get(name)
+    if value is None:
+        return default
+
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number")
+
+
+def ParseDispatchIds(data):
+    """
+    Read the optional orderIds and courierIds lists of a dispatch request body.
+
+    Returns:
+        tuple: (orderIds, courierIds), each None when not given
+    """
+    orderIds = data.get('orderIds')
+    if orderIds is not None and not (
+        isinstance(orderIds, list) and all(type(orderId) is int for orderId in orderIds)
+    ):
+        raise ValueError("orderIds must be a list of integers")
+
+    courierIds = data.get('courierIds')
+    if courierIds is not None:
+        if not isinstance(courierIds, list) or not all(isinstance(courierId, str) for courierId in courierIds):
+            raise ValueError("courierIds must be a list of courier IDs")
+        try:
+            courierIds = [uuid.UUID(courierId) for courierId in courierIds]
+        except ValueError:
+            raise ValueError("courierIds must be a list of courier IDs")
+
+    return orderIds, courierIds
+
+
+def ParseCourierLocations(data):
+    """
+    Read the optional courierLocations mapping of a dispatch request body.
+
+    Returns:
+        dict: Courier ID to (latitude, longitude)
+    """
+    courierLocations = data.get('courierLocations') or {}
+    if not isinstance(courierLocations, dict):
+        raise ValueError("courierLocations must map courier IDs to objects with lat and lng")
+
+    locations = {}
+    for courierId, location in courierLocations.items():
+        if not isinstance(location, dict):
+            raise ValueError(f"courierLocations[{courierId}] must be an object with lat and lng")
+        locations[courierId] = (
+            ParseBodyNumber(location, 'lat', float), ParseBodyNumber(location, 'lng', float)
+        )
+        if None in locations[courierId]:
+            raise ValueError(f"courierLocations[{courierId}] needs lat and lng")
+    return locations
+
+
+def UnassignedOpenOrders(merchantId):
+    """
+    Orders of a merchant that are still open and have no active assignment.
+    """
+    activeAssignments = OrderAssignment.objects.filter(order=OuterRef('pk'), isActive=True)
+
+    return Order.objects.filter(merchant=merchantId).exclude(
+        status__in=StatusIds(Order.CLOSED_STATUSES)
+    ).filter(~Exists(activeAssignments))
+
+
+class CourierNearbyOrdersView(APIView):
+    """
+    API view for finding unassigned orders close to a courier.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    @ApiExceptionHandler
+    def get(self, request, *args, **kwargs):
+        """
+        Get the unassigned open orders of the courier's merchant within a radius, nearest first.
+
+        Candidates are read from the grid cells covering the radius and their
+        distances computed in one vectorized haversine pass.
+
+        Args:
+            request: The HTTP request
+            courierId: The ID of the courier (from URL)
+
+        Query Parameters:
+            lat (float): Latitude of the courier
+            lng (float): Longitude of the courier
+            radius (float, optional): Search radius in kilometres (default: 5, clamped to 50)
+            page_size (int): Maximum number of orders returned (default: 10, max: 100)
+
+        Returns:
+            Response: Orders with their distance in kilometres
+        """
+        courierId = kwargs.get('courierId')
+        courier = User.objects.get(pk=courierId)
+
+        if not courier.merchant_id:
+            raise ValueError("Courier is not associated with a merchant")
+
+        latitude = ParseCoordinate(request, 'lat', 90)
+        longitude = ParseCoordinate(request, 'lng', 180)
+        radius = ParseRadius(request)
+        pageSize = ParsePageSize(request)
+
+        cellFilter = reduce(or_, (
+            Q(geoCell__range=cellRange) for cellRange in GeoCellRanges(latitude, longitude, radius)
+        ))
+        candidates = list(
+            UnassignedOpenOrders(courier.merchant_id).filter(cellFilter).values_list(
+                'id', 'addressLatitude', 'addressLongitude'
+            )
+        )
+
+        orders = []
+        total = 0
+
+        if candidates:
+            ids, latitudes, longitudes = (np.array(column) for column in zip(*candidates))
+            distances = HaversineKm(latitude, longitude, latitudes, longitudes)
+
+            inRadius = np.flatnonzero(distances <= radius)
+            total = len(inRadius)
+            nearest = inRadius[np.argsort(distances[inRadius], kind='stable')[:pageSize]]
+
+            instances = OrderSerializer.setup_eager_loading(Order.objects).in_bulk(ids[nearest].tolist())
+            for index in nearest:
+                data = OrderSerializer(instances[int(ids[index])]).data
+                data["distanceKm"] = round(float(distances[index]), 3)
+                orders.append(data)
+
+        return SuccessResponse({
+            "orders": orders
+        },
+        meta = {
+            "total": total,
+            "pageSize": pageSize,
+            "radiusKm": radius
+        })
+
+
+class CourierRouteView(APIView):
+    """
+    API view for planning the visiting order of a courier's active orders.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    @ApiExceptionHandler
+    def get(self, request, *args, **kwargs):
+        """
+        Get the courier's open, actively assigned orders in driving order.
+
+        The sequence is built with nearest-neighbour and improved with 2-opt
+        over a haversine distance matrix. Orders without coordinates are
+        listed after the routed stops.
+
+        Args:
+            request: The HTTP request
+            courierId: The ID of the courier (from URL)
+
+        Query Parameters:
+            lat (float, optional): Current latitude of the courier
+            lng (float, optional): Current longitude of the courier
+
+        Returns:
+            Response: The ordered stops with leg and cumulative distances
+        """
+        courierId = kwargs.get('courierId')
+        User.objects.get(pk=courierId)
+
+        latitude = ParseCoordinate(request, 'lat', 90, required=False)
+        longitude = ParseCoordinate(request, 'lng', 180, required=False)
+        if (latitude is None) != (longitude is None):
+            raise ValueError("lat and lng must be given together")
+
+        courierOrderAssignments = OrderAssignment.objects.filter(
+            user=courierId,
+            isActive=True
+        )
+
+        orders = list(
+            OrderSerializer.setup_eager_loading(Order.objects).filter(
+                id__in = courierOrderAssignments.values_list('order', flat=True)
+            ).exclude(
+                status__in=StatusIds(Order.CLOSED_STATUSES)
+            ).order_by('createdAt', 'id')
+        )
+
+        routable = [order for order in orders if order.geoCell is not None]
+        unroutable = [order for order in orders if order.geoCell is None]
+
+        sequence, legs = OptimizeRoute(
+            [order.addressLatitude for order in routable],
+            [order.addressLongitude for order in routable],
+            latitude,
+            longitude
+        )
+
+        stops = []
+        totalDistance = 0.0
+        for index, leg in zip(sequence, legs):
+            totalDistance += leg
+            data = OrderSerializer(routable[index]).data
+            data["legDistanceKm"] = round(leg, 3)
+            data["cumulativeDistanceKm"] = round(totalDistance, 3)
+            stops.append(data)
+
+        return SuccessResponse({
+            "stops": stops,
+            "unroutable": OrderSerializer(unroutable, many=True).data
+        },
+        meta = {
+            "totalDistanceKm": round(totalDistance, 3),
+            "stopCount": len(stops)
+        })
+
+
+class MerchantDispatchView(APIView):
+    """
+    API view for assigning many orders to many couriers in one call.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    @ApiExceptionHandler
+    def post(self, request, *args, **kwargs):
+        """
+        Assign orders to a merchant's drivers, balancing distance and current load.
+
+        Each order goes to the driver with the lowest distance plus
+        loadWeightKm per order already carried. A driver's position is taken
+        from courierLocations, or else the centre of their active orders.
+        All assignments are written in one database transaction.
+
+        Args:
+            request: The HTTP request
+            merchantId: The ID of the merchant (from URL)
+
+        Request Body:
+            orderIds (list, optional): Orders to dispatch (default: the oldest unassigned open orders, at most 1000);
+                closed and already assigned orders among them are skipped and reported in rejectedOrderIds
+            courierIds (list, optional): Drivers to dispatch to (default: all active drivers of the merchant)
+            courierLocations (dict, optional): Courier ID to {"lat": float, "lng": float}
+            loadWeightKm (float, optional): Cost of one carried order in kilometres (default: 2)
+            maxOrdersPerCourier (int, optional): Maximum active orders per driver
+
+        Returns:
+            Response: The created assignments, the orders left unassigned and the rejected orders
+        """
+        data = request.data
+        if not isinstance(data, dict):
+            raise ValueError("The request body must be a JSON object")
+
+        merchantId = kwargs.get('merchantId')
+        Merchant.objects.get(pk=merchantId)
+
+        loadWeightKm = ParseBodyNumber(data, 'loadWeightKm', float, DEFAULT_LOAD_WEIGHT_KM)
+        capacity = ParseBodyNumber(data, 'maxOrdersPerCourier', int)
+        courierLocations = ParseCourierLocations(data)
+        orderIds, requestedCourierIds = ParseDispatchIds(data)
+
+        rejectedOrderIds = []
+        if orderIds is None:
+            orders = UnassignedOpenOrders(merchantId).order_by('createdAt', 'id')[:MAX_DISPATCH_ORDERS]
+            orders = list(orders.values_list('id', 'addressLatitude', 'addressLongitude'))
+        else:
+            if len(orderIds) > MAX_DISPATCH_ORDERS:
+                raise ValueError(f"At most {MAX_DISPATCH_ORDERS} orders can be dispatched at once")
+
+            foundIds = set(Order.objects.filter(merchant=merchantId, id__in=orderIds).values_list('id', flat=True))
+            missing = sorted(set(orderIds) - foundIds)
+            if missing:
+                raise ValueError(f"Orders not found for this merchant: {missing}")
+
+            # Closed orders and orders that already have a courier are not dispatched again
+            orders = UnassignedOpenOrders(merchantId).filter(id__in=orderIds).order_by('createdAt', 'id')
+            orders = list(orders.values_list('id', 'addressLatitude', 'addressLongitude'))
+            rejectedOrderIds = sorted(foundIds - {order[0] for order in orders})
+
+        couriers = User.objects.filter(merchant=merchantId, role__in=RoleIds("Driver"), is_active=True)
+        if requestedCourierIds is not None:
+            couriers = couriers.filter(id__in=requestedCourierIds)
+        courierIds = list(couriers.order_by('createdAt', 'id').values_list('id', flat=True))
+
+        # Current load and the centre of each driver's active orders, in one query
+        workloads = {
+            row['user']: row
+            for row in OrderAssignment.objects.filter(user__in=courierIds, isActive=True).values('user').annotate(
+                load=Count('id'),
+                latitude=Avg('order__addressLatitude'),
+                longitude=Avg('order__addressLongitude')
+            )
+        }
+
+        courierPoints = []
+        loads = []
+        for courierId in courierIds:
+            workload = workloads.get(courierId, {})
+            location = courierLocations.get(str(courierId))
+            if location:
+                courierPoints.append(location)
+            else:
+                courierPoints.append((workload.get('latitude'), workload.get('longitude')))
+            loads.append(workload.get('load', 0))
+
+        plan = PlanDispatch(
+            [(latitude, longitude) for _, latitude, longitude in orders],
+            courierPoints,
+            loads,
+            loadWeightKm,
+            capacity
+        )
+
+        pairs = []
+        distances = []
+        unassignedOrderIds = []
+        for (orderId, _, _), (courierIndex, distance) in zip(orders, plan):
+            if courierIndex is None:
+                unassignedOrderIds.append(orderId)
+                continue
+            pairs.append((orderId, courierIds[courierIndex]))
+            distances.append(distance)
+
+        assignments = AssignOrders(pairs)
+
+        return SuccessResponse(
+            {
+                "assignments": [
+                    {
+                        "assignmentId": assignment.id,
+                        "orderId": assignment.order_id,
+                        "userId": assignment.user_id,
+                        "distanceKm": round(distance, 3) if distance is not None else None,
+                    }
+                    for assignment, distance in zip(assignments, distances)
+                ],
+                "unassignedOrderIds": unassignedOrderIds,
+                "rejectedOrderIds": rejectedOrderIds
+            },
+            message="Orders dispatched successfully",
+            status_code=httpStatus.HTTP_201_CREATED
+        )
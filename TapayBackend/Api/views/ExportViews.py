@@ -0,0 +1,145 @@
+"""
+Export views for the API application.
+This module contains views that stream merchant data as CSV or NDJSON files.
+"""
+
+from rest_framework.views import APIView
+from rest_framework import permissions
+
+from ..models import Merchant, Order, Transaction
+from ..utils.ExceptionUtils import ApiExceptionHandler
+from ..utils.RegistryUtils import StatusIds
+from ..utils.ExportUtils import StreamingExportResponse, ParseDateBound
+
+ORDER_EXPORT_COLUMNS = {
+    "id": "id",
+    "title": "title",
+    "amount": "amount",
+    "customerName": "customerName",
+    "addressText": "addressText",
+    "addressLongitude": "addressLongitude",
+    "addressLatitude": "addressLatitude",
+    "additionalNotes": "additionalNotes",
+    "createdAt": "createdAt",
+    "statusName": "status__name",
+    "statusId": "status_id",
+    "merchantId": "merchant_id",
+}
+
+TRANSACTION_EXPORT_COLUMNS = {
+    "id": "id",
+    "amount": "amount",
+    "paymentMethod": "paymentMethod",
+    "balanceAfter": "balanceAfter",
+    "cardNumber": "cardNumber",
+    "createdAt": "createdAt",
+    "statusName": "transactionStatus__name",
+    "statusId": "transactionStatus_id",
+    "orderId": "order_id",
+    "merchantId": "merchant_id",
+}
+
+
+def FilterCreatedAt(queryset, request):
+    """
+    Apply the `from` and `to` query parameters to a queryset's createdAt.
+    """
+    createdFrom = ParseDateBound(request.query_params.get('from'), 'from')
+    createdTo = ParseDateBound(request.query_params.get('to'), 'to', endOfDay=True)
+
+    if createdFrom:
+        queryset = queryset.filter(createdAt__gte=createdFrom)
+    if createdTo:
+        queryset = queryset.filter(createdAt__lt=createdTo)
+    return queryset
+
+
+class MerchantOrdersExportView(APIView):
+    """
+    API view for exporting all orders of a merchant in one streamed response.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    @ApiExceptionHandler
+    def get(self, request, *args, **kwargs):
+        """
+        Stream a merchant's orders oldest first.
+
+        Args:
+            request: The HTTP request
+            merchantId: The ID of the merchant (from URL)
+
+        Query Parameters:
+            output (str, optional): "csv" (default) or "ndjson"
+            status (str, optional): Filter orders by status name
+            from (str, optional): Only orders created at or after this date or datetime
+            to (str, optional): Only orders created before this datetime, or up to the end of this date
+
+        Returns:
+            StreamingHttpResponse: The exported orders
+        """
+        merchantId = kwargs.get('merchantId')
+        Merchant.objects.get(pk=merchantId)
+
+        status = request.query_params.get('status', None)
+
+        orders = Order.objects.filter(merchant=merchantId)
+
+        if status:
+            orders = orders.filter(status__in = StatusIds(status))
+
+        # id order follows the merchant index, so rows stream without a sort
+        orders = FilterCreatedAt(orders, request).order_by('id')
+
+        return StreamingExportResponse(
+            orders,
+            ORDER_EXPORT_COLUMNS,
+            request.query_params.get('output', 'csv'),
+            f"merchant-{merchantId}-orders"
+        )
+
+
+class MerchantTransactionsExportView(APIView):
+    """
+    API view for exporting all transactions of a merchant in one streamed response.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    @ApiExceptionHandler
+    def get(self, request, *args, **kwargs):
+        """
+        Stream a merchant's transactions oldest first.
+
+        Args:
+            request: The HTTP request
+            merchantId: The ID of the merchant (from URL)
+
+        Query Parameters:
+            output (str, optional): "csv" (default) or "ndjson"
+            orderId (int, optional): Only transactions of this order
+            from (str, optional): Only transactions created at or after this date or datetime
+            to (str, optional): Only transactions created before this datetime, or up to the end of this date
+
+        Returns:
+            StreamingHttpResponse: The exported transactions
+        """
+        merchantId = kwargs.get('merchantId')
+        Merchant.objects.get(pk=merchantId)
+
+        orderId = request.query_params.get('orderId', None)
+
+        transactions = Transaction.objects.filter(merchant=merchantId)
+
+        if orderId:
+            transactions = transactions.filter(order=int(orderId))
+
+        transactions = FilterCreatedAt(transactions, request).order_by('id')
+
+        return StreamingExportResponse(
+            transactions,
+            TRANSACTION_EXPORT_COLUMNS,
+            request.query_params.get('output', 'csv'),
+            f"merchant-{merchantId}-transactions"
+        )
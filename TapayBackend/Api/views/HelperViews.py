@@ -2,12 +2,18 @@ from rest_framework import generics
 from Api.models import Status
 from Api.serializers import StatusSerializer
 from Api.utils.ExceptionUtils import ApiExceptionHandler
+from Api.utils.ConditionalUtils import ConditionalGet, StatusListState
 
 class StatusListView(generics.ListAPIView):
     queryset = Status.objects.all()
     serializer_class = StatusSerializer
     pagination_class = None
 
+    @ApiExceptionHandler
+    @ConditionalGet(StatusListState)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
     @ApiExceptionHandler
     def get_queryset(self):
         queryset = Status.objects.all()
@@ -1,57 +1,48 @@
-from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.pagination import PageNumberPagination
 
 from Api.models import Merchant, User
 from Api.serializers import MerchantSerializer, CourierSerializer
+from Api.utils.RegistryUtils import RoleIds
+from Api.utils.ConditionalUtils import ConditionalGet, MerchantListState
 from ..utils.ResponseUtils import SuccessResponse
 from ..utils.ExceptionUtils import ApiExceptionHandler
+from .BaseViews import PaginatedListView
 
-class MerchantsView(APIView):
+class MerchantsView(PaginatedListView):
     """
     API view for managing merchants in the system.
     Provides endpoints for listing all merchants and creating new merchant accounts.
     Requires authentication for all operations.
     """
     permission_classes = [IsAuthenticated]
+    serializer_class = MerchantSerializer
 
     @ApiExceptionHandler
+    @ConditionalGet(MerchantListState)
     def get(self, request, *args, **kwargs):
         """
         Retrieves a paginated list of all merchants in the system.
         
         Query Parameters:
-            page (int): The page number to retrieve (default: 1)
-            page_size (int): Number of items per page (default: 10)
+            cursor (str, optional): Cursor from a previous page's meta
+            page (int): The page number to retrieve when no cursor is given (default: 1)
+            page_size (int): Number of items per page (default: 10, max: 100)
             
         Returns:
             Response: A paginated list of merchants with metadata about the pagination
         """
-        page = request.query_params.get('page', 1)
-        pageSize = request.query_params.get('page_size', 10)
+        merchants = Merchant.objects.all()
 
-        merchants = Merchant.objects.all().order_by('-createdAt')
+        paginatedMerchants, meta = self.paginate(request, merchants)
 
-        paginator = PageNumberPagination()
-        paginator.page_size = pageSize
-
-        paginatedMerchants = paginator.paginate_queryset(merchants, request)
-
-        serializer = MerchantSerializer(paginatedMerchants, many=True)
+        serializer = self.serializer_class(paginatedMerchants, many=True)
 
         return SuccessResponse({
             "merchants": serializer.data
         }, 
-        meta = {
-            "total": paginator.page.paginator.count,
-            "page": int(page),
-            "pageSize": int(pageSize),
-            "totalPages": paginator.page.paginator.num_pages,
-            "hasNext": paginator.page.has_next(),
-            "hasPrevious": paginator.page.has_previous()
-        })
+        meta = meta)
         
     @ApiExceptionHandler
     def post(self, request, *args, **kwargs):
@@ -82,13 +73,14 @@ class MerchantsView(APIView):
         
         return SuccessResponse(serializer.data, "Merchant created successfully")
     
-class MerchantCouriersView(APIView):
+class MerchantCouriersView(PaginatedListView):
     """
     API view for managing courier drivers associated with a specific merchant.
     Provides endpoints for retrieving courier drivers assigned to a merchant.
     Requires authentication for all operations.
     """
     permission_classes = [IsAuthenticated]
+    serializer_class = CourierSerializer
 
     @ApiExceptionHandler
     def get(self, request, *args, **kwargs):
@@ -97,39 +89,27 @@ class MerchantCouriersView(APIView):
         
         Query Parameters:
             merchantId (str): The ID of the merchant to get couriers for
-            page (int): The page number to retrieve (default: 1)
-            page_size (int): Number of items per page (default: 10)
+            cursor (str, optional): Cursor from a previous page's meta
+            page (int): The page number to retrieve when no cursor is given (default: 1)
+            page_size (int): Number of items per page (default: 10, max: 100)
             
         Returns:
             Response: A paginated list of courier drivers with metadata about the pagination
         """
-        page = request.query_params.get('page', 1)
-        pageSize = request.query_params.get('page_size', 10)
-
         merchantId = kwargs.get('merchantId')
 
         if not merchantId:
             raise ValueError("Merchant ID is required")
         
         merchant = Merchant.objects.get(id=merchantId)
-        courierDrivers = User.objects.filter(role__name="Driver", merchant=merchant).order_by('-createdAt')
-
-        paginator = PageNumberPagination()
-        paginator.page_size = pageSize
+        courierDrivers = User.objects.filter(role__in=RoleIds("Driver"), merchant=merchant)
 
-        paginatedCourierDrivers = paginator.paginate_queryset(courierDrivers, request)
+        paginatedCourierDrivers, meta = self.paginate(request, courierDrivers)
 
-        serializer = CourierSerializer(paginatedCourierDrivers, many=True)
+        serializer = self.serializer_class(paginatedCourierDrivers, many=True)
 
         return SuccessResponse(serializer.data, 
             message = "Courier drivers fetched successfully", 
-            meta = {
-                "total": paginator.page.paginator.count,
-                "page": int(page),
-                "pageSize": int(pageSize),
-                "totalPages": paginator.page.paginator.num_pages,
-                "hasNext": paginator.page.has_next(),
-                "hasPrevious": paginator.page.has_previous()
-        })
+            meta = meta)
     
     
\ No newline at end of file
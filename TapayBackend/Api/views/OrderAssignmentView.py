@@ -6,9 +6,11 @@ This module contains views for order assignment-related operations.
 from rest_framework.views import APIView
 from rest_framework import status
 from rest_framework import permissions
-from ..models import OrderAssignment, Order, User
+from ..models import Order, User
 from ..utils.ResponseUtils import SuccessResponse, ErrorResponse
 from ..utils.ExceptionUtils import ApiExceptionHandler
+from ..utils.IdempotencyUtils import IdempotentRequest
+from ..utils.AssignmentUtils import AssignOrders
 
 
 class OrderAssignmentView(APIView):
@@ -19,6 +21,7 @@ class OrderAssignmentView(APIView):
     permission_classes = (permissions.IsAuthenticated,)
     
     @ApiExceptionHandler
+    @IdempotentRequest
     def post(self, request, *args, **kwargs):
         """
         Create a new order assignment and deactivate previous ones.
@@ -27,6 +30,9 @@ class OrderAssignmentView(APIView):
             request: The HTTP request containing userId in body
             orderId: The ID of the order (from URL)
             
+        Headers:
+            Idempotency-Key (str, optional): Retries with the same key replay the first response
+            
         Returns:
             Response: The created assignment details
         """
@@ -34,6 +40,8 @@ class OrderAssignmentView(APIView):
         orderId = kwargs.get('orderId')
         
         # Get userId from request body
+        if not isinstance(request.data, dict):
+            raise ValueError("The request body must be a JSON object")
         userId = request.data.get('userId')
         if not userId:
             return ErrorResponse("userId is required in request body")
@@ -43,18 +51,8 @@ class OrderAssignmentView(APIView):
             orderInstance = Order.objects.get(pk=orderId)
             userInstance = User.objects.get(pk=userId)
             
-            # Deactivate all previous assignments for this order
-            OrderAssignment.objects.filter(
-                order=orderInstance,
-                isActive=True
-            ).update(isActive=False)
-            
-            # Create new assignment
-            assignment = OrderAssignment.objects.create(
-                order=orderInstance,
-                user=userInstance,
-                isActive=True
-            )
+            # Deactivate all previous assignments for this order and create the new one
+            assignment, = AssignOrders([(orderInstance.pk, userInstance.pk)])
             
             return SuccessResponse(
                 {
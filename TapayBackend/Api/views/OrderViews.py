@@ -5,24 +5,38 @@ This module contains views for order-related operations.
 
 from rest_framework.views import APIView
 from rest_framework import permissions
-from rest_framework.pagination import PageNumberPagination
+from rest_framework import status as httpStatus
 
-from ..models import Order, OrderAssignment
-from ..serializers import OrderSerializer, SingleOrderSerializer
-from ..utils.ResponseUtils import SuccessResponse
+from ..models import ArchivedOrder, Order, OrderAssignment, Merchant
+from ..serializers import ArchivedOrderSerializer, OrderSerializer, SingleOrderSerializer
+from ..utils.ResponseUtils import SuccessResponse, ErrorResponse
 from ..utils.ExceptionUtils import ApiExceptionHandler
+from ..utils.OrderImportUtils import (
+    ImportOrders, IterNdjsonRows, IterCsvRows, NDJSON_CONTENT_TYPES, CSV_CONTENT_TYPES
+)
+from ..utils.PaginationUtils import ParsePageSize
+from ..utils.SearchUtils import SearchOrders
+from ..utils.RegistryUtils import StatusIds
+from ..utils.ConditionalUtils import ConditionalGet, SingleOrderState
+from ..utils.ArchiveUtils import GetWithArchive
+from .BaseViews import PaginatedListView
 
 
-class MerchantOrdersView(APIView):
+class MerchantOrdersView(PaginatedListView):
     """
     API view for handling operations on multiple orders.
     """
 
     permission_classes = [permissions.IsAuthenticated]
+    serializer_class = OrderSerializer
+
     @ApiExceptionHandler
     def get(self, request, *args, **kwargs):
         """
         Get all orders for a specific merchant with optional status filtering.
+
+        With `q` the orders are searched by title, customer name, address and
+        notes through the full-text index and returned most relevant first.
         
         Args:
             request: The HTTP request containing optional status filter in query params
@@ -30,6 +44,10 @@ class MerchantOrdersView(APIView):
             
         Query Parameters:
             status (str, optional): Filter orders by status name
+            q (str, optional): Full-text search query, words are matched as prefixes
+            cursor (str, optional): Cursor from a previous page's meta (not with q)
+            page (int): The page number when no cursor is given (default: 1)
+            page_size (int): Number of items per page (default: 10, max: 100)
             
         Returns:
             Response: List of filtered orders for the merchant
@@ -38,34 +56,85 @@ class MerchantOrdersView(APIView):
 
         status = request.query_params.get('status', None)
 
-        page = request.query_params.get('page', 1)
-        pageSize = request.query_params.get('page_size', 10)
-
         orders = Order.objects.filter(merchant=merchantId)
 
         if status:
-            orders = orders.filter(status__name = status)
-
-        orders = orders.order_by('-createdAt')
+            orders = orders.filter(status__in = StatusIds(status))
 
-        paginator = PageNumberPagination()
-        paginator.page_size = pageSize
-        
-        paginatedOrders = paginator.paginate_queryset(orders, request)
+        query = request.query_params.get('q')
+        if query is not None:
+            if request.query_params.get('cursor'):
+                raise ValueError("cursor cannot be combined with q, use page instead")
+            paginatedOrders, meta = SearchOrders(
+                self.serializer_class.setup_eager_loading(orders),
+                query,
+                request.query_params.get('page', 1),
+                ParsePageSize(request)
+            )
+        else:
+            paginatedOrders, meta = self.paginate(request, orders)
 
-        serializer = OrderSerializer(paginatedOrders, many=True)
+        serializer = self.serializer_class(paginatedOrders, many=True)
         
         return SuccessResponse({
             "orders": serializer.data
         }, 
-        meta = {
-            "total": paginator.page.paginator.count,
-            "page": int(page),
-            "pageSize": int(pageSize),
-            "totalPages": paginator.page.paginator.num_pages,
-            "hasNext": paginator.page.has_next(),
-            "hasPrevious": paginator.page.has_previous()
-        })
+        meta = meta)
+
+class BulkOrderImportView(APIView):
+    """
+    API view for creating many orders from a streamed upload.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    @ApiExceptionHandler
+    def post(self, request, *args, **kwargs):
+        """
+        Create orders for a merchant from an NDJSON or CSV request body.
+
+        The body is read line by line and never buffered as a whole. Each
+        row holds title, amount, customerName, addressText and optionally
+        addressLongitude, addressLatitude, additionalNotes and status (a
+        status name, default "Pending").
+
+        Args:
+            request: The HTTP request with an application/x-ndjson or text/csv body
+            merchantId: The ID of the merchant (from URL)
+
+        Returns:
+            Response: The number of created and failed rows with per-row errors
+        """
+        merchantId = kwargs.get('merchantId')
+        merchantInstance = Merchant.objects.get(pk=merchantId)
+
+        contentType = request.content_type.split(';')[0].strip().lower()
+        stream = request.stream or []
+
+        if contentType in NDJSON_CONTENT_TYPES:
+            rows = IterNdjsonRows(stream)
+        elif contentType in CSV_CONTENT_TYPES:
+            rows = IterCsvRows(stream)
+        else:
+            return ErrorResponse(
+                "Content-Type must be application/x-ndjson or text/csv",
+                status_code=httpStatus.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+
+        created, failed, errors = ImportOrders(merchantInstance, rows)
+
+        if not created:
+            return ErrorResponse(f"No orders were imported, {failed} rows failed", errors=errors)
+
+        return SuccessResponse(
+            {
+                "created": created,
+                "failed": failed,
+                "errors": errors
+            },
+            message="Orders imported successfully" if not failed else "Orders imported with errors",
+            status_code=httpStatus.HTTP_201_CREATED
+        )
 
 class SingleOrderView(APIView):
     """
@@ -74,30 +143,37 @@ class SingleOrderView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     @ApiExceptionHandler
+    @ConditionalGet(SingleOrderState)
     def get(self, request, *args, **kwargs):
         """
-        Get a single order.
+        Get a single order, from the archive when it has been archived.
         
         Args:
             request: The HTTP request
             orderId: The ID of the order (from URL)
             
         Returns:
-            Response: The order
+            Response: The order, with meta.archived set for archived orders
         """
         merchantId = kwargs.get('merchantId')
         orderId = kwargs.get('orderId')
-        orderInstance = Order.objects.get(merchant = merchantId, pk=orderId)
+        orderInstance, archived = GetWithArchive(
+            SingleOrderSerializer.setup_eager_loading(Order.objects),
+            ArchivedOrderSerializer.setup_eager_loading(ArchivedOrder.objects),
+            merchant = merchantId, pk=orderId
+        )
         
-        serializer = SingleOrderSerializer(orderInstance)
-        return SuccessResponse({"order": serializer.data}) 
+        serializer = (ArchivedOrderSerializer if archived else SingleOrderSerializer)(orderInstance)
+        return SuccessResponse({"order": serializer.data}, meta={"archived": True} if archived else None) 
     
-class CourierOrdersView(APIView):
+class CourierOrdersView(PaginatedListView):
     """
     API view for handling operations on courier orders.
     """
 
     permission_classes = [permissions.IsAuthenticated]
+    serializer_class = OrderSerializer
+    descending = False
     
     @ApiExceptionHandler
     def get(self, request, *args, **kwargs):
@@ -107,16 +183,15 @@ class CourierOrdersView(APIView):
         Args:
             request: The HTTP request
             courierId: The ID of the courier (from URL)
-            page: The page number (from query params)
-            page_size: The number of items per page (from query params)
+            cursor: Cursor from a previous page's meta (from query params)
+            page: The page number when no cursor is given (from query params)
+            page_size: The number of items per page, at most 100 (from query params)
             
         Returns:
             Response: Paginated list of orders with metadata
         """
         courierId = kwargs.get('courierId')
         status = request.query_params.get('status', None)
-        page = request.query_params.get('page', 1)
-        pageSize = request.query_params.get('page_size', 10)
         
         courierOrderAssignments = OrderAssignment.objects.filter(
             user=courierId, 
@@ -125,26 +200,16 @@ class CourierOrdersView(APIView):
         
         orders = Order.objects.filter(
             id__in = courierOrderAssignments.values_list('order', flat=True)
-        ).order_by('createdAt') 
+        )
         
         if status:
-            orders = orders.filter(status__name = status)
-        
-        paginator = PageNumberPagination()
-        paginator.page_size = pageSize
+            orders = orders.filter(status__in = StatusIds(status))
         
-        paginatedOrders = paginator.paginate_queryset(orders, request)
+        paginatedOrders, meta = self.paginate(request, orders)
         
-        serializer = OrderSerializer(paginatedOrders, many=True)
+        serializer = self.serializer_class(paginatedOrders, many=True)
         
         return SuccessResponse({
             "orders": serializer.data
         }, 
-        meta = {
-            "total": paginator.page.paginator.count,
-            "page": int(page),
-            "pageSize": int(pageSize),
-            "totalPages": paginator.page.paginator.num_pages,
-            "hasNext": paginator.page.has_next(),
-            "hasPrevious": paginator.page.has_previous()
-        })
+        meta = meta)
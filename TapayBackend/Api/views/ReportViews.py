@@ -0,0 +1,80 @@
+"""
+Report views for the API application.
+This module contains the merchant dashboard reports served from the daily rollups.
+"""
+
+from datetime import timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.views import APIView
+from rest_framework import permissions
+
+from ..models import Merchant
+from ..utils.ResponseUtils import SuccessResponse
+from ..utils.ExceptionUtils import ApiExceptionHandler
+from ..utils.RollupUtils import MerchantReport, MAX_REPORT_DAYS
+
+DEFAULT_REPORT_DAYS = 30
+
+
+def ParseReportDay(request, name, default):
+    value = request.query_params.get(name)
+    if not value:
+        return default
+
+    try:
+        day = parse_date(value)
+    except ValueError:
+        # Well formed but impossible dates such as 2024-02-30
+        day = None
+
+    if day is None:
+        raise ValueError(f"{name} must be YYYY-MM-DD")
+    return day
+
+
+class MerchantReportView(APIView):
+    """
+    API view for a merchant's revenue and order report over a date range.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    @ApiExceptionHandler
+    def get(self, request, *args, **kwargs):
+        """
+        Get a merchant's transaction and order totals per day, payment method and status.
+
+        The report reads only the daily rollup tables, so its cost depends on
+        the number of days and not on the number of transactions.
+
+        Args:
+            request: The HTTP request
+            merchantId: The ID of the merchant (from URL)
+
+        Query Parameters:
+            from (str, optional): First day, YYYY-MM-DD (default: 29 days before to)
+            to (str, optional): Last day, YYYY-MM-DD (default: today)
+
+        Returns:
+            Response: Totals and breakdowns for the period
+        """
+        merchantId = kwargs.get('merchantId')
+        Merchant.objects.get(pk=merchantId)
+
+        end = ParseReportDay(request, 'to', timezone.localdate())
+        start = ParseReportDay(request, 'from', end - timedelta(days=DEFAULT_REPORT_DAYS - 1))
+
+        if start > end:
+            raise ValueError("from must not be after to")
+        if (end - start).days >= MAX_REPORT_DAYS:
+            raise ValueError(f"A report covers at most {MAX_REPORT_DAYS} days")
+
+        return SuccessResponse(
+            MerchantReport(merchantId, start, end),
+            meta = {
+                "from": start,
+                "to": end
+            }
+        )
@@ -6,21 +6,27 @@ This module contains views for transaction-related operations.
 from rest_framework.views import APIView
 from rest_framework import status
 from rest_framework import permissions
-from rest_framework.pagination import PageNumberPagination
 
-from ..models import Transaction, Merchant, Order, Status, TransactionHistory
-from ..serializers import TransactionSerializer
+from ..models import ArchivedTransaction, ArchivedTransactionHistory, Transaction, Merchant, Order, TransactionHistory
+from ..serializers import ArchivedTransactionSerializer, TransactionSerializer
 from ..utils.ResponseUtils import SuccessResponse, ErrorResponse
 from ..utils.ExceptionUtils import ApiExceptionHandler
-from ..utils.TransactionUtils import UpdateTransactionFields
+from ..utils.IdempotencyUtils import IdempotentRequest
+from ..utils.TransactionUtils import UpdateTransactionFields, BulkUpdateTransactions
+from ..utils.LedgerUtils import AppendTransaction
+from ..utils.RegistryUtils import GetStatus
+from ..utils.ConditionalUtils import ConditionalGet, SingleTransactionState
+from ..utils.ArchiveUtils import GetWithArchive
+from .BaseViews import PaginatedListView
 
 
-class TransactionsView(APIView):
+class TransactionsView(PaginatedListView):
     """
     API view for handling operations on multiple transactions.
     """
 
     permission_classes = [permissions.IsAuthenticated]
+    serializer_class = TransactionSerializer
     
     @ApiExceptionHandler
     def get(self, request, *args, **kwargs):
@@ -37,33 +43,21 @@ class TransactionsView(APIView):
         """
         merchant_id = kwargs.get('merchantId')
         order_id = kwargs.get('orderId')
-
-        page = request.query_params.get('page', 1)
-        pageSize = request.query_params.get('page_size', 10)
         
         # Get all transactions for a specific order
-        transactions = Transaction.objects.filter(merchant=merchant_id, order=order_id).order_by('-createdAt')
-
-        paginator = PageNumberPagination()
-        paginator.page_size = pageSize
+        transactions = Transaction.objects.filter(merchant=merchant_id, order=order_id)
 
-        paginatedTransactions = paginator.paginate_queryset(transactions, request)
+        paginatedTransactions, meta = self.paginate(request, transactions)
 
-        serializer = TransactionSerializer(paginatedTransactions, many=True)
+        serializer = self.serializer_class(paginatedTransactions, many=True)
         
         return SuccessResponse({
             "transactions": serializer.data
         },
-        meta = {
-            "total": paginator.page.paginator.count,
-            "page": int(page),
-            "pageSize": int(pageSize),
-            "totalPages": paginator.page.paginator.num_pages,
-            "hasNext": paginator.page.has_next(),
-            "hasPrevious": paginator.page.has_previous()
-        })
+        meta = meta)
     
     @ApiExceptionHandler
+    @IdempotentRequest
     def post(self, request, *args, **kwargs):
         """
         Create a new transaction for an order.
@@ -73,10 +67,16 @@ class TransactionsView(APIView):
             merchantId: The ID of the merchant (from URL)
             orderId: The ID of the order (from URL)
             
+        Headers:
+            Idempotency-Key (str, optional): Retries with the same key replay the first response
+            
         Returns:
             Response: The created transaction ID
         """
         data = request.data
+        if not isinstance(data, dict):
+            raise ValueError("The request body must be a JSON object")
+
         merchant_id = kwargs.get('merchantId')
         order_id = kwargs.get('orderId')
 
@@ -88,17 +88,17 @@ class TransactionsView(APIView):
         if payment_method == "Card" and (card_number == "" or card_number is None):
             return ErrorResponse("Card number is required")
 
-        merchant_instance = Merchant.objects.get(pk=merchant_id)
-        order_instance = Order.objects.get(pk=order_id)
+        order_instance = Order.objects.get(pk=order_id, merchant=merchant_id)
+        status_instance = GetStatus(transaction_status, "Transaction")
 
-        transaction_instance = Transaction.objects.create(
-            amount=amount,
+        # Appends to the ledger and moves the merchant balance atomically
+        transaction_instance = AppendTransaction(
+            merchant_id,
+            order_instance.pk,
+            amount,
             paymentMethod=payment_method,
             cardNumber=card_number,
-            balanceAfter=merchant_instance.currentBalance + amount,
-            transactionStatus=Status.objects.get(name=transaction_status, type="Transaction"),
-            merchant=merchant_instance,
-            order=order_instance
+            transactionStatus=status_instance
         )
 
         return SuccessResponse(
@@ -115,9 +115,10 @@ class SingleTransactionView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     @ApiExceptionHandler
+    @ConditionalGet(SingleTransactionState)
     def get(self, request, *args, **kwargs):
         """
-        Get a single transaction with its history.
+        Get a single transaction with its history, from the archive when it has been archived.
         
         Args:
             request: The HTTP request
@@ -126,22 +127,25 @@ class SingleTransactionView(APIView):
             transactionId: The ID of the transaction (from URL)
             
         Returns:
-            Response: The transaction and its history
+            Response: The transaction and its history, with meta.archived set for archived transactions
         """
         merchant_id = kwargs.get('merchantId')
         order_id = kwargs.get('orderId')
         transaction_id = kwargs.get('transactionId')
         
-        transaction = Transaction.objects.get(
+        transaction, archived = GetWithArchive(
+            TransactionSerializer.setup_eager_loading(Transaction.objects),
+            ArchivedTransactionSerializer.setup_eager_loading(ArchivedTransaction.objects),
             pk=transaction_id,
             merchant__id=merchant_id,
             order__id=order_id
         )
         
-        serializer = TransactionSerializer(transaction)
+        serializer = (ArchivedTransactionSerializer if archived else TransactionSerializer)(transaction)
         
         # Get transaction history
-        history = TransactionHistory.objects.filter(transaction=transaction).order_by('-createdAt')
+        history_model = ArchivedTransactionHistory if archived else TransactionHistory
+        history = history_model.objects.filter(transaction=transaction).order_by('-createdAt')
         history_data = []
         
         for item in history:
@@ -155,7 +159,7 @@ class SingleTransactionView(APIView):
         return SuccessResponse({
             "transaction": serializer.data,
             "history": history_data
-        })
+        }, meta={"archived": True} if archived else None)
     
     @ApiExceptionHandler
     def put(self, request, *args, **kwargs):
@@ -177,7 +181,7 @@ class SingleTransactionView(APIView):
         transaction_id = kwargs.get('transactionId')
         
         # Get the transaction instance
-        transaction_instance = Transaction.objects.get(
+        transaction_instance = TransactionSerializer.setup_eager_loading(Transaction.objects).get(
             pk=transaction_id, 
             merchant__id=merchant_id, 
             order__id=order_id
@@ -197,4 +201,47 @@ class SingleTransactionView(APIView):
             return SuccessResponse(
                 {},
                 message="No changes detected"
-            ) 
\ No newline at end of file
+            )
+
+class MerchantTransactionsView(APIView):
+    """
+    API view for handling operations on many transactions of a merchant.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    @ApiExceptionHandler
+    def patch(self, request, *args, **kwargs):
+        """
+        Update many transactions of a merchant at once, e.g. to settle a batch.
+
+        All changes are written in one database transaction with one history
+        insert. Items that fail are reported and skipped.
+
+        Args:
+            request: The HTTP request
+            merchantId: The ID of the merchant (from URL)
+
+        Request Body:
+            transactions (list): Objects with the transaction id and any of paymentMethod, cardNumber and status
+
+        Returns:
+            Response: The result of every item
+        """
+        if not isinstance(request.data, dict):
+            raise ValueError("The request body must be a JSON object")
+
+        merchant_id = kwargs.get('merchantId')
+        Merchant.objects.get(pk=merchant_id)
+
+        results = BulkUpdateTransactions(merchant_id, request.data.get("transactions"))
+
+        counts = {"updated": 0, "unchanged": 0, "failed": 0}
+        for result in results:
+            counts[result["result"]] += 1
+
+        return SuccessResponse(
+            {"results": results},
+            message="Transactions updated successfully" if counts["updated"] else "No changes detected",
+            meta=counts
+        )
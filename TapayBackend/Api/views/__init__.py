@@ -3,13 +3,16 @@ Views package for the API application.
 This package contains all the views for the API application.
 """
 
-from .OrderViews import MerchantOrdersView, SingleOrderView, CourierOrdersView
-from .TransactionViews import TransactionsView, SingleTransactionView
+from .OrderViews import MerchantOrdersView, SingleOrderView, CourierOrdersView, BulkOrderImportView
+from .TransactionViews import TransactionsView, SingleTransactionView, MerchantTransactionsView
 from .AuthViews import (
     CustomTokenObtainPairView, RegisterView, ChangePasswordView,
     UserProfileView, LogoutView
 ) 
 from .OrderAssignmentView import OrderAssignmentView
-from .ContactViews import ContactListView, ContactDetailView
+from .ContactViews import ContactListView, ContactDetailView, ContactQueueStatsView
 from .MerchantViews import MerchantsView, MerchantCouriersView
-from .HelperViews import StatusListView
\ No newline at end of file
+from .HelperViews import StatusListView
+from .ExportViews import MerchantOrdersExportView, MerchantTransactionsExportView
+from .DispatchViews import CourierNearbyOrdersView, CourierRouteView, MerchantDispatchView
+from .ReportViews import MerchantReportView
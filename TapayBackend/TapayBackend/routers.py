@@ -0,0 +1,138 @@
+"""
+Read-replica routing for the TapayBackend project.
+
+ReplicaRoutingMiddleware marks every request as a read or a write;
+ReadReplicaRouter then sends the reads of GET, HEAD and OPTIONS requests
+to the READ_REPLICA_ALIAS database, and everything else to the primary.
+
+A request that writes pins its client to the primary for
+READ_YOUR_WRITES_SECONDS, so that the client's next reads see its own
+writes even if the replica lags. The pin is a signed, timestamped token
+returned in the PIN_COOKIE cookie and the PIN_HEADER header; clients send
+either back, so every worker sees it without shared state. Tokens are
+bound to the client, told apart by its Authorization header or by its
+address when it sends none.
+
+Querysets evaluated after the view returned, such as those of streaming
+responses, run outside the request's routing; resolve their database
+while the view runs with .using(django.db.router.db_for_read(model)).
+
+Without READ_REPLICA_ALIAS every query goes to the primary as before.
+"""
+
+import contextvars
+import hashlib
+
+from django.conf import settings
+from django.core import signing
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+PIN_COOKIE = 'read_your_writes'
+PIN_HEADER = 'Read-Your-Writes'
+PIN_SALT = 'TapayBackend.routers.pin'
+
+_currentRequest = contextvars.ContextVar('replicaRouting', default=None)
+
+
+class RequestRouting:
+    """
+    Routing state of the request being handled.
+    """
+
+    def __init__(self, clientKey, readOnly, pinned=False):
+        self.clientKey = clientKey
+        self.readOnly = readOnly
+        self.pinned = pinned
+        self.wrote = False
+
+    def recordWrite(self):
+        self.wrote = True
+
+
+def PinSeconds():
+    return getattr(settings, 'READ_YOUR_WRITES_SECONDS', 5)
+
+
+def PinToken(clientKey):
+    return signing.dumps(clientKey, salt=PIN_SALT, compress=True)
+
+
+def IsPinned(request, clientKey):
+    """
+    Whether the request carries an unexpired pin token issued to the same client.
+    """
+    token = request.COOKIES.get(PIN_COOKIE) or request.headers.get(PIN_HEADER)
+    if not token:
+        return False
+    try:
+        return signing.loads(token, salt=PIN_SALT, max_age=PinSeconds()) == clientKey
+    except signing.BadSignature:
+        return False
+
+
+def ClientKey(request):
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+    if authorization:
+        return hashlib.sha1(authorization.encode()).hexdigest()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Record for the router whether the current request may read from the replica.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        clientKey = ClientKey(request)
+        routing = RequestRouting(clientKey, request.method in SAFE_METHODS, IsPinned(request, clientKey))
+        token = _currentRequest.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _currentRequest.reset(token)
+
+        if routing.wrote and PinSeconds() > 0:
+            pin = PinToken(clientKey)
+            response.set_cookie(
+                PIN_COOKIE, pin, max_age=PinSeconds(), secure=request.is_secure(), httponly=True, samesite='Lax'
+            )
+            response[PIN_HEADER] = pin
+        return response
+
+
+class ReadReplicaRouter:
+    """
+    Database router sending safe-method reads to the read replica.
+    """
+
+    def db_for_read(self, model, **hints):
+        replica = getattr(settings, 'READ_REPLICA_ALIAS', None)
+        routing = _currentRequest.get()
+        if not replica or routing is None:
+            return None
+
+        if not routing.readOnly or routing.wrote or routing.pinned:
+            return DEFAULT_DB_ALIAS
+        # Reads inside a transaction on the primary must see its writes
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        routing = _currentRequest.get()
+        if routing is not None:
+            routing.recordWrite()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of the primary and is never migrated itself
+        return db != getattr(settings, 'READ_REPLICA_ALIAS', None)
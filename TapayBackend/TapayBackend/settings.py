@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -75,6 +76,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'TapayBackend.routers.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'TapayBackend.urls'
@@ -104,11 +106,29 @@ WSGI_APPLICATION = 'TapayBackend.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # django.db.backends.sqlite3 with WAL, tuned pragmas and BEGIN IMMEDIATE, see TapayBackend/sqlite/base.py
+        'ENGINE': 'TapayBackend.sqlite',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Workers keep their connection (and its page cache) between requests
+        'CONN_MAX_AGE': 600,
     }
 }
 
+# Optional read replica for GET requests, e.g. a copy kept fresh by `manage.py refresh_replica`
+if os.environ.get('TAPAY_REPLICA_DB'):
+    DATABASES['replica'] = {
+        'ENGINE': 'TapayBackend.sqlite',
+        'NAME': os.environ['TAPAY_REPLICA_DB'],
+        'CONN_MAX_AGE': 600,
+        'TEST': {'MIRROR': 'default'},
+    }
+    READ_REPLICA_ALIAS = 'replica'
+
+DATABASE_ROUTERS = ['TapayBackend.routers.ReadReplicaRouter']
+
+# Seconds a client's reads stay on the primary after it wrote
+READ_YOUR_WRITES_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -156,7 +176,7 @@ AUTH_USER_MODEL = 'Api.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'Api.utils.AuthUtils.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -170,7 +190,9 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=30),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
-    'UPDATE_LAST_LOGIN': True,
+    'TOKEN_REFRESH_SERIALIZER': 'Api.serializers.CachedTokenRefreshSerializer',
+    # Last logins are written in batches by Api.utils.LoginUtils
+    'UPDATE_LAST_LOGIN': False,
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
     'VERIFYING_KEY': None,
@@ -0,0 +1,71 @@
+"""
+SQLite database backend tuned for serving the API from several worker processes.
+
+Every new connection gets the PRAGMAS below, merged with the optional
+PRAGMAS entry of its DATABASES settings:
+
+- journal_mode=WAL lets readers run while a writer commits.
+- synchronous=NORMAL syncs at checkpoints instead of every commit; this
+  is safe from corruption in WAL mode, and a power loss can only drop
+  the last commits.
+- busy_timeout makes a blocked statement wait for the lock instead of
+  failing at once.
+- cache_size and mmap_size keep hot pages in memory.
+
+Transactions start with BEGIN IMMEDIATE (TRANSACTION_MODE), so a write
+transaction takes the write lock up front and waits on busy_timeout.
+With a plain BEGIN, a transaction that read first fails with "database
+is locked" when another writer commits before it writes. Read-only
+transactions that only need a consistent snapshot can open with a plain
+BEGIN inside `with connection.deferred():`, so they do not hold up writers.
+
+Combine with CONN_MAX_AGE so that workers reuse their connections.
+"""
+
+from contextlib import contextmanager
+
+from django.db.backends.sqlite3 import base
+
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 20000,
+    "cache_size": -64000,
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    # BEGIN mode forced by deferred(), None for TRANSACTION_MODE
+    beginMode = None
+
+    def pragmas(self):
+        pragmas = dict(PRAGMAS)
+        pragmas.update(self.settings_dict.get("PRAGMAS") or {})
+        if self.is_in_memory_db():
+            pragmas.pop("journal_mode", None)
+            pragmas.pop("mmap_size", None)
+        return pragmas
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas().items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    @contextmanager
+    def deferred(self):
+        """
+        Open the transactions started inside with BEGIN DEFERRED.
+        """
+        self.beginMode = "DEFERRED"
+        try:
+            yield
+        finally:
+            self.beginMode = None
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.beginMode or self.settings_dict.get("TRANSACTION_MODE") or "IMMEDIATE"
+        self.cursor().execute(f"BEGIN {mode}")